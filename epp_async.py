@@ -0,0 +1,164 @@
+"""
+epp_async.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+asyncio counterpart of EppClient. Uses asyncio streams over TLS with the same 4-byte
+length-prefixed framing, and lets many commands be outstanding on one session at a
+time, with responses matched back to their commands by <clTRID>. A single event loop
+can drive many sessions this way instead of needing a thread per session.
+"""
+
+import ssl
+import struct
+import asyncio
+import logging
+from collections import deque
+from epp_commands import extract_cltrid
+from epp_response import EppResponse, LazyPrettyXml
+from epp_transport import shared_ssl_context
+from epp_transcript import MaskedXml
+
+MAX_IN_FLIGHT = 64  # Default cap on commands awaiting a response per session
+
+class AsyncEppClient:
+    def __init__(self, host, port, max_in_flight=MAX_IN_FLIGHT, transcript=None, ssl_context=None):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.max_in_flight = max_in_flight
+        self.transcript = transcript
+        self.reader = None
+        self.writer = None
+        self._pending = {}         # clTRID -> future
+        self._unmatched = deque()  # futures for commands without a clTRID, oldest first
+        self._slots = None
+        self._dispatcher = None
+
+    async def connect(self):
+        logging.info("Connecting to %s:%d", self.host, self.port)
+        context = self.ssl_context or shared_ssl_context()
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port, ssl=context, server_hostname=self.host)
+        logging.info("Connected.")
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        greeting = await self.read()
+        logging.info("Server Greeting:\n%s", greeting)
+
+    async def send(self, xml):
+        data = xml.encode("utf-8")
+        self.writer.write(struct.pack("!I", len(data) + 4) + data)
+        if self.transcript:
+            self.transcript.record("out", data)
+        await self.writer.drain()
+
+    async def read(self):
+        try:
+            header = await self.reader.readexactly(4)
+        except asyncio.IncompleteReadError:
+            raise ConnectionError("Failed to read message length header.")
+        total_len = struct.unpack("!I", header)[0]
+        try:
+            response = await self.reader.readexactly(total_len - 4)
+        except asyncio.IncompleteReadError:
+            raise ConnectionError("Unexpected disconnect during response read.")
+        if self.transcript:
+            self.transcript.record("in", response)
+        return response.decode("utf-8")
+
+    async def request(self, xml):
+        """
+        Sends a command and waits for its response while other requests on the same
+        session are in flight. Once request() has been used the session's reader belongs
+        to it, so read() must not be called directly any more.
+
+        Login, logout and anything that must not overlap other commands should be
+        awaited on their own before further requests are issued.
+        """
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        async with self._slots:
+            if self._dispatcher.done():
+                raise ConnectionError("Session reader has stopped; reconnect to send more commands.")
+            future = asyncio.get_running_loop().create_future()
+            cltrid = extract_cltrid(xml)
+            if cltrid is None:
+                self._unmatched.append(future)
+            elif cltrid in self._pending:
+                raise ValueError("Duplicate clTRID in flight: %s" % cltrid)
+            else:
+                self._pending[cltrid] = future
+            sent = False
+            try:
+                await self.send(xml)
+                sent = True
+                return await future
+            finally:
+                # On failure or cancellation. An unmatched future that was sent stays
+                # queued, so the response it is owed is not handed to a later command.
+                if cltrid is not None:
+                    if self._pending.get(cltrid) is future:
+                        del self._pending[cltrid]
+                elif not sent and future in self._unmatched:
+                    self._unmatched.remove(future)
+
+    async def _dispatch(self):
+        try:
+            while True:
+                response = await self.read()
+                cltrid = extract_cltrid(response)
+                future = self._pending.pop(cltrid, None) if cltrid is not None else None
+                if future is None and cltrid is None and self._unmatched:
+                    future = self._unmatched.popleft()
+                if future is None and cltrid is None and self._pending:
+                    # Error responses (e.g. 2001) may omit the clTRID; give them to the oldest command.
+                    future = self._pending.pop(next(iter(self._pending)))
+                if future is None:
+                    # e.g. the response to a request that was cancelled
+                    logging.warning("Discarding unsolicited response:\n%s", response)
+                elif not future.done():
+                    future.set_result(response)
+        except (ConnectionError, OSError) as e:
+            self._fail_pending(e)
+        except asyncio.CancelledError:
+            self._fail_pending(ConnectionError("Session closed."))
+            raise
+        except Exception as e:
+            # e.g. a response that is not valid UTF-8; nothing more can be read reliably
+            logging.error("Session reader failed: %r", e)
+            self._fail_pending(ConnectionError("Session reader failed: %r" % e))
+
+    def _fail_pending(self, error):
+        futures = list(self._pending.values()) + list(self._unmatched)
+        self._pending.clear()
+        self._unmatched.clear()
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
+
+    async def disconnect(self):
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError, ssl.SSLError):
+                pass
+        logging.info("Disconnected.")
+
+async def send_and_expect(client, xml, expected_code="1000", expect_result_code=True):
+    logging.info("Sending:\n%s", MaskedXml(xml))
+    response = EppResponse(await client.request(xml))
+    logging.info("Received:\n%s", LazyPrettyXml(response.raw))
+    if expect_result_code and expected_code not in response.codes:
+        logging.error("Expected code %s but got:\n%s", expected_code, response.text)
+        raise SystemExit(1)
+    return response
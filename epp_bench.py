@@ -0,0 +1,266 @@
+"""
+epp_bench.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Benchmark harness for the client. Covers command serialization (every build_*
+function), EppClient framing over a socketpair, response parsing, and an end-to-end
+scenario against a local epp_mock_server measuring commands per second and p50/p99
+latency. Results are written as JSON and can be compared against a saved baseline;
+any metric that got worse by more than the threshold is reported as a regression and
+the script exits non-zero.
+
+Usage:
+python3 epp_bench.py -o bench.json
+python3 epp_bench.py --baseline baseline.json            (compare, fail on regression)
+python3 epp_bench.py --baseline baseline.json --save     (record a new baseline)
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from timeit import Timer
+from epp_commands import *
+from epp_response import EppResponse
+from epp_transport import FrameReader
+from epp_stream import parse_fields
+
+SUITES = ("serialize", "framing", "parsing", "e2e")
+REPEAT = 5               # Timing repeats per micro-benchmark; the best is kept
+E2E_SESSIONS = 4
+E2E_DURATION = 3.0       # Seconds per end-to-end scenario
+REGRESSION_THRESHOLD = 0.10
+
+LOWER_IS_BETTER = ("ns/op", "ms")
+
+NAMESERVERS = ["ns1.example.org", "ns2.example.org"]
+
+SAMPLE_INFO_RESPONSE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <response>
+    <result code="1000"><msg>Command completed successfully</msg></result>
+    <resData>
+      <domain:infData xmlns:domain="urn:ietf:params:xml:ns:domain-1.0">
+        <domain:name>renewme.im</domain:name>
+        <domain:roid>12-IM</domain:roid>
+        <domain:status s="ok"/>
+        <domain:registrant>dom001</domain:registrant>
+        <domain:contact type="admin">dom002</domain:contact>
+        <domain:contact type="tech">dom003</domain:contact>
+        <domain:contact type="billing">dom004</domain:contact>
+        <domain:ns><domain:hostAttr><domain:hostName>ns1.example.org</domain:hostName></domain:hostAttr></domain:ns>
+        <domain:clID>registrar</domain:clID>
+        <domain:crDate>2024-06-01T12:00:00.0Z</domain:crDate>
+        <domain:exDate>2026-06-01T12:00:00.0Z</domain:exDate>
+        <domain:authInfo><domain:pw>abc123</domain:pw></domain:authInfo>
+      </domain:infData>
+    </resData>
+    <trID><clTRID>0f3c2a9e-5d61-4c1b-9d1e-1b2c3d4e5f60</clTRID><svTRID>SV-1</svTRID></trID>
+  </response>
+</epp>
+"""
+
+SERIALIZE_CASES = {
+    "build_hello": lambda: build_hello(),
+    "build_login": lambda: build_login("registrar", "password"),
+    "build_logout": lambda: build_logout(),
+    "build_login_with_newpw": lambda: build_login_with_newpw("registrar", "password", "new-password"),
+    "build_domain_check": lambda: build_domain_check("example.im"),
+    "build_domain_check_batch_50": lambda: build_domain_check_batch(["name%d.im" % i for i in range(50)]),
+    "build_domain_info": lambda: build_domain_info("example.im"),
+    "build_domain_create": lambda: build_domain_create("example.im", 1, "abc123", "dom001", "dom002", "dom003", "dom004", NAMESERVERS),
+    "build_domain_create_no_authcode": lambda: build_domain_create_no_authcode("example.im", 1, "", "dom001", "dom002", "dom003", "dom004", NAMESERVERS),
+    "build_domain_renew": lambda: build_domain_renew("example.im", "2026-06-01", 1),
+    "build_domain_delete": lambda: build_domain_delete("example.im"),
+    "build_domain_transfer": lambda: build_domain_transfer("example.im", "qazxsw"),
+    "build_domain_update": lambda: build_domain_update("example.im", add_ns=NAMESERVERS, add_statuses=["clientHold"], changepw="pw"),
+    "build_contact_create": lambda: build_contact_create("CIM001", "Chris Harper", "Harper & Sons", "c@example.org", "+44.1624823833", "Malew Street", "Castletown", "Isle of Man", "IM9 1AE", "GB", "qwertyuiop"),
+    "build_contact_check": lambda: build_contact_check("CIM001"),
+    "build_contact_info": lambda: build_contact_info("CIM001"),
+    "build_contact_delete": lambda: build_contact_delete("CIM001"),
+}
+
+def time_per_call(func, repeat=REPEAT):
+    """
+    Returns the best observed time per call of `func`, in nanoseconds.
+    """
+    timer = Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+def bench_serialize():
+    return {"serialize." + name: (time_per_call(func), "ns/op") for name, func in SERIALIZE_CASES.items()}
+
+def bench_framing():
+    from epp_ote_runner import EppClient
+    results = {}
+    left, right = socket.socketpair()
+    try:
+        client = EppClient("socketpair", 0)
+        client.ssl_sock = left
+        reader = FrameReader(right)
+        for label, payload in (("1k", build_domain_info("example.im").encode()), ("32k", b"x" * 32768)):
+            def round_trip():
+                client.send(payload)
+                reader.read_frame()
+            results["framing.send_read_%s" % label] = (time_per_call(round_trip), "ns/op")
+        batch = [build_domain_check("name%d.im" % i) for i in range(16)]
+
+        def pipelined_batch():
+            client.send_many(batch)
+            for _ in batch:
+                reader.read_frame()
+        results["framing.send_many_16"] = (time_per_call(pipelined_batch), "ns/op")
+    finally:
+        left.close()
+        right.close()
+    return results
+
+def bench_parsing():
+    return {
+        "parsing.result_code": (time_per_call(lambda: EppResponse(SAMPLE_INFO_RESPONSE).code), "ns/op"),
+        "parsing.ex_date": (time_per_call(lambda: EppResponse(SAMPLE_INFO_RESPONSE).ex_date), "ns/op"),
+        "parsing.extract_cltrid": (time_per_call(lambda: extract_cltrid(SAMPLE_INFO_RESPONSE)), "ns/op"),
+        "parsing.stream_result_code": (time_per_call(lambda: parse_fields(SAMPLE_INFO_RESPONSE, ("code",))), "ns/op"),
+        "parsing.stream_ex_date": (time_per_call(lambda: parse_fields(SAMPLE_INFO_RESPONSE, ("ex_date",))), "ns/op"),
+    }
+
+def _make_certificate(directory):
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-keyout", keyfile, "-out", certfile, "-subj", "/CN=localhost",
+                    "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1"],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return certfile, keyfile
+
+def bench_e2e(sessions=E2E_SESSIONS, duration=E2E_DURATION):
+    from epp_mock_server import MockEppServer, client_context
+    from epp_pool import EppSessionPool
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            certfile, keyfile = _make_certificate(directory)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logging.warning("Skipping end-to-end benchmarks, cannot create a certificate: %s", e)
+            return results
+        server = MockEppServer(certfile, keyfile, port=0).start()
+        pool = EppSessionPool("localhost", server.port, "bench", "bench", size=sessions,
+                              ssl_context=client_context(certfile)).start()
+        try:
+            latencies = []
+            lock = threading.Lock()
+            deadline = time.perf_counter() + duration
+
+            def worker():
+                samples = []
+                with pool.session() as client:
+                    while time.perf_counter() < deadline:
+                        xml = build_domain_info("renewme.im")
+                        start = time.perf_counter()
+                        client.send(xml)
+                        client.read_response().code
+                        samples.append(time.perf_counter() - start)
+                with lock:
+                    latencies.extend(samples)
+
+            threads = [threading.Thread(target=worker) for _ in range(sessions)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            latencies.sort()
+            results["e2e.request_response_cps"] = (len(latencies) / elapsed, "cmd/s")
+            results["e2e.latency_p50"] = (latencies[len(latencies) // 2] * 1000, "ms")
+            results["e2e.latency_p99"] = (latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, "ms")
+
+            with pool.session() as client:
+                batch = [build_domain_check("name%d.im" % i) for i in range(1000)]
+                start = time.perf_counter()
+                client.pipeline(batch)
+                results["e2e.pipelined_cps"] = (len(batch) / (time.perf_counter() - start), "cmd/s")
+        finally:
+            pool.close()
+            server.stop()
+    return results
+
+def run(suites=SUITES):
+    runners = {"serialize": bench_serialize, "framing": bench_framing, "parsing": bench_parsing, "e2e": bench_e2e}
+    results = {}
+    for suite in suites:
+        logging.info("Running %s benchmarks...", suite)
+        for name, (value, unit) in runners[suite]().items():
+            results[name] = {"value": round(value, 3), "unit": unit}
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Returns (name, baseline value, current value, relative change) for every metric
+    that is worse than the baseline by more than `threshold`.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None or not previous["value"]:
+            continue
+        change = (result["value"] - previous["value"]) / previous["value"]
+        worse = change if result["unit"] in LOWER_IS_BETTER else -change
+        if worse > threshold:
+            regressions.append((name, previous["value"], result["value"], change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark EPP serialization, framing, parsing and throughput.")
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    parser.add_argument("--only", default=",".join(SUITES), help="comma-separated suites: %s" % ",".join(SUITES))
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--save", action="store_true", help="write the results to --baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+    suites = [suite.strip() for suite in args.only.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error("unknown suites: %s" % ", ".join(sorted(unknown)))
+    current = run(suites)
+
+    for name, result in sorted(current["results"].items()):
+        print("%-45s %14.3f %s" % (name, result["value"], result["unit"]))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump(current, out, indent=2)
+    if args.baseline and args.save:
+        with open(args.baseline, "w", encoding="utf-8") as out:
+            json.dump(current, out, indent=2)
+        return
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = compare(current, json.load(baseline_file), args.threshold)
+        for name, before, after, change in regressions:
+            print("REGRESSION %s: %.3f -> %.3f (%+.1f%%)" % (name, before, after, change * 100))
+        if regressions:
+            sys.exit(1)
+        print("No regressions beyond %.0f%%." % (args.threshold * 100))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+epp_cache.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+In-process cache of domain objects keyed by name, with a TTL and LRU eviction. Register
+a DomainCache in EppClient.observers and it fills itself from successful info, create
+and renew responses, and drops a domain as soon as an update, renew, delete or
+transfer for it succeeds, so cached data is never older than our own last change.
+
+Usage:
+cache = DomainCache()
+client.observers.append(cache)
+expiry = get_expiry_date_from_info(client, "renewme.im", cache=cache)
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from epp_commands import describe_command
+
+DOMAIN_CACHE_TTL = 300      # Seconds a cached domain is trusted
+DOMAIN_CACHE_SIZE = 10000   # Domains kept before the least recently used is evicted
+
+_INVALIDATING_COMMANDS = ("update", "renew", "delete", "transfer")
+
+def domain_record(response):
+    """
+    Returns the cacheable fields of a successful <domain:info> response as a dict.
+    """
+    return {
+        "name": response.name,
+        "roid": response.roid,
+        "ex_date": response.ex_date,
+        "cr_date": response.cr_date,
+        "statuses": response.statuses,
+        "nameservers": response.nameservers,
+        "registrant": response.registrant,
+        "contacts": response.contacts,
+    }
+
+class DomainCache:
+    def __init__(self, ttl=DOMAIN_CACHE_TTL, maxsize=DOMAIN_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # name -> (expires_at, record)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, name):
+        """
+        Returns the cached record for `name` or None if it is missing or expired.
+        Records from create/renew responses only carry the fields those responses
+        include (e.g. ex_date); records from info responses carry all of them.
+        """
+        name = name.lower()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[name]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, name, record):
+        name = name.lower()
+        with self._lock:
+            self._entries[name] = (time.monotonic() + self.ttl, record)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, name):
+        with self._lock:
+            self._entries.pop(name.lower(), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def observe(self, xml, response):
+        """
+        Updates the cache from a command and its EppResponse (EppClient observer hook).
+        """
+        info = describe_command(xml)
+        if info.object_type != "domain" or not info.name or not response.is_success:
+            return
+        if info.command in _INVALIDATING_COMMANDS:
+            self.invalidate(info.name)
+        if info.command == "info":
+            self.put(info.name, domain_record(response))
+        elif info.command == "create":
+            self.put(info.name, {"name": info.name, "ex_date": response.ex_date, "cr_date": response.cr_date})
+        elif info.command == "renew" and response.ex_date:
+            self.put(info.name, {"name": info.name, "ex_date": response.ex_date})
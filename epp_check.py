@@ -0,0 +1,128 @@
+"""
+epp_check.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Batched availability checks. Names are grouped into multi-name <domain:check> (or
+<contact:check>/<host:check>) commands of up to CHECK_BATCH_SIZE entries and the
+commands are pipelined, so a large candidate list costs a fraction of the round trips
+of checking one name at a time. scan_availability streams names from a file and writes results as
+it goes, so the list never has to fit in memory.
+
+Usage:
+python3 epp_check.py names.txt -o results.tsv
+python3 epp_check.py --contacts < ids.txt
+"""
+
+import sys
+import logging
+import argparse
+from itertools import islice
+from collections import deque
+from epp_commands import (build_domain_check_batch, build_contact_check_batch, build_host_check_batch, build_login,
+                          build_logout)
+from epp_response import CheckResult
+from epp_ote_runner import EppClient, HOST, PORT, CLIENT_ID, PASSWORD, PIPELINE_WINDOW, send_and_expect
+
+CHECK_BATCH_SIZE = 50  # Registry limit on names per check command
+
+def chunked(iterable, size):
+    """
+    Yields lists of up to `size` items from `iterable` without reading ahead further.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def check_domains(client, domain_names, batch_size=CHECK_BATCH_SIZE, window=PIPELINE_WINDOW):
+    """
+    Yields a CheckResult per domain name. Names are checked `batch_size` at a time with
+    up to `window` check commands in flight. If a check command fails, each of its
+    names is reported with avail=None and the result code and message as the reason.
+    """
+    return _check(client, domain_names, build_domain_check_batch, batch_size, window)
+
+def check_contacts(client, contact_ids, batch_size=CHECK_BATCH_SIZE, window=PIPELINE_WINDOW):
+    """
+    Contact counterpart of check_domains.
+    """
+    return _check(client, contact_ids, build_contact_check_batch, batch_size, window)
+
+def check_hosts(client, host_names, batch_size=CHECK_BATCH_SIZE, window=PIPELINE_WINDOW):
+    """
+    Host counterpart of check_domains.
+    """
+    return _check(client, host_names, build_host_check_batch, batch_size, window)
+
+def _check(client, names, build, batch_size, window):
+    batches = deque()  # batches whose check has been handed to the pipeline, oldest first
+
+    def commands():
+        for batch in chunked(names, batch_size):
+            batches.append(batch)
+            yield build(batch)
+
+    for response in client.iter_pipeline(commands(), window=window):
+        batch = batches.popleft()
+        if response.is_success:
+            yield from response.check_results
+            continue
+        logging.error("Check of %d names failed with %s: %s", len(batch), response.code, response.msg)
+        reason = "%s %s" % (response.code, response.msg)
+        for name in batch:
+            yield CheckResult(name, None, reason)
+
+def read_names(infile):
+    """
+    Yields stripped names from a file object, skipping blank lines and # comments.
+    """
+    for line in infile:
+        name = line.strip()
+        if name and not name.startswith("#"):
+            yield name
+
+def scan_availability(client, infile, outfile, contacts=False, batch_size=CHECK_BATCH_SIZE, window=PIPELINE_WINDOW):
+    """
+    Checks every name in `infile` and writes one tab-separated line per name to
+    `outfile`: name, 1/0 (or "error"), and the reason if the registry gave one.
+    Returns the number of names checked.
+    """
+    check = check_contacts if contacts else check_domains
+    count = 0
+    for result in check(client, read_names(infile), batch_size, window):
+        avail = "error" if result.avail is None else ("1" if result.avail else "0")
+        outfile.write("%s\t%s\t%s\n" % (result.name, avail, result.reason or ""))
+        count += 1
+        if count % (batch_size * window) == 0:
+            outfile.flush()
+    outfile.flush()
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream names through batched EPP check commands.")
+    parser.add_argument("input", nargs="?", default="-", help="file of names, one per line (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="results file (default: stdout)")
+    parser.add_argument("--contacts", action="store_true", help="check contact IDs instead of domain names")
+    parser.add_argument("--batch-size", type=int, default=CHECK_BATCH_SIZE)
+    parser.add_argument("--window", type=int, default=PIPELINE_WINDOW)
+    args = parser.parse_args()
+
+    infile = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    outfile = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    client = EppClient(HOST, PORT)
+    client.connect()
+    send_and_expect(client, build_login(CLIENT_ID, PASSWORD))
+    try:
+        count = scan_availability(client, infile, outfile, args.contacts, args.batch_size, args.window)
+    finally:
+        send_and_expect(client, build_logout(), expected_code="1500")
+        client.disconnect()
+    logging.info("Checked %d names.", count)
+
+if __name__ == '__main__':
+    main()
@@ -6,18 +6,61 @@ Date: June 2025
 
 Description:
 Support functions for the nic.im OT&E test sequence. Includes correctly formatted XML
-suitable for the NIC.IM EPP server.
+suitable for the NIC.IM EPP server. Each command is a precompiled CommandTemplate (see
+epp_serializer.py) whose slot values are XML-escaped.
 """
 
+import re
 import uuid
+import ipaddress
 import random
 import string
 import logging
-import xml.etree.ElementTree as ET
+import threading
+from collections import namedtuple
+from xml.sax.saxutils import unescape
+from epp_response import EppResponse
+from epp_serializer import CommandTemplate, xml_escape
+
+_CLTRID_RE = re.compile(r"<(?:\w+:)?clTRID>\s*(.*?)\s*</(?:\w+:)?clTRID>", re.S)
+_CLTRID_BYTES_RE = re.compile(_CLTRID_RE.pattern.encode(), re.S)
+_OBJECT_COMMAND_RE = re.compile(r"<(domain|contact|host):(\w+) xmlns:")
+_SESSION_COMMAND_RE = re.compile(r"<command>\s*<(\w+)")
+_OBJECT_NAME_RE = re.compile(r"<(?:domain|contact|host):(?:name|id)>(.*?)</")
+
+# What a command does: e.g. ("renew", "domain", "epp.im") or ("login", None, None)
+CommandInfo = namedtuple("CommandInfo", ["command", "object_type", "name"])
 
 def generate_cltrid():
     return str(uuid.uuid4())
 
+def extract_cltrid(xml):
+    """
+    Returns the <clTRID> value stamped on a command or echoed in a response,
+    or None if the document does not carry one (e.g. <hello/> and the greeting).
+    Accepts str or undecoded bytes.
+    """
+    # Search from the response's <trID>, as a poll message's <paTRID> also holds a clTRID.
+    if isinstance(xml, bytes):
+        match = _CLTRID_BYTES_RE.search(xml, max(xml.rfind(b"<trID>"), 0))
+        return match.group(1).decode("utf-8") if match else None
+    match = _CLTRID_RE.search(xml, max(xml.rfind("<trID>"), 0))
+    return match.group(1) if match else None
+
+def describe_command(xml):
+    """
+    Returns a CommandInfo for a command built by this module, without parsing the XML.
+    For object commands the name is the first <name>/<id>, e.g. the domain name.
+    """
+    match = _OBJECT_COMMAND_RE.search(xml)
+    if match:
+        name = _OBJECT_NAME_RE.search(xml, match.end())
+        return CommandInfo(match.group(2), match.group(1), unescape(name.group(1), {"&quot;": '"'}) if name else None)
+    if "<hello/>" in xml:
+        return CommandInfo("hello", None, None)
+    match = _SESSION_COMMAND_RE.search(xml)
+    return CommandInfo(match.group(1) if match else None, None, None)
+
 def build_hello():
     return """<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
@@ -25,9 +68,7 @@ def build_hello():
 </epp>
 """
 
-def build_login(username, password):
-    cltrid = generate_cltrid()
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+_LOGIN = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <login>
@@ -43,25 +84,29 @@ def build_login(username, password):
         <objURI>urn:ietf:params:xml:ns:host-1.0</objURI>
       </services>
     </login>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_logout():
+def build_login(username, password):
     cltrid = generate_cltrid()
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    return _LOGIN.render(username=username, password=password, cltrid=cltrid)
+
+_LOGOUT = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <logout/>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_login_with_newpw(username, current_password, new_password):
-    cltrid = generate_cltrid()  # Or use "ABC" if static value preferred
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+def build_logout():
+    cltrid = generate_cltrid()
+    return _LOGOUT.render(cltrid=cltrid)
+
+_LOGIN_WITH_NEWPW = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <login>
@@ -77,14 +122,42 @@ def build_login_with_newpw(username, current_password, new_password):
         <objURI>urn:ietf:params:xml:ns:contact-1.0</objURI>
       </svcs>
     </login>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_domain_check(domain_name):
+def build_login_with_newpw(username, current_password, new_password):
+    cltrid = generate_cltrid()  # Or use "ABC" if static value preferred
+    return _LOGIN_WITH_NEWPW.render(username=username, current_password=current_password, new_password=new_password, cltrid=cltrid)
+
+_POLL_REQUEST = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <command>
+    <poll op="req"/>
+    <clTRID>{cltrid:raw}</clTRID>
+  </command>
+</epp>
+""")
+
+def build_poll_request():
+    cltrid = generate_cltrid()
+    return _POLL_REQUEST.render(cltrid=cltrid)
+
+_POLL_ACK = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <command>
+    <poll op="ack" msgID="{msg_id}"/>
+    <clTRID>{cltrid:raw}</clTRID>
+  </command>
+</epp>
+""")
+
+def build_poll_ack(msg_id):
     cltrid = generate_cltrid()
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    return _POLL_ACK.render(msg_id=msg_id, cltrid=cltrid)
+
+_DOMAIN_CHECK = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <check>
@@ -92,14 +165,38 @@ def build_domain_check(domain_name):
         <domain:name>{domain_name}</domain:name>
       </domain:check>
     </check>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_domain_info(domain_name):
+def build_domain_check(domain_name):
+    cltrid = generate_cltrid()
+    return _DOMAIN_CHECK.render(domain_name=domain_name, cltrid=cltrid)
+
+_DOMAIN_CHECK_BATCH = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <command>
+    <check>
+      <domain:check xmlns:domain="urn:ietf:params:xml:ns:domain-1.0">
+{names:raw}
+      </domain:check>
+    </check>
+    <clTRID>{cltrid:raw}</clTRID>
+  </command>
+</epp>
+""")
+
+def build_domain_check_batch(domain_names):
+    """
+    Builds one <domain:check> for several names. Keep the list within the registry's
+    per-command limit (see epp_check.CHECK_BATCH_SIZE).
+    """
     cltrid = generate_cltrid()
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    names = "\n".join(f"        <domain:name>{xml_escape(name)}</domain:name>" for name in domain_names)
+    return _DOMAIN_CHECK_BATCH.render(names=names, cltrid=cltrid)
+
+_DOMAIN_INFO = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <info>
@@ -107,27 +204,16 @@ def build_domain_info(domain_name):
         <domain:name>{domain_name}</domain:name>
       </domain:info>
     </info>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_contact_create(
-    contact_id,
-    name,
-    org,
-    email,
-    voice,
-    street,
-    city,
-    region,
-    postcode,
-    country_code,
-    password,
-    fax=None
-):
+def build_domain_info(domain_name):
     cltrid = generate_cltrid()
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    return _DOMAIN_INFO.render(domain_name=domain_name, cltrid=cltrid)
+
+_CONTACT_CREATE = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <create>
@@ -137,7 +223,7 @@ def build_contact_create(
           <contact:name>{name}</contact:name>
           <contact:org>{org}</contact:org>
           <contact:addr>
-            <contact:street>{street}</contact:street>
+            {street:raw}
             <contact:city>{city}</contact:city>
             <contact:sp>{region}</contact:sp>
             <contact:pc>{postcode}</contact:pc>
@@ -152,14 +238,29 @@ def build_contact_create(
         </contact:authInfo>
       </contact:create>
     </create>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_contact_check(contact_id):
+def build_contact_create(
+    contact_id,
+    name,
+    org,
+    email,
+    voice,
+    street,
+    city,
+    region,
+    postcode,
+    country_code,
+    password,
+    fax=None
+):
     cltrid = generate_cltrid()
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    return _CONTACT_CREATE.render(contact_id=contact_id, name=name, org=org, street=_street_lines(street), city=city, region=region, postcode=postcode, country_code=country_code, voice=voice, fax=fax, email=email, password=password, cltrid=cltrid)
+
+_CONTACT_CHECK = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <check>
@@ -167,14 +268,37 @@ def build_contact_check(contact_id):
         <contact:id>{contact_id}</contact:id>
       </contact:check>
     </check>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_contact_info(contact_id):
+def build_contact_check(contact_id):
+    cltrid = generate_cltrid()
+    return _CONTACT_CHECK.render(contact_id=contact_id, cltrid=cltrid)
+
+_CONTACT_CHECK_BATCH = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <command>
+    <check>
+      <contact:check xmlns:contact="urn:ietf:params:xml:ns:contact-1.0">
+{ids:raw}
+      </contact:check>
+    </check>
+    <clTRID>{cltrid:raw}</clTRID>
+  </command>
+</epp>
+""")
+
+def build_contact_check_batch(contact_ids):
+    """
+    Builds one <contact:check> for several contact IDs.
+    """
     cltrid = generate_cltrid()
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    ids = "\n".join(f"        <contact:id>{xml_escape(contact_id)}</contact:id>" for contact_id in contact_ids)
+    return _CONTACT_CHECK_BATCH.render(ids=ids, cltrid=cltrid)
+
+_CONTACT_INFO = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <info>
@@ -182,14 +306,16 @@ def build_contact_info(contact_id):
         <contact:id>{contact_id}</contact:id>
       </contact:info>
     </info>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_contact_delete(contact_id):
+def build_contact_info(contact_id):
     cltrid = generate_cltrid()
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    return _CONTACT_INFO.render(contact_id=contact_id, cltrid=cltrid)
+
+_CONTACT_DELETE = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <delete>
@@ -197,25 +323,16 @@ def build_contact_delete(contact_id):
         <contact:id>{contact_id}</contact:id>
       </contact:delete>
     </delete>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_contact_update_info(
-    contact_id,
-    name,
-    org,
-    street,
-    city,
-    region,
-    postcode,
-    country_code,
-    voice,
-    email
-):
+def build_contact_delete(contact_id):
     cltrid = generate_cltrid()
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    return _CONTACT_DELETE.render(contact_id=contact_id, cltrid=cltrid)
+
+_CONTACT_UPDATE_INFO = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <update>
@@ -226,7 +343,7 @@ def build_contact_update_info(
             <contact:name>{name}</contact:name>
             <contact:org>{org}</contact:org>
             <contact:addr>
-              <contact:street>{street}</contact:street>
+              {street:raw}
               <contact:city>{city}</contact:city>
               <contact:sp>{region}</contact:sp>
               <contact:pc>{postcode}</contact:pc>
@@ -238,31 +355,34 @@ def build_contact_update_info(
         </contact:chg>
       </contact:update>
     </update>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_domain_create(
-    domain_name,
-    period,
-    auth_info,
-    registrant_contact,
-    admin_contact,
-    tech_contact,
-    billing_contact,
-    nameservers
+def build_contact_update_info(
+    contact_id,
+    name,
+    org,
+    street,
+    city,
+    region,
+    postcode,
+    country_code,
+    voice,
+    email
 ):
     cltrid = generate_cltrid()
-    ns_block = build_ns(nameservers)
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    return _CONTACT_UPDATE_INFO.render(contact_id=contact_id, name=name, org=org, street=_street_lines(street), city=city, region=region, postcode=postcode, country_code=country_code, voice=voice, email=email, cltrid=cltrid)
+
+_DOMAIN_CREATE = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <create>
       <domain:create xmlns:domain="urn:ietf:params:xml:ns:domain-1.0">
         <domain:name>{domain_name}</domain:name>
         <domain:period unit="y">{period}</domain:period>
-{ns_block}
+{ns_block:raw}
         <domain:registrant>{registrant_contact}</domain:registrant>
         <domain:contact type="admin">{admin_contact}</domain:contact>
         <domain:contact type="tech">{tech_contact}</domain:contact>
@@ -272,12 +392,12 @@ def build_domain_create(
         </domain:authInfo>
       </domain:create>
     </create>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_domain_create_no_authcode(
+def build_domain_create(
     domain_name,
     period,
     auth_info,
@@ -289,28 +409,42 @@ def build_domain_create_no_authcode(
 ):
     cltrid = generate_cltrid()
     ns_block = build_ns(nameservers)
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    return _DOMAIN_CREATE.render(domain_name=domain_name, period=period, ns_block=ns_block, registrant_contact=registrant_contact, admin_contact=admin_contact, tech_contact=tech_contact, billing_contact=billing_contact, auth_info=auth_info, cltrid=cltrid)
+
+_DOMAIN_CREATE_NO_AUTHCODE = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <create>
       <domain:create xmlns:domain="urn:ietf:params:xml:ns:domain-1.0">
         <domain:name>{domain_name}</domain:name>
         <domain:period unit="y">{period}</domain:period>
-{ns_block}
+{ns_block:raw}
         <domain:registrant>{registrant_contact}</domain:registrant>
         <domain:contact type="admin">{admin_contact}</domain:contact>
         <domain:contact type="tech">{tech_contact}</domain:contact>
         <domain:contact type="billing">{billing_contact}</domain:contact>
       </domain:create>
     </create>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_domain_delete(domain_name):
+def build_domain_create_no_authcode(
+    domain_name,
+    period,
+    auth_info,
+    registrant_contact,
+    admin_contact,
+    tech_contact,
+    billing_contact,
+    nameservers
+):
     cltrid = generate_cltrid()
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    ns_block = build_ns(nameservers)
+    return _DOMAIN_CREATE_NO_AUTHCODE.render(domain_name=domain_name, period=period, ns_block=ns_block, registrant_contact=registrant_contact, admin_contact=admin_contact, tech_contact=tech_contact, billing_contact=billing_contact, cltrid=cltrid)
+
+_DOMAIN_DELETE = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <delete>
@@ -318,14 +452,16 @@ def build_domain_delete(domain_name):
         <domain:name>{domain_name}</domain:name>
       </domain:delete>
     </delete>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_domain_renew(domain_name, cur_exp_date, period):
+def build_domain_delete(domain_name):
     cltrid = generate_cltrid()
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    return _DOMAIN_DELETE.render(domain_name=domain_name, cltrid=cltrid)
+
+_DOMAIN_RENEW = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <renew>
@@ -335,33 +471,37 @@ def build_domain_renew(domain_name, cur_exp_date, period):
         <domain:period unit="y">{period}</domain:period>
       </domain:renew>
     </renew>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_domain_transfer_old(domain_name, op, auth_info=None, period=None):
+def build_domain_renew(domain_name, cur_exp_date, period):
     cltrid = generate_cltrid()
-    auth_xml = f"<domain:authInfo><domain:pw>{auth_info}</domain:pw></domain:authInfo>" if auth_info else ""
-    period_xml = f"<domain:period unit=\"y\">{period}</domain:period>" if period else ""
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    return _DOMAIN_RENEW.render(domain_name=domain_name, cur_exp_date=cur_exp_date, period=period, cltrid=cltrid)
+
+_DOMAIN_TRANSFER_OLD = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <transfer op="{op}">
       <domain:transfer xmlns:domain="urn:ietf:params:xml:ns:domain-1.0">
         <domain:name>{domain_name}</domain:name>
-        {period_xml}
-        {auth_xml}
+        {period_xml:raw}
+        {auth_xml:raw}
       </domain:transfer>
     </transfer>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
 
-def build_domain_transfer(domain_name, auth_info):
+def build_domain_transfer_old(domain_name, op, auth_info=None, period=None):
     cltrid = generate_cltrid()
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    auth_xml = f"<domain:authInfo><domain:pw>{xml_escape(auth_info)}</domain:pw></domain:authInfo>" if auth_info else ""
+    period_xml = f"<domain:period unit=\"y\">{xml_escape(period)}</domain:period>" if period else ""
+    return _DOMAIN_TRANSFER_OLD.render(op=op, domain_name=domain_name, period_xml=period_xml, auth_xml=auth_xml, cltrid=cltrid)
+
+_DOMAIN_TRANSFER = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <transfer op="request">
@@ -372,11 +512,31 @@ def build_domain_transfer(domain_name, auth_info):
         </domain:authInfo>
       </domain:transfer>
     </transfer>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
+
+def build_domain_transfer(domain_name, auth_info):
+    cltrid = generate_cltrid()
+    return _DOMAIN_TRANSFER.render(domain_name=domain_name, auth_info=auth_info, cltrid=cltrid)
+
 
+_DOMAIN_UPDATE = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <command>
+    <update>
+      <domain:update xmlns:domain="urn:ietf:params:xml:ns:domain-1.0">
+        <domain:name>{domain_name}</domain:name>
+        {add_xml:raw}
+        {rem_xml:raw}
+        {chg_xml:raw}
+      </domain:update>
+    </update>
+    <clTRID>{cltrid:raw}</clTRID>
+  </command>
+</epp>
+""")
 
 def build_domain_update(
         domain_name,
@@ -388,30 +548,34 @@ def build_domain_update(
         rem_statuses=None,
         changereg=None,
         changepw=None,
-        status_message=None
+        status_message=None,
+        host_obj=False
 ):
     """
     Builds a <domain:update> EPP request.
 
-    - add_ns/rem_ns: list of nameserver hostnames
-    - add_contacts/rem_contacts: dict {type: contact_id}, e.g. {"admin": "cid001", "tech": "cid002"}
+    - add_ns/rem_ns: list of nameservers, each a host name or a (host name, IP address, ...)
+      tuple with glue addresses; removals are matched on the host name only
+    - add_contacts/rem_contacts: dict {type: contact_id}, e.g. {"admin": "cid001", "tech": "cid002"},
+      or a list of (type, contact_id) pairs when a type appears more than once
     - add_statuses/rem_statuses: list of EPP domain statuses to add/remove
     - changereg: new registrant contact ID
     - changepw: new authInfo password
     - status_message: optional human-readable message (e.g., "Payment Overdue") to include with <domain:status>
+    - host_obj: refer to nameservers as host objects (<domain:hostObj>) instead of
+      <domain:hostAttr>; the host objects must exist (see epp_hosts.ensure_hosts)
     """
     cltrid = generate_cltrid()
 
     # Construct <add>
     add_parts = []
     if add_ns:
-        add_parts.append(
-            "<domain:ns>" + "".join(f"<domain:hostAttr><domain:hostName>{ns}</domain:hostName></domain:hostAttr>" for ns in add_ns) + "</domain:ns>")
+        add_parts.append("<domain:ns>" + _ns_entries(add_ns, host_obj) + "</domain:ns>")
     if add_contacts:
-        add_parts += [f'<domain:contact type="{ctype}">{cid}</domain:contact>' for ctype, cid in add_contacts.items()]
+        add_parts += [f'<domain:contact type="{xml_escape(ctype)}">{xml_escape(cid)}</domain:contact>' for ctype, cid in _contact_pairs(add_contacts)]
     if add_statuses:
         add_parts += [
-            f'<domain:status s="{s}" lang="en">{status_message}</domain:status>' if status_message else f'<domain:status s="{s}" />'
+            f'<domain:status s="{xml_escape(s)}" lang="en">{xml_escape(status_message)}</domain:status>' if status_message else f'<domain:status s="{xml_escape(s)}" />'
             for s in add_statuses
         ]
     add_xml = f"<domain:add>{''.join(add_parts)}</domain:add>" if add_parts else ""
@@ -419,94 +583,272 @@ def build_domain_update(
     # Construct <rem>
     rem_parts = []
     if rem_ns:
-        rem_parts.append(
-            "<domain:ns>" + "".join(f"<domain:hostAttr><domain:hostName>{ns}</domain:hostName></domain:hostAttr>" for ns in rem_ns) + "</domain:ns>")
+        rem_parts.append("<domain:ns>" + _ns_entries([split_nameserver(ns)[0] for ns in rem_ns], host_obj) + "</domain:ns>")
     if rem_contacts:
-        rem_parts += [f'<domain:contact type="{ctype}">{cid}</domain:contact>' for ctype, cid in rem_contacts.items()]
+        rem_parts += [f'<domain:contact type="{xml_escape(ctype)}">{xml_escape(cid)}</domain:contact>' for ctype, cid in _contact_pairs(rem_contacts)]
     if rem_statuses:
-        rem_parts += [f'<domain:status s="{s}" />' for s in rem_statuses]
+        rem_parts += [f'<domain:status s="{xml_escape(s)}" />' for s in rem_statuses]
     rem_xml = f"<domain:rem>{''.join(rem_parts)}</domain:rem>" if rem_parts else ""
 
     # Construct <chg>
     chg_parts = []
     if changereg:
-        chg_parts.append(f"<domain:registrant>{changereg}</domain:registrant>")
+        chg_parts.append(f"<domain:registrant>{xml_escape(changereg)}</domain:registrant>")
     if changepw:
-        chg_parts.append(f"<domain:authInfo><domain:pw>{changepw}</domain:pw></domain:authInfo>")
+        chg_parts.append(f"<domain:authInfo><domain:pw>{xml_escape(changepw)}</domain:pw></domain:authInfo>")
     chg_xml = f"<domain:chg>{''.join(chg_parts)}</domain:chg>" if chg_parts else ""
 
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    return _DOMAIN_UPDATE.render(domain_name=domain_name, add_xml=add_xml, rem_xml=rem_xml, chg_xml=chg_xml, cltrid=cltrid)
+
+
+# Host commands
+
+_HOST_CHECK = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <command>
+    <check>
+      <host:check xmlns:host="urn:ietf:params:xml:ns:host-1.0">
+{names:raw}
+      </host:check>
+    </check>
+    <clTRID>{cltrid:raw}</clTRID>
+  </command>
+</epp>
+""")
+
+def build_host_check(host_name):
+    return build_host_check_batch([host_name])
+
+def build_host_check_batch(host_names):
+    """
+    Builds one <host:check> for several host names.
+    """
+    cltrid = generate_cltrid()
+    names = "\n".join(f"        <host:name>{xml_escape(name)}</host:name>" for name in host_names)
+    return _HOST_CHECK.render(names=names, cltrid=cltrid)
+
+_HOST_CREATE = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <command>
+    <create>
+      <host:create xmlns:host="urn:ietf:params:xml:ns:host-1.0">
+        <host:name>{host_name}</host:name>{addresses:raw}
+      </host:create>
+    </create>
+    <clTRID>{cltrid:raw}</clTRID>
+  </command>
+</epp>
+""")
+
+def build_host_create(host_name, addresses=None):
+    """
+    - addresses: IPv4/IPv6 glue addresses; required for a host under one of the
+      registry's own domains, not allowed otherwise
+    """
+    cltrid = generate_cltrid()
+    return _HOST_CREATE.render(host_name=host_name, addresses=_host_addresses(addresses, "host:addr"), cltrid=cltrid)
+
+_HOST_INFO = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <command>
+    <info>
+      <host:info xmlns:host="urn:ietf:params:xml:ns:host-1.0">
+        <host:name>{host_name}</host:name>
+      </host:info>
+    </info>
+    <clTRID>{cltrid:raw}</clTRID>
+  </command>
+</epp>
+""")
+
+def build_host_info(host_name):
+    cltrid = generate_cltrid()
+    return _HOST_INFO.render(host_name=host_name, cltrid=cltrid)
+
+_HOST_UPDATE = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <update>
-      <domain:update xmlns:domain="urn:ietf:params:xml:ns:domain-1.0">
-        <domain:name>{domain_name}</domain:name>
-        {add_xml}
-        {rem_xml}
-        {chg_xml}
-      </domain:update>
+      <host:update xmlns:host="urn:ietf:params:xml:ns:host-1.0">
+        <host:name>{host_name}</host:name>
+        {add_xml:raw}
+        {rem_xml:raw}
+        {chg_xml:raw}
+      </host:update>
     </update>
-    <clTRID>{cltrid}</clTRID>
+    <clTRID>{cltrid:raw}</clTRID>
   </command>
 </epp>
-"""
+""")
+
+def build_host_update(host_name, add_addresses=None, rem_addresses=None, add_statuses=None, rem_statuses=None,
+                      new_name=None):
+    """
+    Builds a <host:update> EPP request.
+
+    - add_addresses/rem_addresses: IPv4/IPv6 glue addresses to add/remove
+    - add_statuses/rem_statuses: list of host statuses to add/remove
+    - new_name: rename the host
+    """
+    cltrid = generate_cltrid()
+    add_parts = _host_addresses(add_addresses, "host:addr") + "".join(
+        f'<host:status s="{xml_escape(s)}"/>' for s in add_statuses or [])
+    rem_parts = _host_addresses(rem_addresses, "host:addr") + "".join(
+        f'<host:status s="{xml_escape(s)}"/>' for s in rem_statuses or [])
+    add_xml = f"<host:add>{add_parts}</host:add>" if add_parts else ""
+    rem_xml = f"<host:rem>{rem_parts}</host:rem>" if rem_parts else ""
+    chg_xml = f"<host:chg><host:name>{xml_escape(new_name)}</host:name></host:chg>" if new_name else ""
+    return _HOST_UPDATE.render(host_name=host_name, add_xml=add_xml, rem_xml=rem_xml, chg_xml=chg_xml, cltrid=cltrid)
+
+_HOST_DELETE = CommandTemplate("""<?xml version="1.0" encoding="UTF-8"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <command>
+    <delete>
+      <host:delete xmlns:host="urn:ietf:params:xml:ns:host-1.0">
+        <host:name>{host_name}</host:name>
+      </host:delete>
+    </delete>
+    <clTRID>{cltrid:raw}</clTRID>
+  </command>
+</epp>
+""")
+
+def build_host_delete(host_name):
+    cltrid = generate_cltrid()
+    return _HOST_DELETE.render(host_name=host_name, cltrid=cltrid)
 
 
 # Helper functions
-def build_ns(nameservers):
+_NS = CommandTemplate("""  <domain:ns>
+{ns_entries:raw}
+  </domain:ns>
+""")
+
+_NS_HOST_ATTR = CommandTemplate("""    <domain:hostAttr>
+      <domain:hostName>{ns}</domain:hostName>{addresses:raw}
+    </domain:hostAttr>""")
+
+_NS_HOST_OBJ = CommandTemplate("""    <domain:hostObj>{ns}</domain:hostObj>""")
+
+def split_nameserver(ns):
     """
-    Returns a <domain:ns> XML block with <domain:hostAttr> elements.
-    Example input: ["ns1.example.org", "ns2.example.org"]
+    Returns (host name, [addresses]) for a nameserver given as a host name or as a
+    (host name, IP address, ...) tuple, e.g. ("ns1.epp.im", "10.0.0.1", "2001:db8::1").
     """
-    ns_entries = "\n".join(
-        f"""    <domain:hostAttr>
-      <domain:hostName>{ns}</domain:hostName>
-    </domain:hostAttr>""" for ns in nameservers
-    )
-    return f"""  <domain:ns>
-{ns_entries}
-  </domain:ns>
-"""
+    if isinstance(ns, str):
+        return ns, []
+    name, *addresses = ns
+    return name, list(addresses)
+
+def merge_nameservers(nameservers):
+    """
+    Returns (host name, [addresses]) per distinct host, in first-seen order. Host names
+    are compared case-insensitively and the addresses given for a host are combined.
+    """
+    merged = {}
+    for ns in nameservers:
+        name, addresses = split_nameserver(ns)
+        entry = merged.setdefault(name.lower(), (name, []))
+        for address in addresses:
+            address = ipaddress.ip_address(address).compressed
+            if address not in entry[1]:
+                entry[1].append(address)
+    return list(merged.values())
+
+def _contact_pairs(contacts):
+    return contacts.items() if hasattr(contacts, "items") else contacts
+
+def _street_lines(street):
+    # One <contact:street> per line; a single string is one line
+    lines = [street] if isinstance(street, str) or street is None else street
+    return "".join(f"<contact:street>{xml_escape(line)}</contact:street>" for line in lines)
+
+def _host_addresses(addresses, tag):
+    # <host:addr ip="v4">...</host:addr> / <domain:hostAddr ip="v6">...</domain:hostAddr>;
+    # raises ValueError for anything that is not an IPv4 or IPv6 address.
+    parts = []
+    for address in addresses or []:
+        ip = ipaddress.ip_address(address)
+        parts.append(f'<{tag} ip="v{ip.version}">{ip.compressed}</{tag}>')
+    return "".join(parts)
+
+def _ns_entries(nameservers, host_obj=False):
+    if host_obj:
+        return "".join(f"<domain:hostObj>{xml_escape(name)}</domain:hostObj>" for name, _ in merge_nameservers(nameservers))
+    return "".join(f"<domain:hostAttr><domain:hostName>{xml_escape(name)}</domain:hostName>"
+                   f"{_host_addresses(addresses, 'domain:hostAddr')}</domain:hostAttr>"
+                   for name, addresses in merge_nameservers(nameservers))
+
+def build_ns(nameservers, host_obj=False):
+    """
+    Returns a <domain:ns> XML block with a <domain:hostAttr> (or, with host_obj, a
+    <domain:hostObj>) per distinct nameserver. Glue addresses go into <domain:hostAddr>;
+    with host_obj they belong to the host objects instead and are left out here.
+    Example input: ["ns1.example.org", ("ns1.epp.im", "10.0.0.1", "2001:db8::1")]
+    """
+    if host_obj:
+        ns_entries = "\n".join(_NS_HOST_OBJ.render(ns=name) for name, _ in merge_nameservers(nameservers))
+    else:
+        ns_entries = "\n".join(_NS_HOST_ATTR.render(ns=name, addresses=_host_addresses(addresses, "domain:hostAddr"))
+                               for name, addresses in merge_nameservers(nameservers))
+    return _NS.render(ns_entries=ns_entries)
+
+_CONTACT_ID_ALPHABET = string.ascii_lowercase + string.digits
+_CONTACT_ID_SPACE = len(_CONTACT_ID_ALPHABET) ** 6
+_CONTACT_ID_STRIDE = 1299709  # prime, so coprime with 36**6: every suffix is visited once per cycle
+_contact_id_next = random.randrange(_CONTACT_ID_SPACE)
+_contact_id_lock = threading.Lock()
 
 def generate_contact_id():
     """
-    Generate a random contact ID in the format: CIMxxxxxx-IM
+    Generate a contact ID in the format: CIMxxxxxx-IM
     Where 'xxxxxx' is a mix of lowercase letters and digits
+
+    Suffixes step through all 36**6 combinations in a scrambled order from a random
+    starting point, so IDs never repeat within a process. IDs created elsewhere can
+    still collide; check them first (see epp_contacts.ContactIdAllocator).
     """
-    suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
+    global _contact_id_next
+    with _contact_id_lock:
+        value = _contact_id_next
+        _contact_id_next = (value + _CONTACT_ID_STRIDE) % _CONTACT_ID_SPACE
+    suffix = ""
+    for _ in range(6):
+        value, digit = divmod(value, len(_CONTACT_ID_ALPHABET))
+        suffix += _CONTACT_ID_ALPHABET[digit]
     return f"CIM{suffix}-IM"
 
 # These helper functions are used with build_domain_update
 def domain_chg_registrant_xml(contact_id):
     return f"""<domain:chg>
-  <domain:registrant>{contact_id}</domain:registrant>
+  <domain:registrant>{xml_escape(contact_id)}</domain:registrant>
 </domain:chg>
 """
 
 def domain_add_ns_xml(nameservers):
     return f"""<domain:add>
   <domain:ns>
-    {''.join(f'<domain:hostObj>{ns}</domain:hostObj>' for ns in nameservers)}
+    {''.join(f'<domain:hostObj>{xml_escape(ns)}</domain:hostObj>' for ns in nameservers)}
   </domain:ns>
 </domain:add>
 """
 
 def domain_add_status_xml(statuses):
     return f"""<domain:add>
-  {''.join(f'<domain:status s="{s}" />' for s in statuses)}
+  {''.join(f'<domain:status s="{xml_escape(s)}" />' for s in statuses)}
 </domain:add>
 """
 
 def domain_rem_status_xml(statuses):
     return f"""<domain:rem>
-  {''.join(f'<domain:status s="{s}" />' for s in statuses)}
+  {''.join(f'<domain:status s="{xml_escape(s)}" />' for s in statuses)}
 </domain:rem>
 """
 
 def domain_chg_authinfo_xml(new_pw):
     return f"""<domain:chg>
   <domain:authInfo>
-    <domain:pw>{new_pw}</domain:pw>
+    <domain:pw>{xml_escape(new_pw)}</domain:pw>
   </domain:authInfo>
 </domain:chg>
 """
@@ -517,15 +859,7 @@ def extract_expiry_date_from_domain_create_response(xml_response):
     Returns the expiry date string in 'YYYY-MM-DD' format.
     """
     try:
-        ns = {
-            'domain': 'urn:ietf:params:xml:ns:domain-1.0'
-        }
-        root = ET.fromstring(xml_response)
-        ex_date = root.find('.//domain:exDate', ns)
-        if ex_date is not None:
-            return ex_date.text.strip().split('T')[0]  # strip timestamp if present
-        else:
-            return None
+        return EppResponse(xml_response).ex_date
     except Exception as e:
         logging.error("Error parsing domain:exDate: %s", e)
         return None
@@ -0,0 +1,128 @@
+"""
+epp_contacts.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Bulk contact provisioning. provision_contacts takes any number of ContactRecords,
+collapses identical records (after normalising case and whitespace) into one contact,
+allocates an unused ID for each with batched multi-ID <contact:check> commands, and
+creates the contacts concurrently through an EppScheduler. It returns a mapping from
+every input record to the ID of its registry contact, so duplicate inputs share one.
+
+Usage:
+ids, errors = provision_contacts(pool, records)
+"""
+
+import random
+import string
+import logging
+from collections import namedtuple, OrderedDict
+from epp_commands import build_contact_create, generate_contact_id
+from epp_check import check_contacts, CHECK_BATCH_SIZE
+from epp_scheduler import EppScheduler
+
+CONTACT_PASSWORD_LENGTH = 16
+
+class ContactRecord(namedtuple("ContactRecord", ["name", "org", "email", "voice", "street", "city", "region",
+                                                  "postcode", "country_code", "fax"])):
+    __slots__ = ()
+
+    def __new__(cls, name, org, email, voice, street, city, region, postcode, country_code, fax=None):
+        # street lines may be given as a list, as for build_contact_create; a tuple keeps the record hashable
+        if street is not None and not isinstance(street, str):
+            street = tuple(street)
+        return super().__new__(cls, name, org, email, voice, street, city, region, postcode, country_code, fax)
+
+_random = random.SystemRandom()
+
+def contact_key(record):
+    """
+    Returns the identity of a record for deduplication: fields with surrounding and
+    repeated whitespace removed, compared case-insensitively (country code uppercased).
+    """
+    def norm(value):
+        if isinstance(value, tuple):
+            return tuple(norm(line) for line in value)
+        return " ".join(str(value).split()).casefold() if value is not None else None
+    values = [norm(value) for value in record]
+    values[ContactRecord._fields.index("country_code")] = (record.country_code or "").strip().upper() or None
+    return tuple(values)
+
+def generate_contact_password(length=CONTACT_PASSWORD_LENGTH):
+    return "".join(_random.choice(string.ascii_letters + string.digits) for _ in range(length))
+
+class ContactIdAllocator:
+    def __init__(self, generate=generate_contact_id, batch_size=CHECK_BATCH_SIZE):
+        self.generate = generate
+        self.batch_size = batch_size
+
+    def allocate(self, client, count):
+        """
+        Returns `count` contact IDs the registry reports as available, checking
+        candidates in pipelined multi-ID <contact:check> batches.
+        """
+        allocated = []
+        while len(allocated) < count:
+            candidates = [self.generate() for _ in range(count - len(allocated))]
+            for result in check_contacts(client, candidates, self.batch_size):
+                if result.avail:
+                    allocated.append(result.name)
+                elif result.avail is None:
+                    raise ConnectionError("Contact ID check failed: %s" % result.reason)
+        return allocated
+
+def provision_contacts(pool, records, allocator=None, scheduler=None, max_attempts=3):
+    """
+    Creates one registry contact per distinct record and returns (ids, errors):
+
+    - ids: {record: contact ID} for every input record whose contact was created
+    - errors: {record: "code message"} for every record whose create failed
+
+    If a create fails with 2302 (the ID was taken after it was checked), the
+    contact is retried with a fresh ID, up to `max_attempts` times.
+    """
+    allocator = allocator or ContactIdAllocator()
+    scheduler = scheduler or EppScheduler(pool)
+    distinct = OrderedDict()  # contact_key -> first record with that key
+    keys = {}                 # record -> contact_key
+    count = 0
+    for record in records:
+        key = keys[record] = contact_key(record)
+        distinct.setdefault(key, record)
+        count += 1
+    logging.info("Provisioning %d distinct contacts for %d records.", len(distinct), count)
+
+    created = {}  # contact_key -> contact ID
+    failed = {}   # contact_key -> "code message"
+    pending = list(distinct)
+    for attempt in range(1, max_attempts + 1):
+        if not pending:
+            break
+        with pool.session() as client:
+            contact_ids = allocator.allocate(client, len(pending))
+        commands = [_create_command(distinct[key], contact_id) for key, contact_id in zip(pending, contact_ids)]
+        retry = []
+        for key, contact_id, result in zip(pending, contact_ids, scheduler.execute_many(commands)):
+            if result.ok:
+                created[key] = contact_id
+                failed.pop(key, None)
+            else:
+                failed[key] = "%s %s" % (result.code, result.response.msg if result.response else result.error)
+                if result.code == "2302":
+                    retry.append(key)
+        pending = retry
+
+    ids = {record: created[key] for record, key in keys.items() if key in created}
+    errors = {record: failed[key] for record, key in keys.items() if key in failed}
+    logging.info("Created %d contacts, %d failed.", len(created), len(failed))
+    return ids, errors
+
+def _create_command(record, contact_id):
+    password = generate_contact_password()
+    country_code = (record.country_code or "").strip().upper() or None
+    # A callable, so the scheduler builds a fresh clTRID for every attempt
+    return lambda: build_contact_create(contact_id, record.name, record.org, record.email, record.voice,
+                                        record.street, record.city, record.region, record.postcode,
+                                        country_code, password, record.fax)
@@ -0,0 +1,269 @@
+"""
+epp_drop.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Timed-release domain creates for names dropping at a known instant. Everything that
+can be done early is done early: the <domain:create> frames are built, encoded and
+length-prefixed by prepare(), and start() opens and logs in several sessions, which
+fire() keeps alive with <hello/> (with one last hello shortly before the drop so the
+connections are warm). Just before the target instant one thread per session is
+armed; each sleeps, then spins on time.perf_counter() (a monotonic clock) until each
+of its frames is due, writes it with a single sendall and reads responses between
+shots. Garbage collection is paused while firing.
+
+The report gives, per attempt, the scheduled, sent and received times in microseconds
+relative to the target, the result code, and the server's crDate for a successful
+create (the registry's own record of when the create happened).
+
+Usage:
+engine = DropEngine(HOST, PORT, CLIENT_ID, PASSWORD, sessions=4).start()
+engine.prepare("gone.im", 1, "authcode1", "REG1", "ADM1", "TEC1", "BIL1", [], attempts=8, spacing=0.05)
+results = engine.fire(datetime.fromisoformat("2026-10-20T17:00:00+00:00"))
+logging.info("Drop report:\\n%s", format_report(results))
+engine.close()
+
+python3 epp_drop.py gone.im --at 2026-10-20T17:00:00Z --registrant REG1 --admin ADM1 --tech TEC1 --billing BIL1
+"""
+
+import gc
+import re
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime
+from collections import namedtuple
+from epp_commands import build_domain_create, build_hello, build_logout, extract_cltrid
+from epp_response import EppResponse
+from epp_transport import frame
+from epp_ote_runner import EppClient, HOST, PORT, CLIENT_ID, PASSWORD
+
+KEEPALIVE_INTERVAL = 60.0  # Seconds between <hello/>s while waiting for the drop
+WARMUP_LEAD = 2.0          # Seconds before the drop for the last <hello/>
+ARM_LEAD = 0.5             # Seconds before the drop the session threads are started
+SPIN_MARGIN = 0.002        # Seconds before a shot to stop sleeping and spin on the clock
+RESPONSE_TIMEOUT = 10.0    # Seconds to wait for outstanding responses after the last shot
+DEFAULT_SPACING = 0.05     # Seconds between successive attempts at one name
+
+Shot = namedtuple("Shot", ["domain", "session", "offset", "cltrid", "frame"])
+DropResult = namedtuple("DropResult", ["domain", "session", "cltrid", "scheduled_us", "sent_us", "received_us",
+                                       "code", "msg", "server_time"])
+
+_CR_DATE_RE = re.compile(rb"<domain:crDate>(.*?)</domain:crDate>")
+
+class DropEngine:
+    def __init__(self, host, port, username, password, sessions=4, ssl_context=None,
+                 keepalive_interval=KEEPALIVE_INTERVAL):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sessions = sessions
+        self.ssl_context = ssl_context
+        self.keepalive_interval = keepalive_interval
+        self.clients = []
+        self.shots = []
+
+    def start(self):
+        """
+        Opens and logs in every session. Raises ConnectionError if one cannot log in.
+        """
+        for _ in range(self.sessions):
+            client = EppClient(self.host, self.port, ssl_context=self.ssl_context)
+            client.connect()
+            client.login(self.username, self.password)
+            self.clients.append(client)
+        return self
+
+    def prepare(self, domain_name, *args, attempts=1, spacing=DEFAULT_SPACING, offset=0.0, **kwargs):
+        """
+        Builds `attempts` create frames for a name, each with its own clTRID, from
+        build_domain_create(domain_name, *args, **kwargs). Attempt n is due `offset` +
+        n * `spacing` seconds after the target (offset may be negative), and attempts
+        are dealt round-robin across the sessions.
+        """
+        for attempt in range(attempts):
+            payload = build_domain_create(domain_name, *args, **kwargs).encode("utf-8")
+            session = len(self.shots) % self.sessions
+            self.shots.append(Shot(domain_name, session, offset + attempt * spacing,
+                                   extract_cltrid(payload), frame(payload)))
+
+    def fire(self, at, response_timeout=RESPONSE_TIMEOUT):
+        """
+        Waits for `at` (an aware datetime, or seconds since the epoch), sends every
+        prepared frame on schedule and returns a DropResult per attempt, in send order.
+        """
+        if not self.clients:
+            raise RuntimeError("DropEngine.start() must be called before fire().")
+        at = at.timestamp() if isinstance(at, datetime) else at
+        # Convert the wall-clock target once; from here on only the monotonic clock is used.
+        target = time.perf_counter() + (at - time.time())
+        logging.info("Firing %d attempts on %d sessions in %.1f s.", len(self.shots), len(self.clients),
+                     target - time.perf_counter())
+        self._keep_alive_until(target - ARM_LEAD)
+
+        results = []
+        by_session = [sorted((shot for shot in self.shots if shot.session == index), key=lambda shot: shot.offset)
+                      for index in range(len(self.clients))]
+        threads = [threading.Thread(target=self._fire_session,
+                                    args=(client, shots, target, response_timeout, results),
+                                    name="epp-drop-%d" % index, daemon=True)
+                   for index, (client, shots) in enumerate(zip(self.clients, by_session)) if shots]
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return sorted(results, key=lambda result: result.sent_us if result.sent_us is not None else float("inf"))
+
+    def _keep_alive_until(self, deadline):
+        # <hello/> every keepalive_interval, plus a last one WARMUP_LEAD before the drop
+        warm_at = deadline + ARM_LEAD - WARMUP_LEAD
+        next_hello = time.perf_counter() + self.keepalive_interval
+        warmed = False
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            if now >= next_hello or (not warmed and now >= warm_at):
+                for client in self.clients:
+                    client.transact(build_hello())
+                warmed = warmed or now >= warm_at
+                next_hello = time.perf_counter() + self.keepalive_interval
+                continue
+            time.sleep(min(next_hello, deadline if warmed else warm_at) - now)
+
+    def _fire_session(self, client, shots, target, response_timeout, results):
+        sent = {}      # clTRID -> perf_counter() after the write
+        received = {}  # clTRID -> (perf_counter() when read, payload)
+        error = None
+        try:
+            for shot in shots:
+                self._wait_until(client, target + shot.offset, received)
+                client.send_framed(shot.frame)
+                sent[shot.cltrid] = time.perf_counter()
+            deadline = time.perf_counter() + response_timeout
+            while len(received) < len(sent):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not client.response_ready(remaining):
+                    break
+                self._receive(client, received)
+        except (ConnectionError, OSError) as e:
+            logging.error("Drop session failed: %s", e)
+            error = str(e)
+        session = self.clients.index(client)
+        for shot in shots:
+            sent_at = sent.get(shot.cltrid)
+            received_at, payload = received.get(shot.cltrid, (None, None))
+            response = EppResponse(payload) if payload is not None else None
+            server_time = _CR_DATE_RE.search(payload) if payload is not None else None
+            results.append(DropResult(
+                shot.domain, session, shot.cltrid, int(shot.offset * 1e6),
+                _micros(sent_at, target), _micros(received_at, target),
+                response.code if response else None,
+                response.msg if response else (error or "no response"),
+                server_time.group(1).decode("utf-8") if server_time else None,
+            ))
+
+    def _wait_until(self, client, due, received):
+        # Read responses to earlier shots while waiting; spin for the last SPIN_MARGIN.
+        while True:
+            remaining = due - time.perf_counter()
+            if remaining <= 0:
+                return
+            if remaining > SPIN_MARGIN:
+                if client.response_ready(remaining - SPIN_MARGIN):
+                    self._receive(client, received)
+            else:
+                time.sleep(0)  # let other sessions' threads take the GIL while spinning
+
+    def _receive(self, client, received):
+        payload = client.read_bytes()
+        received[extract_cltrid(payload)] = (time.perf_counter(), payload)
+
+    def close(self):
+        for client in self.clients:
+            try:
+                client.send(build_logout())
+                client.read()
+            except (ConnectionError, OSError):
+                pass
+            client.disconnect()
+        self.clients = []
+
+def _micros(moment, target):
+    return int(round((moment - target) * 1e6)) if moment is not None else None
+
+def parse_instant(text):
+    """
+    Parses an ISO 8601 date and time. A trailing "Z" is accepted for UTC, which
+    datetime.fromisoformat() only understands from Python 3.11.
+    """
+    text = text.strip()
+    if text[-1:] in ("Z", "z"):
+        text = text[:-1] + "+00:00"
+    return datetime.fromisoformat(text)
+
+def format_report(results):
+    """
+    Returns a plain-text table of DropResults, times in microseconds from the target.
+    """
+    def us(value):
+        return "%12d" % value if value is not None else "%12s" % "-"
+    width = max([len(result.domain) for result in results] + [6])
+    lines = ["%-*s  %7s  %12s  %12s  %12s  %-4s  %s" % (width, "domain", "session", "scheduled", "sent",
+                                                          "received", "code", "server time / message")]
+    for result in results:
+        lines.append("%-*s  %7d  %s  %s  %s  %-4s  %s" % (width, result.domain, result.session,
+                                                          us(result.scheduled_us), us(result.sent_us),
+                                                          us(result.received_us), result.code or "-",
+                                                          result.server_time or result.msg))
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Create dropping domains at a precise instant.")
+    parser.add_argument("domains", nargs="+")
+    parser.add_argument("--at", required=True, help="drop time, ISO 8601 with a UTC offset, e.g. 2026-10-20T17:00:00Z")
+    parser.add_argument("--registrant", required=True)
+    parser.add_argument("--admin", required=True)
+    parser.add_argument("--tech", required=True)
+    parser.add_argument("--billing", required=True)
+    parser.add_argument("--auth-info", required=True)
+    parser.add_argument("--ns", action="append", help="nameserver (repeatable)")
+    parser.add_argument("--period", type=int, default=1)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--attempts", type=int, default=4, help="attempts per domain")
+    parser.add_argument("--spacing", type=float, default=DEFAULT_SPACING, help="seconds between attempts")
+    parser.add_argument("--offset", type=float, default=0.0, help="seconds from the drop time to the first attempt")
+    args = parser.parse_args()
+
+    try:
+        at = parse_instant(args.at)
+    except ValueError as e:
+        parser.error("--at: %s" % e)
+    if at.tzinfo is None:
+        parser.error("--at needs a UTC offset, e.g. 2026-10-20T17:00:00Z")
+    engine = DropEngine(HOST, PORT, CLIENT_ID, PASSWORD, sessions=args.sessions).start()
+    try:
+        for domain in args.domains:
+            engine.prepare(domain, args.period, args.auth_info, args.registrant, args.admin, args.tech, args.billing,
+                           args.ns or [], attempts=args.attempts, spacing=args.spacing, offset=args.offset)
+        results = engine.fire(at)
+    finally:
+        engine.close()
+    logging.info("Drop report:\n%s", format_report(results))
+    won = set(result.domain for result in results if result.code == "1000")
+    logging.info("Created %d of %d domains.", len(won), len(args.domains))
+    if len(won) < len(args.domains):
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
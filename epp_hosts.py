@@ -0,0 +1,81 @@
+"""
+epp_hosts.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Host objects for nameserver changes in bulk. A registry using host objects
+(<domain:hostObj>) rejects a domain update naming a host that does not exist yet.
+update_nameservers collects every nameserver across the whole batch of domain
+updates, dedupes them (merging the glue given for the same host), checks them in
+multi-name <host:check> commands, creates only the missing ones (pipelined), and
+then sends the domain updates. A domain whose hosts could not be created is reported
+instead of being sent.
+
+Nameservers are given as in build_ns: a host name, or a (host name, IP address, ...)
+tuple with IPv4/IPv6 glue for hosts under one of the registry's own domains.
+
+Usage:
+results = update_nameservers(client, [("epp.im", [("ns1.epp.im", "10.0.0.1"), "ns1.example.org"], [])])
+created, failed = ensure_hosts(client, ["ns1.example.org", ("ns1.epp.im", "10.0.0.1")])
+"""
+
+import logging
+from collections import namedtuple
+from epp_commands import build_host_create, build_domain_update, merge_nameservers, split_nameserver
+from epp_check import check_hosts, CHECK_BATCH_SIZE
+from epp_ote_runner import PIPELINE_WINDOW
+
+NameserverUpdateResult = namedtuple("NameserverUpdateResult", ["domain", "code", "msg"])
+
+def ensure_hosts(client, nameservers, batch_size=CHECK_BATCH_SIZE, window=PIPELINE_WINDOW):
+    """
+    Makes sure a host object exists for every distinct nameserver. Returns (created,
+    failed): the host names created, and {host name: "code message"} for hosts that
+    could not be checked or created. Hosts that already exist are used as they are.
+    """
+    hosts = dict((name.lower(), addresses) for name, addresses in merge_nameservers(nameservers))
+    missing = []
+    failed = {}
+    for result in check_hosts(client, list(hosts), batch_size, window):
+        name = result.name.lower()
+        if result.avail is None:
+            failed[name] = result.reason
+        elif result.avail:
+            missing.append(name)
+    logging.info("%d distinct hosts: %d to create, %d already exist.", len(hosts), len(missing),
+                 len(hosts) - len(missing) - len(failed))
+    created = []
+    if missing:
+        responses = client.pipeline([build_host_create(name, hosts[name]) for name in missing], window=window)
+        for name, response in zip(missing, responses):
+            if response.is_success:
+                created.append(name)
+            else:
+                logging.error("Creating host %s failed with %s: %s", name, response.code, response.msg)
+                failed[name] = "%s %s" % (response.code, response.msg)
+    return created, failed
+
+def update_nameservers(client, updates, batch_size=CHECK_BATCH_SIZE, window=PIPELINE_WINDOW):
+    """
+    Applies (domain, add_ns, rem_ns) nameserver changes using host objects, creating
+    any hosts that are needed first. Returns a NameserverUpdateResult per update, in
+    input order; code is None for a domain that was not sent because one of its
+    hosts could not be created.
+    """
+    updates = list(updates)
+    created, failed = ensure_hosts(client, [ns for _, add_ns, _ in updates for ns in add_ns or []], batch_size, window)
+    results = [None] * len(updates)
+    commands = []
+    sent = []  # index into updates of each command
+    for index, (domain, add_ns, rem_ns) in enumerate(updates):
+        blocked = [split_nameserver(ns)[0] for ns in add_ns or [] if split_nameserver(ns)[0].lower() in failed]
+        if blocked:
+            results[index] = NameserverUpdateResult(domain, None, "host not available: %s" % ", ".join(blocked))
+            continue
+        commands.append(build_domain_update(domain, add_ns=add_ns, rem_ns=rem_ns, host_obj=True))
+        sent.append(index)
+    for index, response in zip(sent, client.pipeline(commands, window=window) if commands else []):
+        results[index] = NameserverUpdateResult(updates[index][0], response.code, response.msg)
+    return results
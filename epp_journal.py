@@ -0,0 +1,276 @@
+"""
+epp_journal.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Crash-safe command journal for bulk jobs. Every job has a key chosen by the caller
+(e.g. "renew:epp.im:2026"). Before a batch of commands is sent, a "sent" line per
+command (key, clTRID, command, object, name) is appended to a JSON Lines file and
+fsynced; after each response a result line is appended. Result lines are flushed
+straight away but fsynced at most every `sync_interval` seconds, so a crash can lose
+at most a few results, and those commands are simply treated as in doubt.
+
+On restart, run_journaled() first reconciles commands that were sent but have no
+result, with one pipelined info query each (did the create happen, did the exDate
+move, do we sponsor the domain now), then skips every key that already succeeded and
+sends the rest. Commands that cannot be reconciled this way (e.g. updates) are
+reported as in doubt and left alone until resolved with Journal.resolve().
+
+Usage:
+journal = Journal("renewals.journal")
+jobs = (("renew:%s:2026" % name, partial(build_domain_renew, name, exp, 1)) for name, exp in items)
+for result in run_journaled(client, journal, jobs, client_id=CLIENT_ID):
+    ...
+python3 epp_journal.py renewals.journal               (summary and in-doubt keys)
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import argparse
+from collections import namedtuple
+from epp_commands import describe_command, extract_cltrid, build_domain_info, build_contact_info
+from epp_check import chunked
+from epp_ote_runner import PIPELINE_WINDOW
+
+JOURNAL_SYNC_INTERVAL = 1.0  # Seconds between fsyncs of result lines
+
+SENT, DONE, FAILED = "sent", "done", "failed"
+
+JournalResult = namedtuple("JournalResult", ["key", "status", "code", "msg"])
+
+_CUR_EXP_DATE_RE = re.compile(r"<domain:curExpDate>(.*?)</domain:curExpDate>")
+
+class Journal:
+    def __init__(self, path, sync_interval=JOURNAL_SYNC_INTERVAL):
+        """
+        Opens (or creates) the journal at `path` and replays it.
+        """
+        self.path = path
+        self.sync_interval = sync_interval
+        self.entries = {}  # key -> latest state as a dict
+        torn = self._replay()
+        self._file = open(path, "a", encoding="utf-8")
+        if torn:
+            self._file.write("\n")  # so the next record does not join the torn line
+        self._last_sync = time.monotonic()
+
+    def _replay(self):
+        # Returns True if the last line is incomplete
+        try:
+            f = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return False
+        line = ""
+        with f:
+            for number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Most likely the last line, cut short by a crash mid-write
+                    logging.warning("Ignoring unreadable journal line %d in %s", number, self.path)
+                    continue
+                self._apply(record)
+        return bool(line) and not line.endswith("\n")
+
+    def _apply(self, record):
+        key = record["key"]
+        if record["state"] == SENT:
+            self.entries[key] = record
+            return
+        entry = self.entries.get(key)
+        # A result belongs to the latest send of the key, or comes from reconciliation
+        if entry is not None and (record.get("cltrid") == entry.get("cltrid") or record.get("reconciled")):
+            self.entries[key] = dict(entry, **record)
+
+    def _write(self, records):
+        for record in records:
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self._apply(record)
+        self._file.flush()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def begin(self, commands):
+        """
+        Records (key, xml) pairs as about to be sent. Returns once they are on disk.
+        """
+        records = []
+        for key, xml in commands:
+            info = describe_command(xml)
+            match = _CUR_EXP_DATE_RE.search(xml)
+            records.append({"key": key, "state": SENT, "cltrid": extract_cltrid(xml), "command": info.command,
+                            "object": info.object_type, "name": info.name,
+                            "cur_exp_date": match.group(1) if match else None, "time": time.time()})
+        self._write(records)
+        self._sync()
+
+    def finish(self, key, xml, response):
+        """
+        Records the response to a command recorded with begin().
+        """
+        self._write([{"key": key, "state": DONE if response.is_success else FAILED, "cltrid": extract_cltrid(xml),
+                      "code": response.code, "msg": response.msg, "time": time.time()}])
+        if time.monotonic() - self._last_sync >= self.sync_interval:
+            self._sync()
+
+    def resolve(self, key, done, msg=None):
+        """
+        Settles an in-doubt key: done=True marks it complete, done=False lets it run again.
+        """
+        self._write([{"key": key, "state": DONE if done else FAILED, "reconciled": True, "code": None,
+                      "msg": msg or ("reconciled: processed" if done else "reconciled: not processed"),
+                      "time": time.time()}])
+        self._sync()
+
+    def state(self, key):
+        entry = self.entries.get(key)
+        return entry["state"] if entry else None
+
+    def in_doubt(self):
+        """
+        Returns the entries of commands that were sent but have no result.
+        """
+        return [entry for entry in self.entries.values() if entry["state"] == SENT]
+
+    def close(self):
+        if not self._file.closed:
+            self._sync()
+            self._file.close()
+
+def _sponsored(response, client_id):
+    if response.code == "2303":
+        return False
+    if client_id and response.is_success and response.sponsor:
+        return response.sponsor == client_id
+    return None  # without our client ID a sponsor proves nothing either way
+
+def _reconcile_create(entry, response, client_id):
+    return _sponsored(response, client_id)
+
+def _reconcile_renew(entry, response, client_id):
+    if not response.is_success or not response.ex_date or not entry.get("cur_exp_date"):
+        return None
+    return response.ex_date != entry["cur_exp_date"]
+
+def _reconcile_transfer(entry, response, client_id):
+    # A transfer request usually stays pending while the old registrar sponsors the
+    # domain, so only a pending transfer or our own sponsorship settles it.
+    if not response.is_success:
+        return None
+    if "pendingTransfer" in response.statuses or (client_id and response.sponsor == client_id):
+        return True
+    return None
+
+def _reconcile_delete(entry, response, client_id):
+    if response.code == "2303":
+        return True
+    if response.is_success:
+        return "pendingDelete" in response.statuses
+    return None
+
+# (object type, command) -> function(journal entry, info response, our client ID)
+# returning True (processed), False (not processed) or None (cannot tell)
+RECONCILERS = {
+    ("domain", "create"): _reconcile_create,
+    ("contact", "create"): _reconcile_create,
+    ("domain", "renew"): _reconcile_renew,
+    ("domain", "transfer"): _reconcile_transfer,
+    ("domain", "delete"): _reconcile_delete,
+    ("contact", "delete"): _reconcile_delete,
+}
+
+def reconcile(client, journal, client_id=None, window=PIPELINE_WINDOW):
+    """
+    Settles in-doubt commands with one pipelined info query each. Returns the keys
+    that could not be settled.
+
+    - client_id: our registrar ID, compared with the sponsor of created and
+      transferred objects; defaults to the username of client.login(). If it is not
+      known, those commands are left in doubt rather than being sent again.
+    """
+    entries = []
+    unresolved = []
+    for entry in journal.in_doubt():
+        if (entry["object"], entry["command"]) in RECONCILERS:
+            entries.append(entry)
+        else:
+            unresolved.append(entry["key"])
+    if not entries:
+        return unresolved
+    if client_id is None and client.credentials:
+        client_id = client.credentials[0]
+    commands = [build_domain_info(entry["name"]) if entry["object"] == "domain" else build_contact_info(entry["name"])
+                for entry in entries]
+    for entry, response in zip(entries, client.pipeline(commands, window=window)):
+        done = RECONCILERS[(entry["object"], entry["command"])](entry, response, client_id)
+        if done is None:
+            unresolved.append(entry["key"])
+        else:
+            logging.info("Reconciled %s: %s", entry["key"], "processed" if done else "not processed")
+            journal.resolve(entry["key"], done)
+    return unresolved
+
+def run_journaled(client, journal, jobs, client_id=None, window=PIPELINE_WINDOW):
+    """
+    Runs (key, build) jobs on a logged-in session, where build() returns the command
+    XML, and yields a JournalResult per job with status:
+
+    - done: succeeded now
+    - failed: the registry rejected it (it runs again next time)
+    - skipped: succeeded in an earlier run
+    - in_doubt: sent in an earlier run with unknown outcome; not sent again
+
+    client_id is our registrar ID, as for reconcile(). If the session drops, the
+    exception propagates and the commands of the current batch are left in doubt for
+    the next run to reconcile.
+    """
+    unresolved = reconcile(client, journal, client_id, window)
+    if unresolved:
+        logging.warning("%d commands are still in doubt and will not be resent.", len(unresolved))
+    for batch in chunked(jobs, window):
+        pending = []
+        for key, build in batch:
+            state = journal.state(key)
+            if state == DONE:
+                yield JournalResult(key, "skipped", None, None)
+            elif state == SENT:
+                yield JournalResult(key, "in_doubt", None, "outcome unknown; resolve before rerunning")
+            else:
+                pending.append((key, build()))
+        if not pending:
+            continue
+        journal.begin(pending)
+        responses = client.pipeline([xml for _, xml in pending], window=window)
+        for (key, xml), response in zip(pending, responses):
+            journal.finish(key, xml, response)
+            yield JournalResult(key, DONE if response.is_success else FAILED, response.code, response.msg)
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise an EPP command journal.")
+    parser.add_argument("journal")
+    parser.add_argument("--resolve", nargs=2, metavar=("KEY", "DONE|FAILED"), help="settle an in-doubt key by hand")
+    args = parser.parse_args()
+
+    journal = Journal(args.journal)
+    try:
+        if args.resolve:
+            key, outcome = args.resolve
+            if journal.state(key) is None:
+                parser.error("unknown key: %s" % key)
+            journal.resolve(key, outcome.lower() == DONE, "resolved by hand")
+        states = [entry["state"] for entry in journal.entries.values()]
+        logging.info("%d done, %d failed, %d in doubt.", states.count(DONE), states.count(FAILED), states.count(SENT))
+        for entry in journal.in_doubt():
+            logging.info("In doubt: %s (%s %s %s)", entry["key"], entry["command"], entry["object"], entry["name"])
+    finally:
+        journal.close()
+
+if __name__ == '__main__':
+    main()
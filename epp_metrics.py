@@ -0,0 +1,228 @@
+"""
+epp_metrics.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+In-process metrics for EPP traffic. Set EppClient.metrics (or pass metrics= to an
+EppSessionPool) to an EppMetrics and every command is recorded by command type:
+latency histograms for the serialize (UTF-8 encoding), write (framing and sending),
+server wait and parse phases, responses by result code, bytes in and out, reconnects
+and the number of commands in flight. Time spent in the builders themselves can be
+added as a "build" phase by wrapping them with timed().
+
+Read them with snapshot(), render them in the Prometheus text format with
+prometheus(), or serve() them on a local HTTP listener for scraping.
+
+Usage:
+metrics = EppMetrics()
+client.metrics = metrics
+build_create = metrics.timed(build_domain_create)   (optional: records build time)
+metrics.serve(9464)                                  (scrape http://127.0.0.1:9464/metrics)
+"""
+
+import time
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from epp_commands import describe_command
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_PORT = 9464
+
+def command_type(xml):
+    """
+    Returns the command type used as the metrics label, e.g. "info", "check" or "login".
+    """
+    if isinstance(xml, bytes):
+        xml = xml.decode("utf-8", "replace")
+    return describe_command(xml).command or "unknown"
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """
+        Returns [(upper bound, observations <= bound)], ending with ("+Inf", count).
+        """
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """
+        Estimates the q-quantile as the upper bound of the bucket it falls in.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound if bound != "+Inf" else self.buckets[-1]
+
+class EppMetrics:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.latency = {}    # (phase, command) -> Histogram
+        self.responses = {}  # (command, code) -> count
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.reconnects = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def observe(self, phase, command, seconds):
+        with self._lock:
+            histogram = self.latency.get((phase, command))
+            if histogram is None:
+                histogram = self.latency[(phase, command)] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def sent(self, count, nbytes):
+        with self._lock:
+            self.bytes_out += nbytes
+            self.in_flight += count
+
+    def received(self, nbytes, matched=True):
+        with self._lock:
+            self.bytes_in += nbytes
+            if matched:
+                self.in_flight = max(0, self.in_flight - 1)
+
+    def abandon(self, count):
+        """
+        Stops counting `count` commands as in flight, e.g. when their connection closed.
+        """
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - count)
+
+    def count_response(self, command, code):
+        key = (command, code or "none")
+        with self._lock:
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def count_reconnect(self):
+        with self._lock:
+            self.reconnects += 1
+
+    def timed(self, builder):
+        """
+        Wraps a build_* function so the time spent building each command is recorded
+        in the build histogram.
+        """
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            xml = builder(*args, **kwargs)
+            self.observe("build", command_type(xml), time.perf_counter() - start)
+            return xml
+        wrapper.__name__ = builder.__name__
+        wrapper.__doc__ = builder.__doc__
+        return wrapper
+
+    def snapshot(self):
+        """
+        Returns a point-in-time copy of every metric as plain dicts and numbers.
+        """
+        with self._lock:
+            latency = {}
+            for (phase, command), histogram in self.latency.items():
+                latency.setdefault(phase, {})[command] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "p50": histogram.quantile(0.5),
+                    "p99": histogram.quantile(0.99),
+                    "buckets": histogram.cumulative(),
+                }
+            return {
+                "latency": latency,
+                "responses": {"%s/%s" % key: count for key, count in self.responses.items()},
+                "bytes_out": self.bytes_out,
+                "bytes_in": self.bytes_in,
+                "reconnects": self.reconnects,
+                "in_flight": self.in_flight,
+            }
+
+    def prometheus(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        lines = [
+            "# HELP epp_command_seconds EPP command latency by phase and command type.",
+            "# TYPE epp_command_seconds histogram",
+        ]
+        with self._lock:
+            for (phase, command), histogram in sorted(self.latency.items()):
+                labels = 'phase="%s",command="%s"' % (phase, command)
+                for bound, total in histogram.cumulative():
+                    lines.append('epp_command_seconds_bucket{%s,le="%s"} %d' % (labels, bound, total))
+                lines.append("epp_command_seconds_sum{%s} %r" % (labels, histogram.sum))
+                lines.append("epp_command_seconds_count{%s} %d" % (labels, histogram.count))
+            lines += [
+                "# HELP epp_responses_total EPP responses by command type and result code.",
+                "# TYPE epp_responses_total counter",
+            ]
+            for (command, code), count in sorted(self.responses.items()):
+                lines.append('epp_responses_total{command="%s",code="%s"} %d' % (command, code, count))
+            lines += [
+                "# HELP epp_bytes_total EPP payload bytes sent and received.",
+                "# TYPE epp_bytes_total counter",
+                'epp_bytes_total{direction="out"} %d' % self.bytes_out,
+                'epp_bytes_total{direction="in"} %d' % self.bytes_in,
+                "# HELP epp_reconnects_total EPP connections re-established after the first.",
+                "# TYPE epp_reconnects_total counter",
+                "epp_reconnects_total %d" % self.reconnects,
+                "# HELP epp_in_flight EPP commands sent and awaiting a response.",
+                "# TYPE epp_in_flight gauge",
+                "epp_in_flight %d" % self.in_flight,
+            ]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=METRICS_PORT, host="127.0.0.1"):
+        """
+        Serves prometheus() at http://host:port/metrics from a background thread.
+        Returns the HTTP server; call stop() to shut it down.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="epp-metrics", daemon=True).start()
+        logging.info("Serving EPP metrics on http://%s:%d/metrics", host, self._server.server_address[1])
+        return self._server
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
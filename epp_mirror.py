@@ -0,0 +1,314 @@
+"""
+epp_mirror.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+On-disk mirror of our domain and contact objects in SQLite. Register a RegistryMirror
+in EppClient.observers and it fills itself from successful info, create and renew
+responses; an update or transfer marks the object stale (its new state is only known
+after the next info) and a delete removes it. Expiry dates, statuses, nameservers and
+contact IDs are indexed, so portfolio questions ("what expires in the next 30 days",
+"which domains use ns1.example.org") are answered locally with no registry traffic.
+
+A background refresher re-syncs only rows that are stale: never fully synced, marked
+by one of our own changes, or last synced more than `stale_after` seconds ago. A row
+whose info fails is left alone for `retry_after` seconds before it is tried again.
+
+Usage:
+mirror = RegistryMirror("registry.db")
+client.observers.append(mirror)
+mirror.start_refresher(pool)
+names = mirror.expiring(30)
+"""
+
+import time
+import sqlite3
+import logging
+import datetime
+import threading
+from epp_commands import describe_command, build_domain_info, build_contact_info
+
+MIRROR_STALE_AFTER = 24 * 3600  # Seconds before a synced row is due for a refresh
+REFRESH_INTERVAL = 60           # Seconds between refresher passes
+REFRESH_BATCH_SIZE = 100        # Infos pipelined per refresher pass and object type
+REFRESH_RETRY_AFTER = 900       # Seconds before a row whose info failed is tried again
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS domains (
+    name TEXT PRIMARY KEY,
+    roid TEXT,
+    ex_date TEXT,
+    cr_date TEXT,
+    registrant TEXT,
+    synced_at REAL NOT NULL DEFAULT 0,
+    retry_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS domain_statuses (name TEXT NOT NULL, status TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS domain_nameservers (name TEXT NOT NULL, host TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS domain_contacts (name TEXT NOT NULL, type TEXT NOT NULL, contact_id TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS contacts (
+    id TEXT PRIMARY KEY,
+    roid TEXT,
+    email TEXT,
+    cr_date TEXT,
+    synced_at REAL NOT NULL DEFAULT 0,
+    retry_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS contact_statuses (id TEXT NOT NULL, status TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS domains_ex_date ON domains (ex_date);
+CREATE INDEX IF NOT EXISTS domains_synced_at ON domains (synced_at);
+CREATE INDEX IF NOT EXISTS domain_statuses_status ON domain_statuses (status, name);
+CREATE INDEX IF NOT EXISTS domain_statuses_name ON domain_statuses (name);
+CREATE INDEX IF NOT EXISTS domain_nameservers_host ON domain_nameservers (host, name);
+CREATE INDEX IF NOT EXISTS domain_nameservers_name ON domain_nameservers (name);
+CREATE INDEX IF NOT EXISTS domain_contacts_contact ON domain_contacts (contact_id, name);
+CREATE INDEX IF NOT EXISTS domain_contacts_name ON domain_contacts (name);
+CREATE INDEX IF NOT EXISTS contacts_synced_at ON contacts (synced_at);
+CREATE INDEX IF NOT EXISTS contact_statuses_status ON contact_statuses (status, id);
+CREATE INDEX IF NOT EXISTS contact_statuses_id ON contact_statuses (id);
+"""
+
+_STALE_COMMANDS = ("update", "transfer")
+
+class RegistryMirror:
+    def __init__(self, path, stale_after=MIRROR_STALE_AFTER, retry_after=REFRESH_RETRY_AFTER):
+        """
+        - path: SQLite database file, created if missing (":memory:" for a throwaway mirror)
+        - stale_after: seconds after which a synced row is refreshed again
+        - retry_after: seconds before a row whose refresh failed is tried again
+        """
+        self.path = path
+        self.stale_after = stale_after
+        self.retry_after = retry_after
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._db.close()
+
+    def observe(self, xml, response):
+        """
+        Updates the mirror from a command and its EppResponse (EppClient observer hook).
+        """
+        info = describe_command(xml)
+        if info.object_type not in ("domain", "contact") or not info.name:
+            return
+        if info.command == "info" and response.code == "2303":
+            self.remove(info.object_type, info.name)  # gone from the registry
+            return
+        if not response.is_success:
+            return
+        domain = info.object_type == "domain"
+        if info.command == "info":
+            if domain:
+                self.put_domain(response)
+            else:
+                self.put_contact(response)
+        elif info.command == "delete":
+            self.remove(info.object_type, info.name)
+        elif info.command == "create":
+            # Only the dates are returned; the refresher fetches the rest.
+            if domain:
+                self._execute("INSERT OR REPLACE INTO domains (name, ex_date, cr_date, synced_at) VALUES (?, ?, ?, 0)",
+                              (info.name.lower(), response.ex_date, response.cr_date))
+            else:
+                self._execute("INSERT OR REPLACE INTO contacts (id, cr_date, synced_at) VALUES (?, ?, 0)",
+                              (info.name, response.cr_date))
+        elif info.command == "renew" and domain and response.ex_date:
+            self._execute("UPDATE domains SET ex_date = ? WHERE name = ?", (response.ex_date, info.name.lower()))
+        elif info.command in _STALE_COMMANDS:
+            self.mark_stale(info.object_type, info.name)
+
+    def put_domain(self, response):
+        """
+        Stores everything in a successful <domain:info> response, replacing the old row.
+        """
+        name = response.name.lower()
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO domains (name, roid, ex_date, cr_date, registrant, synced_at) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             (name, response.roid, response.ex_date, response.cr_date, response.registrant,
+                              time.time()))
+            self._replace_children(name, response)
+
+    def put_contact(self, response):
+        """
+        Stores a successful <contact:info> response, replacing the old row.
+        """
+        contact_id = response.name
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO contacts (id, roid, email, cr_date, synced_at) "
+                             "VALUES (?, ?, ?, ?, ?)",
+                             (contact_id, response.roid, response.email, response.cr_date, time.time()))
+            self._db.execute("DELETE FROM contact_statuses WHERE id = ?", (contact_id,))
+            self._db.executemany("INSERT INTO contact_statuses VALUES (?, ?)",
+                                 [(contact_id, status) for status in response.statuses])
+
+    def _replace_children(self, name, response):
+        for table in ("domain_statuses", "domain_nameservers", "domain_contacts"):
+            self._db.execute("DELETE FROM %s WHERE name = ?" % table, (name,))
+        self._db.executemany("INSERT INTO domain_statuses VALUES (?, ?)",
+                             [(name, status) for status in response.statuses])
+        self._db.executemany("INSERT INTO domain_nameservers VALUES (?, ?)",
+                             [(name, host.lower()) for host in response.nameservers if host])
+        contacts = list(response.contacts)
+        if response.registrant:
+            contacts.append(("registrant", response.registrant))
+        self._db.executemany("INSERT INTO domain_contacts VALUES (?, ?, ?)",
+                             [(name, contact_type, contact_id) for contact_type, contact_id in contacts])
+
+    def remove(self, object_type, name):
+        with self._lock, self._db:
+            if object_type == "domain":
+                name = name.lower()
+                for table in ("domains", "domain_statuses", "domain_nameservers", "domain_contacts"):
+                    self._db.execute("DELETE FROM %s WHERE name = ?" % table, (name,))
+            else:
+                self._db.execute("DELETE FROM contacts WHERE id = ?", (name,))
+                self._db.execute("DELETE FROM contact_statuses WHERE id = ?", (name,))
+
+    def mark_stale(self, object_type, name):
+        if object_type == "domain":
+            self._execute("UPDATE domains SET synced_at = 0, retry_at = 0 WHERE name = ?", (name.lower(),))
+        else:
+            self._execute("UPDATE contacts SET synced_at = 0, retry_at = 0 WHERE id = ?", (name,))
+
+    def defer(self, object_type, name):
+        """
+        Keeps a row whose refresh failed out of stale() for `retry_after` seconds.
+        """
+        table, key = ("domains", "name") if object_type == "domain" else ("contacts", "id")
+        name = name.lower() if object_type == "domain" else name
+        self._execute("UPDATE %s SET retry_at = ? WHERE %s = ?" % (table, key), (time.time() + self.retry_after, name))
+
+    def _execute(self, sql, args=()):
+        with self._lock, self._db:
+            self._db.execute(sql, args)
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def domain(self, name):
+        """
+        Returns the mirrored domain as a dict (the fields of epp_cache.domain_record plus
+        synced_at), or None if it is not in the mirror.
+        """
+        name = name.lower()
+        rows = self._query("SELECT roid, ex_date, cr_date, registrant, synced_at FROM domains WHERE name = ?", (name,))
+        if not rows:
+            return None
+        roid, ex_date, cr_date, registrant, synced_at = rows[0]
+        return {
+            "name": name,
+            "roid": roid,
+            "ex_date": ex_date,
+            "cr_date": cr_date,
+            "statuses": [row[0] for row in self._query("SELECT status FROM domain_statuses WHERE name = ?", (name,))],
+            "nameservers": [row[0] for row in
+                            self._query("SELECT host FROM domain_nameservers WHERE name = ?", (name,))],
+            "registrant": registrant,
+            "contacts": self._query("SELECT type, contact_id FROM domain_contacts WHERE name = ? "
+                                    "AND type != 'registrant'", (name,)),
+            "synced_at": synced_at,
+        }
+
+    def expiring(self, days=30, today=None):
+        """
+        Returns (name, ex_date) for every domain expiring within `days` days, soonest first.
+        """
+        today = today or datetime.date.today()
+        until = (today + datetime.timedelta(days=days)).isoformat()
+        return self._query("SELECT name, ex_date FROM domains WHERE ex_date <= ? ORDER BY ex_date, name", (until,))
+
+    def with_status(self, status):
+        return [row[0] for row in
+                self._query("SELECT name FROM domain_statuses WHERE status = ? ORDER BY name", (status,))]
+
+    def using_nameserver(self, host):
+        return [row[0] for row in
+                self._query("SELECT name FROM domain_nameservers WHERE host = ? ORDER BY name", (host.lower(),))]
+
+    def using_contact(self, contact_id):
+        """
+        Returns (name, contact type) for every domain referencing the contact, registrant included.
+        """
+        return self._query("SELECT name, type FROM domain_contacts WHERE contact_id = ? ORDER BY name, type",
+                           (contact_id,))
+
+    def stale(self, object_type="domain", limit=REFRESH_BATCH_SIZE):
+        """
+        Returns up to `limit` names (or contact IDs) due for a refresh, oldest sync first.
+        Rows whose last refresh failed are skipped until their retry time.
+        """
+        table, key = ("domains", "name") if object_type == "domain" else ("contacts", "id")
+        now = time.time()
+        return [row[0] for row in self._query("SELECT %s FROM %s WHERE synced_at < ? AND retry_at <= ? "
+                                              "ORDER BY synced_at LIMIT ?" % (key, table),
+                                              (now - self.stale_after, now, limit))]
+
+    def refresh_stale(self, client, limit=REFRESH_BATCH_SIZE):
+        """
+        Sends pipelined infos for up to `limit` stale domains and contacts on a logged-in
+        session and stores the results. Returns the number of objects refreshed; objects
+        whose info failed (other than with 2303, which removes them) are deferred.
+        """
+        stale = [("domain", name) for name in self.stale("domain", limit)]
+        stale += [("contact", contact_id) for contact_id in self.stale("contact", limit)]
+        if not stale:
+            return 0
+        commands = [build_domain_info(name) if object_type == "domain" else build_contact_info(name)
+                    for object_type, name in stale]
+        responses = client.pipeline(commands)
+        observed = self in client.observers
+        refreshed = 0
+        for (object_type, name), xml, response in zip(stale, commands, responses):
+            if not observed:
+                self.observe(xml, response)
+            if response.is_success:
+                refreshed += 1
+            elif response.code != "2303":
+                logging.warning("Mirror refresh of %s %s failed with %s: %s", object_type, name, response.code,
+                                response.msg)
+                self.defer(object_type, name)
+        return refreshed
+
+    def start_refresher(self, pool, interval=REFRESH_INTERVAL, batch_size=REFRESH_BATCH_SIZE):
+        """
+        Starts a background thread that refreshes stale rows every `interval` seconds
+        on sessions checked out from `pool`.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh, args=(pool, interval, batch_size),
+                                        name="epp-mirror", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _refresh(self, pool, interval, batch_size):
+        while not self._stop.is_set():
+            try:
+                with pool.session() as client:
+                    count = self.refresh_stale(client, batch_size)
+                if count:
+                    logging.info("Mirror refreshed %d objects.", count)
+                if count >= batch_size:
+                    continue  # more are waiting; don't sleep
+            except Exception as e:
+                logging.error("Mirror refresh failed: %s", e)
+            self._stop.wait(interval)
@@ -0,0 +1,748 @@
+"""
+epp_mock_server.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Local stand-in for the NIC.IM EPP server, for offline testing and load generation.
+Speaks TLS with the same 4-byte length-prefixed framing, sends a greeting, and keeps
+in-memory state for sessions, domains, contacts, hosts and poll queues. It returns the
+result codes the OT&E sequence expects (e.g. 2400 for a create without authInfo, 2002 for a contact
+without a valid country code). Latency can be injected per command and the total
+command rate can be capped to load-test clients realistically.
+
+A self-signed certificate for localhost can be made with:
+openssl req -x509 -newkey rsa:2048 -nodes -days 365 -keyout key.pem -out cert.pem \
+    -subj /CN=localhost -addext "subjectAltName=DNS:localhost,IP:127.0.0.1"
+
+Usage:
+python3 epp_mock_server.py --certfile cert.pem --keyfile key.pem --port 7000 --latency 0.02
+Clients then connect with EppClient("localhost", 7000, ssl_context=client_context("cert.pem")).
+"""
+
+import re
+import ssl
+import ipaddress
+import time
+import logging
+import argparse
+import threading
+import socketserver
+import xml.etree.ElementTree as ET
+from collections import deque
+from datetime import datetime, timezone
+from epp_response import NS, DOMAIN_NS, CONTACT_NS, HOST_NS
+from epp_scheduler import TokenBucket
+from epp_serializer import xml_escape
+from epp_transport import FrameReader, write_frames, tune_socket
+
+MOCK_PORT = 7000
+
+MESSAGES = {
+    "1000": "Command completed successfully",
+    "1001": "Command completed successfully; action pending",
+    "1300": "Command completed successfully; no messages",
+    "1301": "Command completed successfully; ack to dequeue",
+    "1500": "Command completed successfully; ending session",
+    "2001": "Command syntax error",
+    "2002": "Command use error",
+    "2003": "Required parameter missing",
+    "2004": "Parameter value range error",
+    "2005": "Parameter value syntax error",
+    "2200": "Authentication error",
+    "2302": "Object exists",
+    "2303": "Object does not exist",
+    "2304": "Object status prohibits operation",
+    "2305": "Object association prohibits operation",
+    "2306": "Parameter value policy error",
+    "2400": "Command failed",
+    "2502": "Session limit exceeded; server closing connection",
+}
+
+_LABEL_RE = re.compile(r"^[a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?$")
+
+def client_context(cafile):
+    """
+    Returns an SSL context for clients that trusts the mock server's certificate.
+    """
+    return ssl.create_default_context(cafile=cafile)
+
+def _now():
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+def _fmt(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.0Z")
+
+def _add_years(moment, years):
+    try:
+        return moment.replace(year=moment.year + years)
+    except ValueError:  # 29 February
+        return moment.replace(year=moment.year + years, day=28)
+
+def _local(tag):
+    return tag.rpartition("}")[2]
+
+def _text(element, path):
+    found = element.find(path, NS)
+    return found.text.strip() if found is not None and found.text else None
+
+def valid_domain_name(name):
+    labels = name.lower().split(".")
+    return len(labels) >= 2 and len(name) <= 253 and all(_LABEL_RE.match(label) for label in labels)
+
+class EppError(Exception):
+    def __init__(self, code, msg=None):
+        super().__init__(msg or MESSAGES[code])
+        self.code = code
+
+def _period(target):
+    # Registration period in years, 1 if not given
+    try:
+        period = int(_text(target, 'domain:period') or 1)
+    except ValueError:
+        raise EppError("2005", "Invalid period")
+    if not 1 <= period <= 10:
+        raise EppError("2004")
+    return period
+
+class MockRegistry:
+    """
+    In-memory registry state shared by every connection to a MockEppServer.
+    Unknown client IDs are registered on first login with the password they give.
+    """
+    def __init__(self, accounts=None):
+        self.accounts = dict(accounts or {})
+        self.domains = {}
+        self.contacts = {}
+        self.hosts = {}
+        self.messages = {}  # client ID -> deque of queued poll messages, oldest first
+        self.lock = threading.Lock()
+        self._roid = 0
+        self._msg_id = 0
+        self.seed()
+
+    def seed(self):
+        for contact_id in ("dom001", "dom002", "dom003", "dom004", "CH1234"):
+            self.add_contact(contact_id, "OTE Contact %s" % contact_id, "GB", "ote@example.org")
+        for name, sponsor, auth in (("domicilium.im", None, "abc123"), ("renewme.im", None, "abc123"),
+                                    ("epp.im", "other-registrar", "qazxsw"), ("transfer3.im", "other-registrar", "secret")):
+            self.add_domain(name, 1, auth, "dom001", {"admin": "dom002", "tech": "dom003", "billing": "dom004"},
+                            ["ns1.example.org", "ns2.example.org"], sponsor)
+
+    def next_roid(self, suffix):
+        self._roid += 1
+        return "%d-%s" % (self._roid, suffix)
+
+    def add_contact(self, contact_id, name, cc, email, org=None, sponsor=None):
+        self.contacts[contact_id] = {
+            "id": contact_id, "roid": self.next_roid("CON"), "name": name, "org": org, "cc": cc,
+            "email": email, "cl_id": sponsor, "cr_date": _now(), "statuses": set(),
+        }
+
+    def add_host(self, name, addresses, sponsor):
+        self.hosts[name.lower()] = {
+            "name": name.lower(), "roid": self.next_roid("HOST"), "addrs": list(addresses), "cl_id": sponsor,
+            "cr_date": _now(), "statuses": set(),
+        }
+
+    def superordinate(self, host_name):
+        """
+        Returns the registry domain a host name is under, or None for an external host.
+        """
+        labels = host_name.lower().split(".")
+        for i in range(1, len(labels) - 1):
+            if ".".join(labels[i:]) in self.domains:
+                return ".".join(labels[i:])
+        return None
+
+    def enqueue(self, client_id, text, res_data=""):
+        """
+        Queues a poll message for `client_id`; res_data is optional resData XML.
+        """
+        self._msg_id += 1
+        self.messages.setdefault(client_id, deque()).append(
+            {"id": str(self._msg_id), "qdate": _now(), "text": text, "res_data": res_data})
+
+    def add_domain(self, name, years, auth, registrant, contacts, nameservers, sponsor):
+        created = _now()
+        self.domains[name.lower()] = {
+            "name": name.lower(), "roid": self.next_roid("IM"), "registrant": registrant,
+            "contacts": [(ctype, cid) for ctype, cid in contacts.items()], "ns": list(nameservers),
+            "statuses": set(), "auth": auth, "cl_id": sponsor, "cr_date": created,
+            "ex_date": _add_years(created, years),
+        }
+
+class Session:
+    def __init__(self):
+        self.client_id = None
+
+class MockEppServer:
+    def __init__(self, certfile, keyfile, host="127.0.0.1", port=MOCK_PORT, registry=None,
+                 latency=0.0, max_rate=None, max_sessions=None):
+        self.registry = registry or MockRegistry()
+        self.latency = latency
+        self.bucket = TokenBucket(max_rate) if max_rate else None
+        self.max_sessions = max_sessions
+        self.sessions = 0
+        self.commands = 0
+        self._svtrid = 0
+        self._lock = threading.Lock()
+        self.context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        self.context.load_cert_chain(certfile, keyfile)
+        self._server = socketserver.ThreadingTCPServer((host, port), self._handler_class(), bind_and_activate=True)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="epp-mock", daemon=True)
+        self._thread.start()
+        logging.info("Mock EPP server listening on %s:%d", *self._server.server_address)
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        logging.info("Mock EPP server listening on %s:%d", *self._server.server_address)
+        self._server.serve_forever()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                try:
+                    tune_socket(self.request)
+                    sock = server.context.wrap_socket(self.request, server_side=True)
+                except (ssl.SSLError, OSError) as e:
+                    logging.warning("TLS handshake with %s failed: %s", self.client_address, e)
+                    return
+                with server._lock:
+                    server.sessions += 1
+                try:
+                    server._serve(sock)
+                finally:
+                    with server._lock:
+                        server.sessions -= 1
+                    sock.close()
+
+        return Handler
+
+    def _serve(self, sock):
+        reader = FrameReader(sock)
+        session = Session()
+        write_frames(sock, (self.greeting().encode("utf-8"),))
+        while True:
+            try:
+                payload = reader.read_frame()
+            except (ConnectionError, OSError):
+                return
+            if self.bucket:
+                self.bucket.acquire()
+            if self.latency:
+                time.sleep(self.latency)
+            response, close = self.handle(session, payload)
+            try:
+                write_frames(sock, (response.encode("utf-8"),))
+            except OSError:
+                return
+            if close:
+                return
+
+    def greeting(self):
+        return f"""<?xml version="1.0" encoding="UTF-8"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <greeting>
+    <svID>Mock NIC.IM EPP Server</svID>
+    <svDate>{_fmt(_now())}</svDate>
+    <svcMenu>
+      <version>1.0</version>
+      <lang>en</lang>
+      <objURI>{DOMAIN_NS}</objURI>
+      <objURI>{CONTACT_NS}</objURI>
+      <objURI>{HOST_NS}</objURI>
+    </svcMenu>
+    <dcp><access><all/></access><statement><purpose><admin/><prov/></purpose><recipient><ours/></recipient><retention><stated/></retention></statement></dcp>
+  </greeting>
+</epp>
+"""
+
+    def response(self, code, cltrid, res_data="", msg=None):
+        with self._lock:
+            self._svtrid += 1
+            svtrid = "MOCK-%d" % self._svtrid
+        cltrid_xml = f"<clTRID>{xml_escape(cltrid)}</clTRID>" if cltrid else ""
+        return f"""<?xml version="1.0" encoding="UTF-8"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <response>
+    <result code="{code}">
+      <msg>{xml_escape(msg or MESSAGES[code])}</msg>
+    </result>{res_data}
+    <trID>{cltrid_xml}<svTRID>{svtrid}</svTRID></trID>
+  </response>
+</epp>
+"""
+
+    def handle(self, session, payload):
+        """
+        Returns (response XML, close connection) for one command frame.
+        """
+        with self._lock:
+            self.commands += 1
+        try:
+            root = ET.fromstring(payload)
+        except ET.ParseError as e:
+            return self.response("2001", None, msg="Command syntax error: %s" % e), False
+        if root.find('epp:hello', NS) is not None:
+            return self.greeting(), False
+        command = root.find('epp:command', NS)
+        if command is None or not len(command):
+            return self.response("2001", None), False
+        cltrid = _text(command, 'epp:clTRID')
+        verb = _local(command[0].tag)
+        try:
+            if verb == "login":
+                return self.login(session, command[0], cltrid), False
+            if session.client_id is None:
+                raise EppError("2002", "Not logged in")
+            if verb == "logout":
+                session.client_id = None
+                return self.response("1500", cltrid), True
+            if verb == "poll":
+                with self.registry.lock:
+                    code, res_data = self.poll(session, command[0])
+                return self.response(code, cltrid, res_data), False
+            target = command[0][0] if len(command[0]) else None
+            if target is None:
+                raise EppError("2001")
+            handler = getattr(self, "%s_%s" % (self._object_type(target), verb), None)
+            if handler is None:
+                raise EppError("2001", "Unsupported command: %s" % verb)
+            with self.registry.lock:
+                code, res_data = handler(session, target, command[0])
+            return self.response(code, cltrid, res_data), False
+        except EppError as e:
+            return self.response(e.code, cltrid, msg=str(e)), e.code == "2502"
+        except (ValueError, AttributeError, KeyError) as e:
+            # Malformed input a handler did not anticipate; answer it rather than drop the session
+            logging.warning("Failed to handle %s command: %r", verb, e)
+            return self.response("2400", cltrid, msg="Command failed: %s" % e), False
+
+    def _object_type(self, element):
+        return {DOMAIN_NS: "domain", CONTACT_NS: "contact", HOST_NS: "host"}.get(element.tag[1:].split("}")[0])
+
+    def login(self, session, login, cltrid):
+        client_id = _text(login, 'epp:clID')
+        password = _text(login, 'epp:pw')
+        new_password = _text(login, 'epp:newPW')
+        if self.max_sessions and self.sessions > self.max_sessions:
+            raise EppError("2502")
+        with self.registry.lock:
+            accounts = self.registry.accounts
+            accounts.setdefault(client_id, password)
+            if accounts[client_id] != password:
+                raise EppError("2200")
+            if new_password:
+                accounts[client_id] = new_password
+        session.client_id = client_id
+        return self.response("1000", cltrid)
+
+    def poll(self, session, command):
+        queue = self.registry.messages.get(session.client_id) or deque()
+        if command.get("op") == "req":
+            if not queue:
+                return "1300", ""
+            message = queue[0]
+            return "1301", f"""
+    <msgQ count="{len(queue)}" id="{message['id']}">
+      <qDate>{_fmt(message['qdate'])}</qDate>
+      <msg>{xml_escape(message['text'])}</msg>
+    </msgQ>{message['res_data']}"""
+        if command.get("op") == "ack":
+            if not queue or queue[0]["id"] != command.get("msgID"):
+                raise EppError("2303", "Message not found")
+            message = queue.popleft()
+            return "1000", f"""
+    <msgQ count="{len(queue)}" id="{message['id']}"/>"""
+        raise EppError("2001", "Unknown poll op")
+
+    # Domain commands: each returns (code, resData XML) and runs under the registry lock
+
+    def _domain(self, target):
+        name = (_text(target, 'domain:name') or "").lower()
+        domain = self.registry.domains.get(name)
+        if domain is None:
+            raise EppError("2303")
+        return domain
+
+    def domain_check(self, session, target, command):
+        entries = []
+        for name_element in target.findall('domain:name', NS):
+            name = (name_element.text or "").strip()
+            if not valid_domain_name(name):
+                avail, reason = "0", "Invalid domain name"
+            elif name.lower() in self.registry.domains:
+                avail, reason = "0", "In use"
+            else:
+                avail, reason = "1", None
+            reason_xml = f"<domain:reason>{reason}</domain:reason>" if reason else ""
+            entries.append(f'<domain:cd><domain:name avail="{avail}">{xml_escape(name)}</domain:name>{reason_xml}</domain:cd>')
+        return "1000", f"""
+    <resData>
+      <domain:chkData xmlns:domain="{DOMAIN_NS}">{''.join(entries)}</domain:chkData>
+    </resData>"""
+
+    def domain_info(self, session, target, command):
+        domain = self._domain(target)
+        statuses = "".join(f'<domain:status s="{s}"/>' for s in sorted(domain["statuses"])) or '<domain:status s="ok"/>'
+        contacts = "".join(f'<domain:contact type="{ctype}">{xml_escape(cid)}</domain:contact>' for ctype, cid in domain["contacts"])
+        ns = "".join(f"<domain:hostAttr><domain:hostName>{xml_escape(host)}</domain:hostName></domain:hostAttr>" for host in domain["ns"])
+        auth = ""
+        if domain["cl_id"] in (None, session.client_id):
+            auth = f"<domain:authInfo><domain:pw>{xml_escape(domain['auth'])}</domain:pw></domain:authInfo>"
+        return "1000", f"""
+    <resData>
+      <domain:infData xmlns:domain="{DOMAIN_NS}">
+        <domain:name>{domain['name']}</domain:name>
+        <domain:roid>{domain['roid']}</domain:roid>
+        {statuses}
+        <domain:registrant>{xml_escape(domain['registrant'])}</domain:registrant>
+        {contacts}
+        <domain:ns>{ns}</domain:ns>
+        <domain:clID>{xml_escape(domain['cl_id'] or session.client_id)}</domain:clID>
+        <domain:crDate>{_fmt(domain['cr_date'])}</domain:crDate>
+        <domain:exDate>{_fmt(domain['ex_date'])}</domain:exDate>
+        {auth}
+      </domain:infData>
+    </resData>"""
+
+    def domain_create(self, session, target, command):
+        name = (_text(target, 'domain:name') or "").lower()
+        if not valid_domain_name(name):
+            raise EppError("2400", "Invalid domain name")
+        if name in self.registry.domains:
+            raise EppError("2302")
+        auth = _text(target, 'domain:authInfo/domain:pw')
+        if not auth:
+            raise EppError("2400", "authInfo is required")
+        period = _period(target)
+        contacts = {element.get("type"): (element.text or "").strip() for element in target.findall('domain:contact', NS)}
+        hosts = [self._ns_host(element) for element in target.iterfind('domain:ns/*', NS)]
+        self.registry.add_domain(name, period, auth, _text(target, 'domain:registrant'), contacts, hosts, session.client_id)
+        domain = self.registry.domains[name]
+        return "1000", f"""
+    <resData>
+      <domain:creData xmlns:domain="{DOMAIN_NS}">
+        <domain:name>{name}</domain:name>
+        <domain:crDate>{_fmt(domain['cr_date'])}</domain:crDate>
+        <domain:exDate>{_fmt(domain['ex_date'])}</domain:exDate>
+      </domain:creData>
+    </resData>"""
+
+    def domain_renew(self, session, target, command):
+        domain = self._domain(target)
+        if _text(target, 'domain:curExpDate') != domain["ex_date"].strftime("%Y-%m-%d"):
+            raise EppError("2306", "curExpDate does not match the current expiry date")
+        period = _period(target)
+        domain["ex_date"] = _add_years(domain["ex_date"], period)
+        return "1000", f"""
+    <resData>
+      <domain:renData xmlns:domain="{DOMAIN_NS}">
+        <domain:name>{domain['name']}</domain:name>
+        <domain:exDate>{_fmt(domain['ex_date'])}</domain:exDate>
+      </domain:renData>
+    </resData>"""
+
+    def domain_delete(self, session, target, command):
+        domain = self._domain(target)
+        if "clientDeleteProhibited" in domain["statuses"]:
+            raise EppError("2304")
+        del self.registry.domains[domain["name"]]
+        return "1000", ""
+
+    def domain_transfer(self, session, target, command):
+        domain = self._domain(target)
+        if command.get("op", "request") != "request":
+            raise EppError("2001", "Only transfer requests are supported")
+        if _text(target, 'domain:authInfo/domain:pw') != domain["auth"]:
+            raise EppError("2400", "Invalid authInfo")
+        if "clientTransferProhibited" in domain["statuses"]:
+            raise EppError("2304")
+        previous = domain["cl_id"] or "registry"
+        domain["cl_id"] = session.client_id
+        now = _fmt(_now())
+        res_data = f"""
+    <resData>
+      <domain:trnData xmlns:domain="{DOMAIN_NS}">
+        <domain:name>{domain['name']}</domain:name>
+        <domain:trStatus>serverApproved</domain:trStatus>
+        <domain:reID>{xml_escape(session.client_id)}</domain:reID>
+        <domain:reDate>{now}</domain:reDate>
+        <domain:acID>{xml_escape(previous)}</domain:acID>
+        <domain:acDate>{now}</domain:acDate>
+        <domain:exDate>{_fmt(domain['ex_date'])}</domain:exDate>
+      </domain:trnData>
+    </resData>"""
+        # The losing registrar is told about the transfer through its poll queue
+        self.registry.enqueue(previous, "Transfer approved.", res_data)
+        return "1000", res_data
+
+    def domain_update(self, session, target, command):
+        domain = self._domain(target)
+        add = target.find('domain:add', NS)
+        rem = target.find('domain:rem', NS)
+        chg = target.find('domain:chg', NS)
+        removes_lock = rem is not None and any(element.get("s") == "clientUpdateProhibited" for element in rem.findall('domain:status', NS))
+        if "clientUpdateProhibited" in domain["statuses"] and not removes_lock:
+            raise EppError("2304")
+        for section, adding in ((rem, False), (add, True)):
+            if section is None:
+                continue
+            for element in section:
+                kind = _local(element.tag)
+                if kind == "ns":
+                    for host in (self._ns_host(child) if adding else _local_host(child) for child in element):
+                        if adding and host not in domain["ns"]:
+                            domain["ns"].append(host)
+                        elif not adding and host in domain["ns"]:
+                            domain["ns"].remove(host)
+                elif kind == "contact":
+                    pair = (element.get("type"), (element.text or "").strip())
+                    if adding and pair[1] not in self.registry.contacts:
+                        raise EppError("2303", "Contact %s does not exist" % pair[1])
+                    if adding and pair not in domain["contacts"]:
+                        domain["contacts"].append(pair)
+                    elif not adding and pair in domain["contacts"]:
+                        domain["contacts"].remove(pair)
+                elif kind == "status":
+                    status = element.get("s")
+                    if not status.startswith("client"):
+                        raise EppError("2306", "Only client statuses may be changed")
+                    if adding:
+                        domain["statuses"].add(status)
+                    else:
+                        domain["statuses"].discard(status)
+        if chg is not None:
+            registrant = _text(chg, 'domain:registrant')
+            if registrant:
+                domain["registrant"] = registrant
+            auth = _text(chg, 'domain:authInfo/domain:pw')
+            if auth:
+                domain["auth"] = auth
+        return "1000", ""
+
+    def _ns_host(self, element):
+        host = _local_host(element)
+        if _local(element.tag) == "hostObj" and host not in self.registry.hosts:
+            raise EppError("2303", "Host %s does not exist" % host)
+        return host
+
+    # Contact commands
+
+    def _contact(self, target):
+        contact = self.registry.contacts.get(_text(target, 'contact:id'))
+        if contact is None:
+            raise EppError("2303")
+        return contact
+
+    def contact_check(self, session, target, command):
+        entries = []
+        for id_element in target.findall('contact:id', NS):
+            contact_id = (id_element.text or "").strip()
+            avail = "0" if contact_id in self.registry.contacts else "1"
+            reason = "" if avail == "1" else "<contact:reason>In use</contact:reason>"
+            entries.append(f'<contact:cd><contact:id avail="{avail}">{xml_escape(contact_id)}</contact:id>{reason}</contact:cd>')
+        return "1000", f"""
+    <resData>
+      <contact:chkData xmlns:contact="{CONTACT_NS}">{''.join(entries)}</contact:chkData>
+    </resData>"""
+
+    def contact_info(self, session, target, command):
+        contact = self._contact(target)
+        org = f"<contact:org>{xml_escape(contact['org'])}</contact:org>" if contact["org"] else ""
+        return "1000", f"""
+    <resData>
+      <contact:infData xmlns:contact="{CONTACT_NS}">
+        <contact:id>{xml_escape(contact['id'])}</contact:id>
+        <contact:roid>{contact['roid']}</contact:roid>
+        <contact:status s="ok"/>
+        <contact:postalInfo type="int">
+          <contact:name>{xml_escape(contact['name'])}</contact:name>{org}
+          <contact:addr><contact:cc>{contact['cc']}</contact:cc></contact:addr>
+        </contact:postalInfo>
+        <contact:email>{xml_escape(contact['email'])}</contact:email>
+        <contact:clID>{xml_escape(contact['cl_id'] or session.client_id)}</contact:clID>
+        <contact:crDate>{_fmt(contact['cr_date'])}</contact:crDate>
+      </contact:infData>
+    </resData>"""
+
+    def contact_create(self, session, target, command):
+        contact_id = _text(target, 'contact:id')
+        if not contact_id or not 3 <= len(contact_id) <= 16:
+            raise EppError("2004", "Contact ID must be 3-16 characters")
+        if contact_id in self.registry.contacts:
+            raise EppError("2302")
+        cc = _text(target, 'contact:postalInfo/contact:addr/contact:cc')
+        if not cc or not re.match(r"^[A-Z]{2}$", cc):
+            raise EppError("2002", "A valid two-letter country code is required")
+        self.registry.add_contact(contact_id, _text(target, 'contact:postalInfo/contact:name'), cc,
+                                  _text(target, 'contact:email'), _text(target, 'contact:postalInfo/contact:org'),
+                                  session.client_id)
+        contact = self.registry.contacts[contact_id]
+        return "1000", f"""
+    <resData>
+      <contact:creData xmlns:contact="{CONTACT_NS}">
+        <contact:id>{xml_escape(contact_id)}</contact:id>
+        <contact:crDate>{_fmt(contact['cr_date'])}</contact:crDate>
+      </contact:creData>
+    </resData>"""
+
+    def contact_delete(self, session, target, command):
+        contact = self._contact(target)
+        for domain in self.registry.domains.values():
+            if domain["registrant"] == contact["id"] or any(cid == contact["id"] for _, cid in domain["contacts"]):
+                raise EppError("2305")
+        del self.registry.contacts[contact["id"]]
+        return "1000", ""
+
+    # Host commands
+
+    def _host(self, target):
+        host = self.registry.hosts.get((_text(target, 'host:name') or "").lower())
+        if host is None:
+            raise EppError("2303")
+        return host
+
+    def _host_addresses(self, elements):
+        addresses = []
+        for element in elements:
+            try:
+                address = ipaddress.ip_address((element.text or "").strip())
+            except ValueError:
+                raise EppError("2005", "Invalid IP address")
+            if "v%d" % address.version != element.get("ip", "v4"):
+                raise EppError("2005", "IP address does not match its ip attribute")
+            addresses.append(address.compressed)
+        return addresses
+
+    def host_check(self, session, target, command):
+        entries = []
+        for name_element in target.findall('host:name', NS):
+            name = (name_element.text or "").strip()
+            avail = "0" if name.lower() in self.registry.hosts else "1"
+            reason = "" if avail == "1" else "<host:reason>In use</host:reason>"
+            entries.append(f'<host:cd><host:name avail="{avail}">{xml_escape(name)}</host:name>{reason}</host:cd>')
+        return "1000", f"""
+    <resData>
+      <host:chkData xmlns:host="{HOST_NS}">{''.join(entries)}</host:chkData>
+    </resData>"""
+
+    def host_create(self, session, target, command):
+        name = (_text(target, 'host:name') or "").lower()
+        if not valid_domain_name(name):
+            raise EppError("2005", "Invalid host name")
+        if name in self.registry.hosts:
+            raise EppError("2302")
+        addresses = self._host_addresses(target.findall('host:addr', NS))
+        superordinate = self.registry.superordinate(name)
+        if superordinate and not addresses:
+            raise EppError("2003", "Glue addresses are required for a host under %s" % superordinate)
+        if not superordinate and addresses:
+            raise EppError("2306", "Glue addresses are not allowed for an external host")
+        self.registry.add_host(name, addresses, session.client_id)
+        return "1000", f"""
+    <resData>
+      <host:creData xmlns:host="{HOST_NS}">
+        <host:name>{name}</host:name>
+        <host:crDate>{_fmt(self.registry.hosts[name]['cr_date'])}</host:crDate>
+      </host:creData>
+    </resData>"""
+
+    def host_info(self, session, target, command):
+        host = self._host(target)
+        statuses = "".join(f'<host:status s="{s}"/>' for s in sorted(host["statuses"])) or '<host:status s="ok"/>'
+        addresses = "".join(f'<host:addr ip="v{ipaddress.ip_address(address).version}">{address}</host:addr>'
+                            for address in host["addrs"])
+        return "1000", f"""
+    <resData>
+      <host:infData xmlns:host="{HOST_NS}">
+        <host:name>{host['name']}</host:name>
+        <host:roid>{host['roid']}</host:roid>
+        {statuses}
+        {addresses}
+        <host:clID>{xml_escape(host['cl_id'] or session.client_id)}</host:clID>
+        <host:crDate>{_fmt(host['cr_date'])}</host:crDate>
+      </host:infData>
+    </resData>"""
+
+    def host_update(self, session, target, command):
+        host = self._host(target)
+        addresses = list(host["addrs"])
+        statuses = set(host["statuses"])
+        for section, adding in ((target.find('host:rem', NS), False), (target.find('host:add', NS), True)):
+            if section is None:
+                continue
+            for address in self._host_addresses(section.findall('host:addr', NS)):
+                if adding and address not in addresses:
+                    addresses.append(address)
+                elif not adding and address in addresses:
+                    addresses.remove(address)
+            for element in section.findall('host:status', NS):
+                if not element.get("s", "").startswith("client"):
+                    raise EppError("2306", "Only client statuses may be changed")
+                (statuses.add if adding else statuses.discard)(element.get("s"))
+        name = (_text(target, 'host:chg/host:name') or host["name"]).lower()
+        if name != host["name"] and name in self.registry.hosts:
+            raise EppError("2302")
+        superordinate = self.registry.superordinate(name)
+        if superordinate and not addresses:
+            raise EppError("2003", "Glue addresses are required for a host under %s" % superordinate)
+        host["addrs"] = addresses
+        host["statuses"] = statuses
+        if name != host["name"]:
+            del self.registry.hosts[host["name"]]
+            for domain in self.registry.domains.values():
+                domain["ns"] = [name if ns == host["name"] else ns for ns in domain["ns"]]
+            host["name"] = name
+            self.registry.hosts[name] = host
+        return "1000", ""
+
+    def host_delete(self, session, target, command):
+        host = self._host(target)
+        if any(host["name"] in domain["ns"] for domain in self.registry.domains.values()):
+            raise EppError("2305")
+        del self.registry.hosts[host["name"]]
+        return "1000", ""
+
+def _local_host(element):
+    # <domain:hostObj>name</domain:hostObj> or <domain:hostAttr><domain:hostName>name</...>
+    if _local(element.tag) == "hostAttr":
+        return (_text(element, 'domain:hostName') or "").lower()
+    return (element.text or "").strip().lower()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock NIC.IM EPP server.")
+    parser.add_argument("--certfile", required=True)
+    parser.add_argument("--keyfile", required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=MOCK_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every command")
+    parser.add_argument("--max-rate", type=float, default=None, help="commands per second across all sessions")
+    parser.add_argument("--max-sessions", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    server = MockEppServer(args.certfile, args.keyfile, args.host, args.port, latency=args.latency,
+                           max_rate=args.max_rate, max_sessions=args.max_sessions)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
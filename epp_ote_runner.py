@@ -10,14 +10,18 @@ required EPP operations in order.
 """
 
 import socket
-import ssl
+import select
 import logging
 import time
-import struct
-import uuid
+from collections import OrderedDict, deque
 from epp_commands import *
-from xml.dom import minidom
-import xml.etree.ElementTree as ET
+from epp_response import EppResponse, LazyPrettyXml
+from epp_transcript import Transcript, MaskedXml
+from epp_transport import HEADER, FrameReader, write_frames, shared_ssl_context, tune_socket
+from epp_scheduler import READ_ONLY_COMMANDS
+from epp_metrics import command_type
+from epp_plan import Step, ResultOf, run_plan, format_report
+from epp_stream import parse_fields
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
 
@@ -26,133 +30,446 @@ PORT = 700
 CLIENT_ID = ""      # Enter username supplied by NIC.IM registry here
 PASSWORD = ""       # Enter password supplied by NIC.IM registry here
 NEW_PASSWORD = ""   # Create a new password here for OT&E test
+TRANSCRIPT_PATH = ""  # Optional JSONL file to capture all EPP traffic to (passwords masked)
+CA_FILE = ""          # Optional CA certificate to trust, e.g. the cert of a local epp_mock_server
+CERT_FILE = ""        # Optional client certificate, if the registry requires one
+KEY_FILE = ""         # Private key for CERT_FILE, if it is not included in that file
+
+PLAN_SESSIONS = 4     # Sessions used to run independent OT&E steps concurrently
+PIPELINE_WINDOW = 16   # Maximum number of commands awaiting a response in pipelined mode
+
+# Place BARRIER between pipelined commands that must not overlap, e.g. after a
+# command that changes state later commands depend on.
+BARRIER = object()
+
+# Result codes after which the server closes the connection
+SESSION_ENDING_CODES = ("2500", "2501", "2502")
+
+# (host, port) -> (SSL context, ssl.SSLSession) of the most recent connection, so a
+# new connection, from any client, can resume the TLS session instead of a full handshake.
+_tls_sessions = {}
+
+def _is_barrier_command(xml):
+    # Session commands and anything without a clTRID (hello) cannot be matched
+    # by clTRID, so they always run on their own.
+    return "<login>" in xml or "<logout/>" in xml or extract_cltrid(xml) is None
 
 class EppClient:
-    def __init__(self, host, port):
+    def __init__(self, host, port, transcript=None, ssl_context=None, certfile=None, keyfile=None):
         self.host = host
         self.port = port
+        self.ssl_context = ssl_context
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.credentials = None  # (username, password) of the last login, used by reconnect()
         self.sock = None
         self.ssl_sock = None
+        self.transcript = transcript
+        self.observers = []  # objects with observe(xml, response), e.g. a DomainCache
+        self.metrics = None  # optional EppMetrics recording latency, bytes and result codes
+        self._reader = None
+        self._in_flight = OrderedDict()  # clTRID -> (command type, time written), with metrics only
+        self._last_command = None
 
     def connect(self):
         logging.info("Connecting to %s:%d", self.host, self.port)
+        if self.metrics is not None and self.ssl_sock is not None:
+            self.metrics.count_reconnect()
+        self._forget_in_flight()
         raw_sock = socket.create_connection((self.host, self.port))
-        context = ssl.create_default_context()
-        self.ssl_sock = context.wrap_socket(raw_sock, server_hostname=self.host)
-        logging.info("Connected.")
-        greeting = self.read()
-        try:
-            formatted_greeting = minidom.parseString(greeting).toprettyxml(indent="  ")
-        except Exception:
-            formatted_greeting = greeting  # fallback if not valid XML
-        logging.info("Server Greeting:\n%s", formatted_greeting)
+        tune_socket(raw_sock)
+        context = self.ssl_context or shared_ssl_context(certfile=self.certfile, keyfile=self.keyfile)
+        cached = _tls_sessions.get((self.host, self.port))
+        session = cached[1] if cached and cached[0] is context else None
+        self.ssl_sock = context.wrap_socket(raw_sock, server_hostname=self.host, session=session)
+        logging.info("Connected%s.", " (TLS session resumed)" if self.ssl_sock.session_reused else "")
+        greeting = self.read_bytes()
+        logging.info("Server Greeting:\n%s", LazyPrettyXml(greeting))
+        # With TLS 1.3 the session ticket arrives after the handshake, so it is only
+        # available once something (the greeting) has been read.
+        if self.ssl_sock.session is not None:
+            _tls_sessions[(self.host, self.port)] = (context, self.ssl_sock.session)
+
+    def login(self, username, password):
+        """
+        Logs in and remembers the credentials so reconnect() can log in again. Returns
+        the EppResponse; raises ConnectionError if the login is refused.
+        """
+        self.send(build_login(username, password))
+        response = self.read_response()
+        if response.code != "1000":
+            raise ConnectionError("Login failed:\n%s" % response.text)
+        self.credentials = (username, password)
+        return response
+
+    def reconnect(self):
+        """
+        Replaces the connection with a new one and logs in again if login() was used.
+        """
+        self.disconnect()
+        self.connect()
+        if self.credentials:
+            self.login(*self.credentials)
+
+    def transact(self, xml, retries=1):
+        """
+        Sends a command and returns its EppResponse, restoring the session if the
+        connection has dropped (e.g. after a server idle timeout). After reconnecting,
+        read-only commands (check, info, hello) are resent up to `retries` times; for
+        any other command the error is raised, since the server may have processed it.
+        A response ending the session (2500-2502) is returned after reconnecting.
+        """
+        attempt = 0
+        while True:
+            try:
+                self.send(xml)
+                response = self.read_response()
+            except (ConnectionError, OSError) as e:
+                if self.credentials is None:
+                    raise
+                logging.warning("Connection to %s lost (%s); reconnecting.", self.host, e)
+                self.reconnect()
+                if attempt >= retries or describe_command(xml).command not in READ_ONLY_COMMANDS:
+                    raise
+                attempt += 1
+                continue
+            self.notify(xml, response)
+            if response.code in SESSION_ENDING_CODES and self.credentials:
+                self.reconnect()
+            return response
 
     def send(self, xml):
-        data = xml.encode("utf-8")
-        total_len = len(data) + 4
-        header = struct.pack("!I", total_len)
-        self.ssl_sock.sendall(header + data)
+        self._write((xml,))
+
+    def send_many(self, xmls):
+        """
+        Writes several commands back to back in a single write.
+        """
+        self._write(xmls)
+
+    def send_framed(self, data):
+        """
+        Writes a frame built in advance with epp_transport.frame(), as it is. With
+        metrics, it is counted like any other command once it has been written, with
+        no serialize time since that was spent when the frame was built.
+        """
+        if self.metrics is None:
+            self.ssl_sock.sendall(data)
+        else:
+            start = time.perf_counter()
+            self.ssl_sock.sendall(data)
+            written = time.perf_counter()
+            self._record_sent((data[HEADER.size:],), None, written - start, written)
+        if self.transcript:
+            self.transcript.record("out", data[HEADER.size:])
+
+    def response_ready(self, timeout=0):
+        """
+        Returns True if a response is waiting to be read: a whole frame is buffered, or
+        data is (or arrives within `timeout` seconds) on the connection.
+        """
+        if self._frame_reader().has_buffered_frame() or self.ssl_sock.pending():
+            return True
+        return bool(select.select([self.ssl_sock], [], [], timeout)[0])
+
+    def _write(self, xmls):
+        if self.metrics is None:
+            payloads = [xml if isinstance(xml, bytes) else xml.encode("utf-8") for xml in xmls]
+            write_frames(self.ssl_sock, payloads)
+        else:
+            # Serialize (encode) and write (frame and send) are timed separately
+            start = time.perf_counter()
+            payloads = [xml if isinstance(xml, bytes) else xml.encode("utf-8") for xml in xmls]
+            if not payloads:
+                return
+            serialized = time.perf_counter()
+            write_frames(self.ssl_sock, payloads)
+            written = time.perf_counter()
+            self._record_sent(payloads, (serialized - start) / len(payloads),
+                              (written - serialized) / len(payloads), written)
+        if self.transcript:
+            for data in payloads:
+                self.transcript.record("out", data)
+
+    def _record_sent(self, payloads, serialize_share, write_share, written):
+        # Per-command serialize (None if not measured) and write times, and the commands
+        # now awaiting a response, so _record_received can match them.
+        for payload in payloads:
+            command = command_type(payload)
+            if serialize_share is not None:
+                self.metrics.observe("serialize", command, serialize_share)
+            self.metrics.observe("write", command, write_share)
+            self._in_flight[extract_cltrid(payload) or object()] = (command, written)
+        self.metrics.sent(len(payloads), sum(len(payload) + HEADER.size for payload in payloads))
 
     def read(self):
-        header = self.ssl_sock.recv(4)
-        if len(header) < 4:
-            raise ConnectionError("Failed to read message length header.")
-        total_len = struct.unpack("!I", header)[0]
-        payload_len = total_len - 4
-        response = b""
-        while len(response) < payload_len:
-            chunk = self.ssl_sock.recv(payload_len - len(response))
-            if not chunk:
-                raise ConnectionError("Unexpected disconnect during response read.")
-            response += chunk
-        return response.decode("utf-8")
+        return self.read_bytes().decode("utf-8")
+
+    def read_bytes(self):
+        """
+        Returns the payload of the next frame as undecoded bytes.
+        """
+        payload = self._frame_reader().read_frame()
+        if self.metrics is not None:
+            self._last_command = self._record_received(payload)
+        if self.transcript:
+            self.transcript.record("in", payload)
+        return payload
+
+    def read_fields(self, *fields):
+        """
+        Reads the next response and returns a dict of just the requested fields, e.g.
+        read_fields("code", "ex_date"). See epp_stream for the available fields. The
+        response is parsed as it arrives, without holding the whole frame in memory
+        or building an element tree.
+        """
+        if self.transcript or self.metrics is not None:
+            return parse_fields(self.read_bytes(), fields)  # both need the whole payload
+        return parse_fields(self._frame_reader().read_frame_chunks(), fields)
+
+    def _frame_reader(self):
+        if self._reader is None or self._reader.sock is not self.ssl_sock:
+            self._reader = FrameReader(self.ssl_sock)
+        return self._reader
+
+    def _record_received(self, payload):
+        # Match the response to the command it answers, falling back to the oldest
+        # outstanding one, and record the time since that command was written.
+        received = time.perf_counter()
+        entry = self._in_flight.pop(extract_cltrid(payload), None)
+        if entry is None and self._in_flight:
+            entry = self._in_flight.popitem(last=False)[1]
+        self.metrics.received(len(payload) + HEADER.size, matched=entry is not None)
+        if entry is None:
+            return None
+        command, written = entry
+        self.metrics.observe("wait", command, received - written)
+        return command
+
+    def read_response(self):
+        payload = self.read_bytes()
+        if self.metrics is None:
+            return EppResponse(payload)
+        start = time.perf_counter()
+        response = EppResponse(payload)
+        code = response.code
+        command = self._last_command or "unknown"
+        self.metrics.observe("parse", command, time.perf_counter() - start)
+        self.metrics.count_response(command, code)
+        return response
+
+    def notify(self, xml, response):
+        """
+        Passes a command and its EppResponse to every registered observer.
+        """
+        for observer in self.observers:
+            observer.observe(xml, response)
+
+    def pipeline(self, commands, window=PIPELINE_WINDOW):
+        """
+        Sends commands back to back, keeping up to `window` of them awaiting a response,
+        and returns the responses (EppResponse objects) in the same order as the commands.
+
+        Responses are matched to commands by <clTRID>. A response without one (e.g. a
+        2001 syntax error) is assigned to the oldest outstanding command. BARRIER entries
+        wait for every outstanding response before anything after them is sent; they do
+        not produce a response. Login, logout and hello are always sent on their own.
+        """
+        return list(self.iter_pipeline(commands, window))
+
+    def iter_pipeline(self, commands, window=PIPELINE_WINDOW):
+        """
+        Streaming form of pipeline(): takes commands from any iterable as the window has
+        room for them and yields each response, in command order, as soon as it and
+        every earlier one have arrived. The window stays full throughout, and neither
+        the commands nor the responses are ever all held in memory.
+        """
+        if window < 1:
+            raise ValueError("Pipeline window must be at least 1.")
+        responses = {}           # index -> response not yet yielded
+        unanswered = deque()     # (index, command) not yet yielded, in command order
+        pending = OrderedDict()  # clTRID -> index
+        outgoing = []            # commands not yet written
+        for index, xml in enumerate(commands):
+            if xml is BARRIER:
+                self._drain(pending, responses, outgoing, 0)
+                yield from self._answered(unanswered, responses)
+                continue
+            unanswered.append((index, xml))
+            if _is_barrier_command(xml):
+                self._drain(pending, responses, outgoing, 0)
+                self.send(xml)
+                responses[index] = self.read_response()
+                yield from self._answered(unanswered, responses)
+                continue
+            cltrid = extract_cltrid(xml)
+            if cltrid in pending:
+                raise ValueError("Duplicate clTRID in pipeline: %s" % cltrid)
+            self._drain(pending, responses, outgoing, window - 1)
+            yield from self._answered(unanswered, responses)
+            pending[cltrid] = index
+            outgoing.append(xml)
+        self._drain(pending, responses, outgoing, 0)
+        yield from self._answered(unanswered, responses)
+
+    def _answered(self, unanswered, responses):
+        # Yields responses that are next in command order, notifying observers
+        while unanswered and unanswered[0][0] in responses:
+            index, xml = unanswered.popleft()
+            response = responses.pop(index)
+            self.notify(xml, response)
+            yield response
+
+    def _drain(self, pending, responses, outgoing, limit):
+        if len(pending) > limit and outgoing:
+            self.send_many(outgoing)
+            outgoing.clear()
+        while len(pending) > limit:
+            response = self.read_response()
+            index = pending.pop(extract_cltrid(response.raw), None)
+            if index is None:
+                cltrid, index = pending.popitem(last=False)
+                logging.warning("Response without matching clTRID assigned to %s", cltrid)
+            responses[index] = response
+
+    def _forget_in_flight(self):
+        # Commands still awaiting a response will never get one on this connection.
+        if self.metrics is not None and self._in_flight:
+            self.metrics.abandon(len(self._in_flight))
+        self._in_flight.clear()
 
     def disconnect(self):
+        self._forget_in_flight()
         if self.ssl_sock:
             self.ssl_sock.close()
         logging.info("Disconnected.")
 
 def send_and_expect(client, xml, expected_code="1000", expect_result_code=True):
-    logging.info("Sending:\n%s", xml)
+    logging.info("Sending:\n%s", MaskedXml(xml))
     client.send(xml)
-    response = client.read()
+    response = client.read_response()
+    client.notify(xml, response)
 
-    try:
-        formatted_response = minidom.parseString(response).toprettyxml(indent="  ")
-    except Exception:
-        formatted_response = response  # fallback if not valid XML
-
-    logging.info("Received:\n%s", formatted_response)
-    if expect_result_code and f'result code="{expected_code}"' not in response:
-        logging.error("Expected code %s but got:\n%s", expected_code, response)
+    logging.info("Received:\n%s", LazyPrettyXml(response.raw))
+    if expect_result_code and expected_code not in response.codes:
+        logging.error("Expected code %s but got:\n%s", expected_code, response.text)
         raise SystemExit(1)
+    return response
+
+def send_and_expect_pipelined(client, commands, window=PIPELINE_WINDOW):
+    """
+    Pipelined counterpart of send_and_expect.
+
+    - commands: sequence of (xml, expected_code) tuples, or BARRIER. An expected_code
+      of None skips the result code check for that command (e.g. for hello).
+    Returns the responses, as EppResponse objects, in command order.
+    """
+    commands = list(commands)
+    batch = [command if command is BARRIER else command[0] for command in commands]
+    expected = [command[1] for command in commands if command is not BARRIER]
+    for xml in batch:
+        if xml is not BARRIER:
+            logging.info("Sending:\n%s", MaskedXml(xml))
+    responses = client.pipeline(batch, window=window)
+
+    for response, expected_code in zip(responses, expected):
+        logging.info("Received:\n%s", LazyPrettyXml(response.raw))
+        if expected_code is not None and expected_code not in response.codes:
+            logging.error("Expected code %s but got:\n%s", expected_code, response.text)
+            raise SystemExit(1)
+    return responses
 
-def get_expiry_date_from_info(client, domain):
+def get_expiry_date_from_info(client, domain, cache=None):
+    if cache is not None:
+        record = cache.get(domain)
+        if record and record.get("ex_date"):
+            return record["ex_date"]
     logging.info("Requesting domain info for expiry date...")
     xml = build_domain_info(domain)
-    logging.info("Sending:\n%s", xml)
+    logging.info("Sending:\n%s", MaskedXml(xml))
     client.send(xml)
-    response = client.read()
-    logging.info("Received:\n%s", response)
+    response = client.read_response()
+    client.notify(xml, response)
+    if cache is not None and cache not in client.observers:
+        cache.observe(xml, response)
+    logging.info("Received:\n%s", LazyPrettyXml(response.raw))
 
     try:
-        root = ET.fromstring(response)
-        ns = {'domain': 'urn:ietf:params:xml:ns:domain-1.0'}
-        exdate = root.find('.//domain:exDate', ns)
-        if exdate is None:
-            logging.error("No <domain:exDate> found in domain info response.")
-            raise SystemExit(1)
-        return exdate.text.split('T')[0]  # Extract YYYY-MM-DD
+        exdate = response.ex_date
     except Exception as e:
         logging.error("Failed to parse expiry date: %s", e)
         raise SystemExit(1)
+    if exdate is None:
+        logging.error("No <domain:exDate> found in domain info response.")
+        raise SystemExit(1)
+    return exdate
+
+NAMESERVERS = ["ns1.example.org", "ns2.example.org"]
+
+# OT&E steps run after the password change. Steps without `after` (or a ResultOf
+# argument) have no ordering requirement and may run concurrently; the epp.im
+# steps form one chain because each depends on the state the previous one left.
+OTE_PLAN = [
+    Step("hello", build_hello, expected_code=None),
+    Step("create deleteme.im", build_domain_create, "deleteme.im", 1, "abc123", "dom001", "dom002", "dom003", "dom004", NAMESERVERS),
+    Step("create maximum.im", build_domain_create, "maximum.im", 10, "abc123", "dom001", "dom002", "dom003", "dom004", NAMESERVERS),
+    Step("create 63-character name", build_domain_create, "abcdefghijklmnopqrstuvwxyz1234567890abcdefghijklmnopqrstuvwxy.im", 1, "abc123", "dom001", "dom002", "dom003", "dom004", NAMESERVERS),
+    Step("check xyz123.im", build_domain_check, "xyz123.im"),
+    Step("check advsys.co.im", build_domain_check, "advsys.co.im"),
+    Step("info domicilium.im", build_domain_info, "domicilium.im"),
+    Step("info renewme.im", build_domain_info, "renewme.im"),
+    Step("renew renewme.im", build_domain_renew, "renewme.im", ResultOf("info renewme.im", "ex_date"), 10),
+    Step("delete deleteme.im", build_domain_delete, "deleteme.im", after=["create deleteme.im"]),
+    Step("transfer epp.im", build_domain_transfer, "epp.im", "qazxsw"),
+    Step("info epp.im after transfer", build_domain_info, "epp.im", after=["transfer epp.im"]),
+    Step("update epp.im admin contact", build_domain_update, "epp.im", add_contacts={"admin": "CH1234"}, after=["info epp.im after transfer"]),
+    Step("update epp.im add status", build_domain_update, "epp.im", add_statuses=["clientUpdateProhibited"], status_message="Payment Overdue", after=["update epp.im admin contact"]),
+    Step("info epp.im with status", build_domain_info, "epp.im", after=["update epp.im add status"]),
+    Step("update epp.im remove status", build_domain_update, "epp.im", rem_statuses=["clientUpdateProhibited"], after=["info epp.im with status"]),
+    Step("update epp.im add glue ns", build_domain_update, "epp.im", add_ns=[("ns1.epp.im", "10.0.0.1")], after=["update epp.im remove status"]),
+    Step("update epp.im add ns", build_domain_update, "epp.im", add_ns=["ns1.example.org"], after=["update epp.im add glue ns"]),
+    Step("info epp.im with ns", build_domain_info, "epp.im", after=["update epp.im add ns"]),
+    Step("update epp.im remove glue ns", build_domain_update, "epp.im", rem_ns=[("ns1.epp.im", "10.0.0.1")], after=["info epp.im with ns"]),
+    Step("create contact HAR001", build_contact_create, "HAR001", "Chris Harper", "Harper Industries", "charper@domicilium.com", "01624823833", ["Domicilium House", "Malew Street"], "Castletown", "Isle of Man", "IM9 1AE", "GB", "qwertyuiop", "01624823899"),
+    Step("create without authcode", build_domain_create_no_authcode, "exception.im", 1, "", "dom001", "dom002", "dom003", "dom004", NAMESERVERS, expected_code="2400"),
+    Step("transfer with wrong authcode", build_domain_transfer, "transfer3.im", "1234", expected_code="2400"),
+    Step("create invalid name", build_domain_create, "1ylewOAxia8rl38rle2iesluql1broesoeGie6ROAs4oaBro6bluviespLAxiUstl.im", 1, "abc123", "dom001", "dom002", "dom003", "dom004", NAMESERVERS, expected_code="2400"),
+    Step("create contact without country", build_contact_create, "JS1234", "John Smith", "Acme Widgets", "jsmith@acmewidgets.com", "01624823833", ["Acme House", "Acme Street"], "Castletown", "Isle of Man", "IM9 1AE", None, "qwertyuiop", "01624823899", expected_code="2002"),
+]
 
 def run_ote_sequence():
-    client = EppClient(HOST, PORT)
-    client.connect()
-
-    send_and_expect(client, build_login(CLIENT_ID, PASSWORD))
-    send_and_expect(client, build_hello(), expect_result_code=False)
-    send_and_expect(client, build_logout(), expected_code="1500")
-
-    client.connect()
-    send_and_expect(client, build_login_with_newpw(CLIENT_ID, PASSWORD, NEW_PASSWORD))
-    send_and_expect(client, build_logout(), expected_code="1500")
-
-    client.connect()
-    send_and_expect(client, build_login(CLIENT_ID, NEW_PASSWORD))
-    send_and_expect(client, build_hello(), expect_result_code=False)
-    send_and_expect(client, build_domain_create("deleteme.im", 1, "abc123","dom001", "dom002","dom003", "dom004",["ns1.example.org", "ns2.example.org"]))
-    send_and_expect(client, build_domain_create("maximum.im", 10, "abc123", "dom001", "dom002", "dom003", "dom004",["ns1.example.org", "ns2.example.org"]))
-    send_and_expect(client, build_domain_create("abcdefghijklmnopqrstuvwxyz1234567890abcdefghijklmnopqrstuvwxy.im", 1, "abc123", "dom001", "dom002", "dom003", "dom004",["ns1.example.org", "ns2.example.org"]))
-    send_and_expect(client, build_domain_check("xyz123.im"))
-    send_and_expect(client, build_domain_check("advsys.co.im"))
-    send_and_expect(client, build_domain_info("domicilium.im"))
-
-    expiry = get_expiry_date_from_info(client, "renewme.im")
-    send_and_expect(client, build_domain_renew("renewme.im", expiry, 10))
-    send_and_expect(client, build_domain_delete("deleteme.im"))
-    send_and_expect(client, build_domain_transfer("epp.im", "qazxsw"))
-    send_and_expect(client, build_domain_info("epp.im"))
-    send_and_expect(client, build_domain_update("epp.im", add_contacts={"admin": "CH1234"}))
-
-    send_and_expect(client, build_domain_update("epp.im", add_statuses=["clientUpdateProhibited"], status_message="Payment Overdue"))
-    send_and_expect(client, build_domain_info("epp.im"))
-    send_and_expect(client, build_domain_update("epp.im", rem_statuses=["clientUpdateProhibited"]))
-    send_and_expect(client, build_domain_update("epp.im", add_ns=[("ns1.epp.im", "10.0.0.1")]))
-    send_and_expect(client, build_domain_update("epp.im", add_ns=["ns1.example.org"]))
-    send_and_expect(client, build_domain_info("epp.im"))
-    send_and_expect(client, build_domain_update("epp.im", rem_ns=[("ns1.epp.im", "10.0.0.1")]))
-
-
-    send_and_expect(client, build_contact_create("HAR001", "Chris Harper", "Harper Industries", "charper@domicilium.com", "01624823833", ["Domicilium House", "Malew Street"], "Castletown", "Isle of Man", "IM9 1AE", "GB", "qwertyuiop", "01624823899"))
-    send_and_expect(client, build_domain_create_no_authcode("exception.im", 1, "", "dom001", "dom002", "dom003", "dom004", ["ns1.example.org", "ns2.example.org"]), expected_code="2400")
-    send_and_expect(client, build_domain_transfer("transfer3.im", "1234"), expected_code="2400")
-    send_and_expect(client, build_domain_create("1ylewOAxia8rl38rle2iesluql1broesoeGie6ROAs4oaBro6bluviespLAxiUstl.im", 1, "abc123", "dom001", "dom002", "dom003", "dom004", ["ns1.example.org", "ns2.example.org"]), expected_code="2400")
-    send_and_expect(client, build_contact_create("JS1234", "John Smith", "Acme Widgets", "jsmith@acmewidgets.com", "01624823833", ["Acme House", "Acme Street"], "Castletown", "Isle of Man", "IM9 1AE", None, "qwertyuiop", "01624823899"), expected_code="2002")
-
-    client.disconnect()
-    logging.info("OT&E Test completed successfully.")
+    transcript = Transcript(TRANSCRIPT_PATH).start() if TRANSCRIPT_PATH else None
+    try:
+        ssl_context = shared_ssl_context(CA_FILE or None, CERT_FILE or None, KEY_FILE or None)
+        client = EppClient(HOST, PORT, transcript=transcript, ssl_context=ssl_context)
+        client.connect()
+
+        send_and_expect(client, build_login(CLIENT_ID, PASSWORD))
+        send_and_expect(client, build_hello(), expect_result_code=False)
+        send_and_expect(client, build_logout(), expected_code="1500")
+
+        client.connect()
+        send_and_expect(client, build_login_with_newpw(CLIENT_ID, PASSWORD, NEW_PASSWORD))
+        send_and_expect(client, build_logout(), expected_code="1500")
+        client.disconnect()
+
+        # The remaining steps are independent of the session they run on, so they run
+        # concurrently over a pool of sessions logged in with the new password.
+        from epp_pool import EppSessionPool  # imported here as epp_pool imports this module
+        pool = EppSessionPool(HOST, PORT, CLIENT_ID, NEW_PASSWORD, size=PLAN_SESSIONS,
+                              ssl_context=ssl_context, transcript=transcript).start()
+        try:
+            results = run_plan(pool, OTE_PLAN)
+        finally:
+            pool.close()
+        logging.info("OT&E plan report:\n%s", format_report(results))
+        if any(result.status != "ok" for result in results):
+            raise SystemExit(1)
+        logging.info("OT&E Test completed successfully.")
+    finally:
+        # Also on failure, so the transcript of a failed run is kept
+        if transcript:
+            transcript.close()
 
 
 if __name__ == '__main__':
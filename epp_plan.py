@@ -0,0 +1,184 @@
+"""
+epp_plan.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Declarative test plans. A plan is a list of Steps, each naming a build_* function and
+its arguments, the result code it must return and the steps it has to wait for. An
+argument can be ResultOf(step, field) to use a field of an earlier step's EppResponse
+(e.g. the exDate from an info before a renew); the step then depends on that one
+automatically. run_plan() sends every step whose dependencies have succeeded, running
+independent steps concurrently across the sessions of an EppSessionPool, and returns
+a StepResult with the code and timing of every step.
+
+Usage:
+plan = [
+    Step("info renewme.im", build_domain_info, "renewme.im"),
+    Step("renew renewme.im", build_domain_renew, "renewme.im", ResultOf("info renewme.im", "ex_date"), 1),
+    Step("check xyz123.im", build_domain_check, "xyz123.im"),
+]
+results = run_plan(pool, plan)
+logging.info("Plan report:\n%s", format_report(results))
+"""
+
+import time
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from epp_response import LazyPrettyXml
+from epp_transcript import MaskedXml
+
+StepResult = namedtuple("StepResult", ["name", "status", "code", "expected_code", "started", "elapsed", "msg"])
+
+class ResultOf(namedtuple("ResultOf", ["step", "field"])):
+    """
+    Placeholder argument for a field of an earlier step's EppResponse.
+    """
+    __slots__ = ()
+
+class Step:
+    def __init__(self, name, builder, *args, expected_code="1000", after=(), **kwargs):
+        """
+        - builder: build_* function called with args/kwargs when the step runs, so
+          every run gets a fresh clTRID
+        - expected_code: result code the step must return, or None to skip the check
+        - after: names of steps that must succeed before this one is sent
+        """
+        self.name = name
+        self.builder = builder
+        self.args = args
+        self.kwargs = kwargs
+        self.expected_code = expected_code
+        self.depends = set(after)
+        self.depends.update(value.step for value in list(args) + list(kwargs.values()) if isinstance(value, ResultOf))
+
+    def build(self, context):
+        """
+        Returns the command XML, resolving ResultOf arguments from `context`
+        (step name -> EppResponse).
+        """
+        def resolve(value):
+            return getattr(context[value.step], value.field) if isinstance(value, ResultOf) else value
+        return self.builder(*[resolve(value) for value in self.args],
+                            **{key: resolve(value) for key, value in self.kwargs.items()})
+
+def validate_plan(steps):
+    """
+    Raises ValueError for duplicate step names, unknown dependencies or a cycle.
+    """
+    names = [step.name for step in steps]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        raise ValueError("Duplicate step names: %s" % ", ".join(duplicates))
+    for step in steps:
+        unknown = step.depends - set(names)
+        if unknown:
+            raise ValueError("Step %r depends on unknown steps: %s" % (step.name, ", ".join(sorted(unknown))))
+    done = set()
+    remaining = list(steps)
+    while remaining:
+        ready = [step for step in remaining if step.depends <= done]
+        if not ready:
+            raise ValueError("Dependency cycle between steps: %s" % ", ".join(step.name for step in remaining))
+        done.update(step.name for step in ready)
+        remaining = [step for step in remaining if step.name not in done]
+
+def run_plan(pool, steps, workers=None, fail_fast=True):
+    """
+    Runs a plan and returns a StepResult per step, in plan order.
+
+    Steps are sent as soon as all their dependencies have succeeded, up to `workers`
+    at a time (default: the pool size), each on a session checked out from `pool`.
+    A step whose dependency failed is skipped. With fail_fast, the first failure stops
+    any further steps from being sent; steps already running are allowed to finish.
+    """
+    validate_plan(steps)
+    workers = workers or pool.size
+    context = {}   # step name -> EppResponse of a successful step
+    results = {}   # step name -> StepResult
+    # Start the longest chains of dependent steps first; they bound the total time.
+    chain = _chain_lengths(steps)
+    waiting = sorted(steps, key=lambda step: -chain[step.name])
+    running = {}   # future -> step
+    origin = time.monotonic()
+    failed = False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while waiting or running:
+            if not (failed and fail_fast):
+                for step in list(waiting):
+                    if len(running) >= workers:
+                        break
+                    if any(name in results and results[name].status != "ok" for name in step.depends):
+                        waiting.remove(step)
+                        results[step.name] = StepResult(step.name, "skipped", None, step.expected_code, None, 0.0,
+                                                        "dependency failed")
+                    elif step.depends <= context.keys():
+                        waiting.remove(step)
+                        running[executor.submit(_run_step, pool, step, dict(context), origin)] = step
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                result, response = future.result()
+                results[step.name] = result
+                if result.status == "ok":
+                    context[step.name] = response
+                else:
+                    failed = True
+                    logging.error("Step %r failed: expected %s, got %s %s",
+                                  step.name, step.expected_code, result.code, result.msg)
+
+    for step in waiting:
+        results[step.name] = StepResult(step.name, "skipped", None, step.expected_code, None, 0.0, "plan stopped")
+    return [results[step.name] for step in steps]
+
+def _chain_lengths(steps):
+    # Number of steps in the longest chain starting at each step.
+    dependents = {step.name: [] for step in steps}
+    for step in steps:
+        for name in step.depends:
+            dependents[name].append(step.name)
+    lengths = {}
+
+    def length(name):
+        if name not in lengths:
+            lengths[name] = 1 + max([length(dependent) for dependent in dependents[name]] + [0])
+        return lengths[name]
+    for step in steps:
+        length(step.name)
+    return lengths
+
+def _run_step(pool, step, context, origin):
+    started = time.monotonic()
+    try:
+        xml = step.build(context)
+        with pool.session() as client:
+            logging.info("Sending (%s):\n%s", step.name, MaskedXml(xml))
+            client.send(xml)
+            response = client.read_response()
+            client.notify(xml, response)
+        logging.info("Received (%s):\n%s", step.name, LazyPrettyXml(response.raw))
+        # Parsing is lazy, so a malformed response only fails here
+        ok = step.expected_code is None or step.expected_code in response.codes
+        code, msg = response.code, response.msg
+    except Exception as e:
+        return StepResult(step.name, "error", None, step.expected_code, started - origin,
+                          time.monotonic() - started, str(e)), None
+    return StepResult(step.name, "ok" if ok else "failed", code, step.expected_code, started - origin,
+                      time.monotonic() - started, msg), response
+
+def format_report(results):
+    """
+    Returns a plain-text table of StepResults: status, code, start offset and duration.
+    """
+    width = max([len(result.name) for result in results] + [4])
+    lines = ["%-*s  %-7s  %-4s  %-8s  %9s  %9s" % (width, "step", "status", "code", "expected", "start ms", "took ms")]
+    for result in results:
+        started = "%9.1f" % (result.started * 1000) if result.started is not None else "%9s" % "-"
+        lines.append("%-*s  %-7s  %-4s  %-8s  %s  %9.1f" % (width, result.name, result.status, result.code or "-",
+                                                          result.expected_code or "-", started, result.elapsed * 1000))
+    return "\n".join(lines)
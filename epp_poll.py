@@ -0,0 +1,215 @@
+"""
+epp_poll.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Poll queue consumer. Drains the registry's message queue, sending the ack for each
+message in the same pipelined round trip as the request for the next one, so N
+messages cost N round trips instead of 2N. Every message is parsed into a typed event:
+TransferEvent for <trnData>, PendingActionEvent for <panData> and Message for
+anything else. Events are handed to a callback (run), a for loop (iterating a
+PollConsumer over an EppClient) or an async for loop (over an AsyncEppClient).
+
+With a checkpoint file, the ID of each handled message is saved atomically before it
+is acked, so after a restart a message that was handled but never acked is acked
+without being handed over a second time.
+
+Usage:
+python3 epp_poll.py --checkpoint poll.checkpoint       (log and ack every queued message)
+"""
+
+import os
+import time
+import asyncio
+import logging
+import argparse
+from collections import namedtuple
+from epp_commands import build_poll_request, build_poll_ack
+from epp_response import NS, EppResponse
+
+Message = namedtuple("Message", ["msg_id", "qdate", "text", "count", "payload"])
+TransferEvent = namedtuple("TransferEvent", ["msg_id", "qdate", "text", "count", "name", "status", "requester",
+                                             "requested", "acting", "action_date", "ex_date"])
+PendingActionEvent = namedtuple("PendingActionEvent", ["msg_id", "qdate", "text", "count", "name", "result",
+                                                       "cltrid", "svtrid", "date"])
+
+_EMPTY = object()
+
+def _local(tag):
+    return tag.rpartition("}")[2]
+
+def _text(element):
+    return element.text.strip() if element is not None and element.text else None
+
+def parse_poll_message(response):
+    """
+    Returns the typed event for a 1301 poll response.
+    """
+    queue = response.msg_queue
+    common = (queue.msg_id, queue.qdate, queue.text, queue.count)
+    data = response.message_data
+    if data is None:
+        return Message(*common, None)
+    fields = {_local(child.tag): child for child in data}
+    name = fields.get("name", fields.get("id"))
+    if _local(data.tag) == "trnData":
+        return TransferEvent(*common, _text(name), _text(fields.get("trStatus")), _text(fields.get("reID")),
+                             _text(fields.get("reDate")), _text(fields.get("acID")), _text(fields.get("acDate")),
+                             _text(fields.get("exDate")))
+    if _local(data.tag) == "panData":
+        trid = fields.get("paTRID")
+        return PendingActionEvent(*common, _text(name), name is not None and name.get("paResult") in ("1", "true"),
+                                  _text(trid.find('epp:clTRID', NS)) if trid is not None else None,
+                                  _text(trid.find('epp:svTRID', NS)) if trid is not None else None,
+                                  _text(fields.get("paDate")))
+    # Unknown payloads are passed on as the XML inside <resData>
+    start = response.text.find("<resData>")
+    end = response.text.find("</resData>")
+    return Message(*common, response.text[start + len("<resData>"):end].strip() if 0 <= start < end else None)
+
+class Checkpoint:
+    """
+    File holding the ID of the last handled poll message.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def save(self, msg_id):
+        # Write a temporary file and rename it over the old one, so a crash leaves
+        # either the old or the new ID, never a partial one.
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(msg_id)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+class PollConsumer:
+    def __init__(self, client, checkpoint=None, idle_interval=None):
+        """
+        - client: logged-in EppClient, or AsyncEppClient for `async for`
+        - checkpoint: Checkpoint or path of the checkpoint file, optional
+        - idle_interval: seconds to wait before polling again once the queue is empty;
+          None stops when the queue is empty
+        """
+        self.client = client
+        self.checkpoint = Checkpoint(checkpoint) if isinstance(checkpoint, str) else checkpoint
+        self.idle_interval = idle_interval
+        self.last_handled = self.checkpoint.load() if self.checkpoint else None
+        self.handled = 0
+        self._ack = None  # msgID to ack with the next request
+
+    def __iter__(self):
+        """
+        Yields an event per message. A message is acked in the round trip after the
+        loop body for it has completed, so leaving the loop early leaves it queued.
+        """
+        while True:
+            event = self._receive(self.client.pipeline(self._commands()))
+            if event is _EMPTY:
+                if self.idle_interval is None:
+                    return
+                time.sleep(self.idle_interval)
+            elif event is not None:
+                yield event
+                self.mark_handled(event.msg_id)
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        while True:
+            responses = await asyncio.gather(*[self.client.request(xml) for xml in self._commands()])
+            event = self._receive([EppResponse(response) for response in responses])
+            if event is _EMPTY:
+                if self.idle_interval is None:
+                    return
+                await asyncio.sleep(self.idle_interval)
+            elif event is not None:
+                yield event
+                self.mark_handled(event.msg_id)
+
+    def run(self, handler, limit=None):
+        """
+        Calls handler(event) for every message until the queue is empty (or `limit`
+        messages have been handled). Returns the number of messages handled.
+        """
+        count = 0
+        for event in self:
+            handler(event)
+            self.mark_handled(event.msg_id)
+            count += 1
+            if limit is not None and count >= limit:
+                self.client.pipeline([build_poll_ack(self._ack)])
+                self._ack = None
+                break
+        return count
+
+    def mark_handled(self, msg_id):
+        """
+        Records `msg_id` as handled so it is acked and never handed over again.
+        """
+        if msg_id == self.last_handled and self._ack == msg_id:
+            return
+        if self.checkpoint:
+            self.checkpoint.save(msg_id)
+        self.last_handled = msg_id
+        self._ack = msg_id
+        self.handled += 1
+
+    def _commands(self):
+        if self._ack is None:
+            return [build_poll_request()]
+        return [build_poll_ack(self._ack), build_poll_request()]
+
+    def _receive(self, responses):
+        """
+        Processes the responses of one round. Returns the event to hand over, _EMPTY if
+        the queue is empty, or None for a message that was already handled.
+        """
+        if self._ack is not None:
+            ack = responses[0]
+            # 2303: the message is no longer queued, e.g. it was acked before a restart
+            if not ack.is_success and ack.code != "2303":
+                raise ConnectionError("Poll ack of message %s failed:\n%s" % (self._ack, ack.text))
+            self._ack = None
+        response = responses[-1]
+        if response.code == "1300":
+            return _EMPTY
+        if response.code != "1301" or response.msg_id is None:
+            raise ConnectionError("Poll request failed:\n%s" % response.text)
+        if response.msg_id == self.last_handled:
+            logging.info("Message %s was handled before; acking it.", response.msg_id)
+            self._ack = response.msg_id
+            return None
+        return parse_poll_message(response)
+
+def main():
+    from epp_ote_runner import EppClient, HOST, PORT, CLIENT_ID, PASSWORD
+    parser = argparse.ArgumentParser(description="Drain the EPP poll queue, logging every message.")
+    parser.add_argument("--checkpoint", help="file recording the last handled message ID")
+    parser.add_argument("--follow", type=float, metavar="SECONDS",
+                        help="keep polling at this interval once the queue is empty")
+    args = parser.parse_args()
+
+    client = EppClient(HOST, PORT)
+    client.connect()
+    client.login(CLIENT_ID, PASSWORD)
+    try:
+        consumer = PollConsumer(client, checkpoint=args.checkpoint, idle_interval=args.follow)
+        count = consumer.run(lambda event: logging.info("Poll message: %s", event))
+    finally:
+        client.disconnect()
+    logging.info("Handled %d poll messages.", count)
+
+if __name__ == '__main__':
+    main()
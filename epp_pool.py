@@ -0,0 +1,224 @@
+"""
+epp_pool.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Pool of logged-in EPP sessions built on EppClient. Sessions are opened up front, kept
+alive with <hello/> before the server's idle timeout and replaced in the background
+when their connection dies, so callers can check out a ready session without paying
+for a TCP+TLS+login handshake. A session whose connection has been closed while it
+sat idle is reconnected when it is checked out, rather than handed to the caller.
+"""
+
+import time
+import select
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from epp_commands import build_hello, build_logout
+from epp_ote_runner import EppClient
+
+KEEPALIVE_INTERVAL = 300    # Seconds a session may sit idle before a <hello/> is sent
+MAINTENANCE_INTERVAL = 1.0  # How often the background thread checks the pool
+RECONNECT_DELAY = 5.0       # Pause after a failed attempt to open a replacement session
+
+class EppSessionPool:
+    def __init__(self, host, port, username, password, size=4, keepalive_interval=KEEPALIVE_INTERVAL,
+                 ssl_context=None, metrics=None, transcript=None):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.metrics = metrics  # optional EppMetrics shared by every session
+        self.transcript = transcript  # optional Transcript shared by every session
+        self.username = username
+        self.password = password
+        self.size = size
+        self.keepalive_interval = keepalive_interval
+        self._idle = deque()  # idle sessions, most recently used on the right
+        self._available = threading.Condition()
+        self._last_used = {}  # client -> time.monotonic() of last traffic
+        self._open = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Opens `size` logged-in sessions and starts the background maintenance thread.
+        If one cannot be opened, the sessions already opened are closed and the error
+        is raised.
+        """
+        try:
+            for _ in range(self.size):
+                self._add(self._open_session())
+        except BaseException:
+            for client in self._take_all():
+                self._discard(client)
+            raise
+        self._thread = threading.Thread(target=self._maintain, name="epp-pool", daemon=True)
+        self._thread.start()
+        return self
+
+    def checkout(self, timeout=None):
+        """
+        Returns an idle logged-in EppClient, waiting up to `timeout` seconds for one.
+        A session whose connection was closed while idle is reconnected first.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            if self._closed.is_set():
+                raise RuntimeError("Session pool is closed.")
+            with self._available:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if not self._available.wait_for(lambda: self._idle or self._closed.is_set(), remaining):
+                    raise TimeoutError("No EPP session available within %s seconds." % timeout)
+                if not self._idle:
+                    continue  # closed while waiting
+                client = self._idle.pop()
+            if _connection_alive(client):
+                return client
+            logging.warning("Pooled session to %s was closed while idle; reconnecting.", self.host)
+            try:
+                client.reconnect()
+            except (ConnectionError, OSError) as e:
+                logging.error("Reconnecting pooled session failed: %s", e)
+                self._discard(client)  # replaced in the background; try another
+                continue
+            self._last_used[client] = time.monotonic()
+            return client
+
+    def checkin(self, client, broken=False):
+        """
+        Returns a session to the pool. Pass broken=True if its connection failed; it is
+        then closed and a replacement is opened in the background.
+        """
+        if broken or self._closed.is_set():
+            self._discard(client)
+            return
+        self._last_used[client] = time.monotonic()
+        self._put_idle(client)
+
+    @contextmanager
+    def session(self, timeout=None):
+        """
+        Context manager around checkout/checkin. A connection error raised inside the
+        block marks the session as broken.
+        """
+        client = self.checkout(timeout)
+        try:
+            yield client
+        except (ConnectionError, OSError):
+            self.checkin(client, broken=True)
+            raise
+        except BaseException:
+            self.checkin(client)
+            raise
+        else:
+            self.checkin(client)
+
+    def close(self):
+        """
+        Stops maintenance and logs out every idle session. Sessions still checked out
+        are closed when they are checked back in.
+        """
+        self._closed.set()
+        with self._available:
+            self._available.notify_all()
+        if self._thread:
+            self._thread.join()
+        for client in self._take_all():
+            try:
+                client.send(build_logout())
+                client.read()
+            except (ConnectionError, OSError):
+                pass
+            self._discard(client)
+
+    def _open_session(self):
+        client = EppClient(self.host, self.port, transcript=self.transcript, ssl_context=self.ssl_context)
+        client.metrics = self.metrics
+        if self.metrics is not None and self._thread is not None:
+            self.metrics.count_reconnect()  # a replacement for a session that died
+        client.connect()
+        try:
+            client.login(self.username, self.password)
+        except ConnectionError:
+            client.disconnect()
+            raise
+        return client
+
+    def _add(self, client):
+        with self._lock:
+            self._open += 1
+        self._last_used[client] = time.monotonic()
+        self._put_idle(client)
+
+    def _put_idle(self, client):
+        with self._available:
+            self._idle.append(client)
+            self._available.notify()
+
+    def _take_all(self):
+        with self._available:
+            clients = list(self._idle)
+            self._idle.clear()
+        return clients
+
+    def _discard(self, client):
+        self._last_used.pop(client, None)
+        with self._lock:
+            self._open -= 1
+        try:
+            client.disconnect()
+        except OSError:
+            pass
+
+    def _maintain(self):
+        while not self._closed.wait(MAINTENANCE_INTERVAL):
+            self._keepalive()
+            self._replenish()
+
+    def _keepalive(self):
+        # Stale sessions are taken out and pinged one at a time, so the rest stay
+        # available to checkout() meanwhile.
+        deadline = time.monotonic() - self.keepalive_interval
+        while not self._closed.is_set():
+            with self._available:
+                client = next((client for client in self._idle if self._last_used.get(client, 0) <= deadline), None)
+                if client is None:
+                    return
+                self._idle.remove(client)
+            try:
+                client.send(build_hello())
+                client.read()
+            except (ConnectionError, OSError) as e:
+                logging.warning("Pooled session to %s failed keepalive: %s", self.host, e)
+                self._discard(client)
+                continue
+            self.checkin(client)
+
+    def _replenish(self):
+        while self._open < self.size and not self._closed.is_set():
+            try:
+                client = self._open_session()
+            except (ConnectionError, OSError) as e:
+                logging.error("Failed to open replacement EPP session: %s", e)
+                self._closed.wait(RECONNECT_DELAY)
+                return
+            self._add(client)
+
+def _connection_alive(client):
+    # An idle session should have nothing to read: a readable socket means the server
+    # has closed the connection (or sent something unasked for), so it is not usable.
+    sock = client.ssl_sock
+    if sock is None or sock.fileno() < 0:
+        return False
+    try:
+        if hasattr(sock, "pending") and sock.pending():
+            return False  # TLS data already decrypted and buffered
+        return not select.select([sock], [], [], 0)[0]
+    except (OSError, ValueError):
+        return False
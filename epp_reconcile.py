@@ -0,0 +1,277 @@
+"""
+epp_reconcile.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Desired-state reconciliation for a domain portfolio. Each domain's desired
+nameservers, contacts, client statuses and registrant are given as a DomainState and
+compared with its current state (from pipelined <domain:info>s, or from a
+RegistryMirror without any registry traffic). Only the differences are sent, as one
+<domain:update> per domain that actually changed, with everything in a single
+add/rem/chg. Domains already in the desired state cost no update at all.
+
+A field left as None in the desired state is not managed. Only client* statuses are
+managed; server statuses are left to the registry. If a domain is locked with
+clientUpdateProhibited and should stay locked, the lock is removed in the same update
+as the changes and put back by a second update.
+
+DomainState uses __slots__, interned strings and shared frozensets (domains with the
+same nameservers point at one set), so desired state for millions of domains can be
+held in memory.
+
+Usage:
+desired = [DomainState("epp.im", nameservers=["ns1.example.org", "ns2.example.org"], statuses=["clientTransferProhibited"])]
+for result in reconcile(client, desired):
+    ...
+python3 epp_reconcile.py desired.jsonl --dry-run
+"""
+
+import sys
+import json
+import time
+import weakref
+import logging
+import argparse
+from collections import namedtuple
+from epp_commands import build_domain_info, build_domain_update, build_login, build_logout, split_nameserver
+from epp_check import chunked
+from epp_ote_runner import EppClient, HOST, PORT, CLIENT_ID, PASSWORD, PIPELINE_WINDOW, send_and_expect
+
+RECONCILE_CHUNK_SIZE = 256  # Domains whose current state is fetched per pipelined round
+LOCK_STATUS = "clientUpdateProhibited"
+
+ReconcileResult = namedtuple("ReconcileResult", ["name", "changes", "code", "msg"])
+
+# frozenset -> the same frozenset, so equal sets are stored once; an entry goes when
+# the last DomainState using it does
+_shared = weakref.WeakValueDictionary()
+
+def _share(values):
+    values = frozenset(values)
+    shared = _shared.get(values)
+    if shared is None:
+        # Keyed by a copy: a key that is the set itself would keep it alive for good
+        shared = _shared[frozenset(iter(values))] = values
+    return shared
+
+def _nameserver(ns):
+    # Canonical, interned form: "host" or ("host", "address", ...)
+    name, addresses = split_nameserver(ns)
+    name = sys.intern(name.strip().lower())
+    return (name,) + tuple(sys.intern(address) for address in addresses) if addresses else name
+
+def _name_of(ns):
+    return ns if isinstance(ns, str) else ns[0]
+
+class DomainState:
+    __slots__ = ("name", "nameservers", "contacts", "statuses", "registrant")
+
+    def __init__(self, name, nameservers=None, contacts=None, statuses=None, registrant=None):
+        """
+        - nameservers: host names or (host name, IP address, ...) tuples with glue
+        - contacts: dict {type: contact_id} or (type, contact_id) pairs, registrant excluded
+        - statuses: client* statuses; raises ValueError for any other status
+        - registrant: registrant contact ID
+        Leave a field as None to leave it unmanaged.
+        """
+        self.name = sys.intern(name.strip().lower())
+        self.nameservers = _share(_nameserver(ns) for ns in nameservers) if nameservers is not None else None
+        if contacts is not None:
+            pairs = contacts.items() if hasattr(contacts, "items") else contacts
+            contacts = _share((sys.intern(ctype), sys.intern(cid)) for ctype, cid in pairs)
+        self.contacts = contacts
+        if statuses is not None:
+            unmanaged = [status for status in statuses if not status.startswith("client")]
+            if unmanaged:
+                raise ValueError("Only client statuses can be managed, not: %s" % ", ".join(unmanaged))
+            statuses = _share(sys.intern(status) for status in statuses)
+        self.statuses = statuses
+        self.registrant = sys.intern(registrant) if registrant else None
+
+    def __repr__(self):
+        return "DomainState(%r, nameservers=%r, contacts=%r, statuses=%r, registrant=%r)" % (
+            self.name, self.nameservers, self.contacts, self.statuses, self.registrant)
+
+    @classmethod
+    def from_response(cls, response):
+        """
+        Current state from a successful <domain:info> response.
+        """
+        return cls(response.name, response.nameservers, response.contacts,
+                   [status for status in response.statuses if status.startswith("client")], response.registrant)
+
+    @classmethod
+    def from_record(cls, record):
+        """
+        Current state from a RegistryMirror.domain() or epp_cache.domain_record() dict.
+        """
+        return cls(record["name"], record["nameservers"], record["contacts"],
+                   [status for status in record["statuses"] if status.startswith("client")], record["registrant"])
+
+def diff(desired, current):
+    """
+    Returns the build_domain_update keyword arguments that take `current` to
+    `desired`, or {} if nothing needs to change.
+    """
+    changes = {}
+    if desired.nameservers is not None:
+        current_names = set(_name_of(ns) for ns in current.nameservers or ())
+        desired_names = set(_name_of(ns) for ns in desired.nameservers)
+        add_ns = sorted((ns for ns in desired.nameservers if _name_of(ns) not in current_names), key=_name_of)
+        rem_ns = sorted(current_names - desired_names)
+        if add_ns:
+            changes["add_ns"] = add_ns
+        if rem_ns:
+            changes["rem_ns"] = rem_ns
+    if desired.contacts is not None:
+        current_contacts = current.contacts or frozenset()
+        if desired.contacts - current_contacts:
+            changes["add_contacts"] = sorted(desired.contacts - current_contacts)
+        if current_contacts - desired.contacts:
+            changes["rem_contacts"] = sorted(current_contacts - desired.contacts)
+    if desired.statuses is not None:
+        current_statuses = current.statuses or frozenset()
+        if desired.statuses - current_statuses:
+            changes["add_statuses"] = sorted(desired.statuses - current_statuses)
+        if current_statuses - desired.statuses:
+            changes["rem_statuses"] = sorted(current_statuses - desired.statuses)
+    if desired.registrant is not None and desired.registrant != current.registrant:
+        changes["changereg"] = desired.registrant
+    return changes
+
+def plan_updates(desired, current):
+    """
+    Returns (changes, commands): the diff and the <domain:update> XML to send, usually
+    one command, none if the domain is in sync, two if it must be unlocked and relocked.
+    """
+    changes = diff(desired, current)
+    if not changes:
+        return changes, []
+    locked = LOCK_STATUS in (current.statuses or ())
+    if not locked or LOCK_STATUS in changes.get("rem_statuses", ()):
+        return changes, [build_domain_update(desired.name, **changes)]
+    # Still meant to be locked: lift the lock with the changes, then restore it
+    unlock = dict(changes, rem_statuses=changes.get("rem_statuses", []) + [LOCK_STATUS])
+    return changes, [build_domain_update(desired.name, **unlock),
+                     build_domain_update(desired.name, add_statuses=[LOCK_STATUS])]
+
+def _fresh(mirror, record):
+    return bool(record["synced_at"]) and record["synced_at"] >= time.time() - mirror.stale_after
+
+def reconcile(client, desired, mirror=None, dry_run=False, chunk_size=RECONCILE_CHUNK_SIZE, window=PIPELINE_WINDOW):
+    """
+    Brings every domain in `desired` (DomainStates) to its desired state and yields a
+    ReconcileResult per domain, in input order. changes is the diff ({} if in sync);
+    code is that of the last update sent, None if nothing was sent. If a domain appears
+    more than once within a chunk, only its last desired state is applied; the earlier
+    entries yield a result with no changes.
+
+    - mirror: optional RegistryMirror to read current state from instead of sending
+      <domain:info>s; domains missing from it, never fully synced (e.g. only seen
+      in a create) or synced longer than its stale_after ago are looked up with an info
+    - dry_run: compute and report the changes without sending any update
+    """
+    for chunk in chunked(desired, chunk_size):
+        last = {state.name: index for index, state in enumerate(chunk)}
+        superseded = set(state.name for index, state in enumerate(chunk) if last[state.name] != index)
+        if superseded:
+            logging.warning("Listed more than once; using the last desired state of: %s", ", ".join(sorted(superseded)))
+        current = {}
+        lookups = []
+        for state in (chunk[index] for index in sorted(last.values())):
+            record = mirror.domain(state.name) if mirror is not None else None
+            if record is not None and _fresh(mirror, record):
+                current[state.name] = DomainState.from_record(record)
+            else:
+                lookups.append(state.name)
+        failures = {}
+        if lookups:
+            for name, response in zip(lookups, client.pipeline([build_domain_info(name) for name in lookups],
+                                                                 window=window)):
+                if response.is_success:
+                    current[name] = DomainState.from_response(response)
+                else:
+                    failures[name] = response
+
+        planned = []  # (state, changes, commands)
+        for index, state in enumerate(chunk):
+            if state.name in current and last[state.name] == index:
+                planned.append((state,) + plan_updates(state, current[state.name]))
+        commands = [] if dry_run else [xml for _, _, xmls in planned for xml in xmls]
+        responses = iter(client.pipeline(commands, window=window) if commands else [])
+        outcomes = {}
+        for state, changes, xmls in planned:
+            if dry_run or not xmls:
+                outcomes[state.name] = ReconcileResult(state.name, changes, None, "in sync" if not changes else "dry run")
+                continue
+            replies = [next(responses) for _ in xmls]
+            failed = [reply for reply in replies if not reply.is_success]
+            reply = failed[0] if failed else replies[-1]
+            outcomes[state.name] = ReconcileResult(state.name, changes, reply.code, reply.msg)
+
+        for index, state in enumerate(chunk):
+            if last[state.name] != index:
+                yield ReconcileResult(state.name, {}, None, "superseded by a later entry")
+            elif state.name in failures:
+                response = failures[state.name]
+                yield ReconcileResult(state.name, None, response.code, "info failed: %s" % response.msg)
+            else:
+                yield outcomes[state.name]
+
+def read_desired(infile):
+    """
+    Yields a DomainState per JSON line: {"name": ..., "nameservers": [...], "contacts":
+    {type: id}, "statuses": [...], "registrant": ...}; missing fields are unmanaged.
+    A nameserver with glue is a list, e.g. ["ns1.epp.im", "10.0.0.1"].
+    """
+    for line in infile:
+        if line.strip() and not line.startswith("#"):
+            entry = json.loads(line)
+            nameservers = entry.get("nameservers")
+            if nameservers is not None:
+                nameservers = [ns if isinstance(ns, str) else tuple(ns) for ns in nameservers]
+            yield DomainState(entry["name"], nameservers, entry.get("contacts"), entry.get("statuses"),
+                              entry.get("registrant"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Bring domains to a desired state with minimal EPP updates.")
+    parser.add_argument("input", nargs="?", default="-", help="desired state, one JSON object per line (default: stdin)")
+    parser.add_argument("--dry-run", action="store_true", help="report the changes without sending updates")
+    parser.add_argument("--mirror", help="RegistryMirror database to read current state from")
+    args = parser.parse_args()
+
+    infile = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    mirror = None
+    if args.mirror:
+        from epp_mirror import RegistryMirror
+        mirror = RegistryMirror(args.mirror)
+    client = EppClient(HOST, PORT)
+    client.connect()
+    send_and_expect(client, build_login(CLIENT_ID, PASSWORD))
+    if mirror is not None:
+        client.observers.append(mirror)
+    changed = in_sync = failed = 0
+    try:
+        for result in reconcile(client, read_desired(infile), mirror=mirror, dry_run=args.dry_run):
+            if result.changes == {}:
+                in_sync += 1
+                continue
+            logging.info("%s: %s %s %s", result.name, result.changes, result.code or "", result.msg)
+            if result.code is not None and result.code not in ("1000", "1001"):
+                failed += 1
+            elif result.changes is None:
+                failed += 1
+            else:
+                changed += 1
+    finally:
+        send_and_expect(client, build_logout(), expected_code="1500")
+        client.disconnect()
+    logging.info("%d domains changed%s, %d already in sync, %d failed.", changed,
+                 " (dry run)" if args.dry_run else "", in_sync, failed)
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
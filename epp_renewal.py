@@ -0,0 +1,191 @@
+"""
+epp_renewal.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Bulk renewal pipeline. Takes a stream of (domain, years) and renews them across the
+sessions of an EppSessionPool. Each worker runs a two-stage pipeline on its session:
+one pipelined round carries the renews for the domains whose curExpDate is already
+known together with the <domain:info> commands for the next chunk, so renews go out
+as soon as each expiry is known. Queues are bounded, so memory use does not depend
+on the size of the input, and throughput scales with the number of sessions.
+
+Usage:
+python3 epp_renewal.py renewals.csv -o report.csv     (input rows: domain,years)
+"""
+
+import csv
+import sys
+import queue
+import logging
+import argparse
+import threading
+from collections import namedtuple
+from epp_commands import build_domain_info, build_domain_renew
+from epp_ote_runner import HOST, PORT, CLIENT_ID, PASSWORD
+from epp_pool import EppSessionPool
+from epp_metrics import EppMetrics
+
+RENEWAL_CHUNK_SIZE = 16  # Domains per pipelined info/renew round on one session
+
+RenewalResult = namedtuple("RenewalResult", ["domain", "years", "cur_exp_date", "new_exp_date", "code", "msg"])
+
+_DONE = object()
+
+def bulk_renew(pool, items, workers=None, chunk_size=RENEWAL_CHUNK_SIZE, cache=None):
+    """
+    Renews every (domain, years) in `items` and yields a RenewalResult per domain as
+    soon as it finishes (not in input order).
+
+    - workers: concurrent sessions to use, defaults to the pool size
+    - cache: optional DomainCache; known expiry dates skip the info stage, and the
+      cache is updated from the info and renew responses
+
+    A failed info or renew is reported with its result code and message. If a session
+    drops mid-round, the domains in that round are reported with code None because it
+    is unknown whether the registry processed their renews.
+    """
+    workers = workers or pool.size
+    work = queue.Queue(maxsize=workers * 2)
+    results = queue.Queue(maxsize=workers * chunk_size * 2)
+
+    def feed():
+        chunk = []
+        try:
+            for domain, years in items:
+                chunk.append((domain, int(years)))
+                if len(chunk) == chunk_size:
+                    work.put(chunk)
+                    chunk = []
+            if chunk:
+                work.put(chunk)
+        except Exception as e:
+            results.put(e)
+        finally:
+            for _ in range(workers):
+                work.put(None)
+
+    def run():
+        try:
+            _renewal_worker(pool, work, results, cache)
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(_DONE)
+
+    threads = [threading.Thread(target=feed, name="epp-renew-feed", daemon=True)]
+    threads += [threading.Thread(target=run, name="epp-renew-%d" % i, daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    finished = 0
+    while finished < workers:
+        result = results.get()
+        if result is _DONE:
+            finished += 1
+        elif isinstance(result, Exception):
+            raise result
+        else:
+            yield result
+
+def _renewal_worker(pool, work, results, cache):
+    ready = []  # (domain, years, cur_exp_date) waiting for their renew
+    exhausted = False
+    while ready or not exhausted:
+        chunk = []
+        if not exhausted:
+            chunk = work.get() if not ready else _get_nowait(work)
+            if chunk is None:
+                exhausted = True
+                chunk = []
+        try:
+            with pool.session() as client:
+                ready = _renewal_round(client, ready, chunk or [], results, cache)
+        except (ConnectionError, OSError) as e:
+            logging.error("Renewal session failed: %s", e)
+            for domain, years, cur_exp_date in ready:
+                results.put(RenewalResult(domain, years, cur_exp_date, None, None, "session failed: %s" % e))
+            for domain, years in chunk or []:
+                results.put(RenewalResult(domain, years, None, None, None, "session failed: %s" % e))
+            ready = []
+
+def _get_nowait(work):
+    try:
+        return work.get_nowait()
+    except queue.Empty:
+        return []
+
+def _renewal_round(client, ready, chunk, results, cache):
+    """
+    Sends the renews for `ready` and the infos for `chunk` in one pipelined round.
+    Returns the chunk's domains whose curExpDate is now known.
+    """
+    lookups = []
+    next_ready = []
+    for domain, years in chunk:
+        record = cache.get(domain) if cache is not None else None
+        if record and record.get("ex_date"):
+            next_ready.append((domain, years, record["ex_date"]))
+        else:
+            lookups.append((domain, years))
+
+    commands = [build_domain_renew(domain, cur_exp_date, years) for domain, years, cur_exp_date in ready]
+    commands += [build_domain_info(domain) for domain, years in lookups]
+    responses = client.pipeline(commands) if commands else []
+    if cache is not None and cache not in client.observers:
+        for xml, response in zip(commands, responses):
+            cache.observe(xml, response)
+
+    for (domain, years, cur_exp_date), response in zip(ready, responses):
+        results.put(RenewalResult(domain, years, cur_exp_date, response.ex_date, response.code, response.msg))
+    for (domain, years), response in zip(lookups, responses[len(ready):]):
+        if response.is_success and response.ex_date:
+            next_ready.append((domain, years, response.ex_date))
+        else:
+            results.put(RenewalResult(domain, years, None, None, response.code, "info failed: %s" % response.msg))
+    return next_ready
+
+def write_report(results, outfile):
+    """
+    Writes RenewalResults as CSV, one row per domain, as they arrive. Returns the
+    number of (renewed, failed) domains.
+    """
+    writer = csv.writer(outfile)
+    writer.writerow(RenewalResult._fields)
+    renewed = failed = 0
+    for result in results:
+        writer.writerow(result)
+        if result.code == "1000":
+            renewed += 1
+        else:
+            failed += 1
+    outfile.flush()
+    return renewed, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Renew domains in bulk across several EPP sessions.")
+    parser.add_argument("input", nargs="?", default="-", help="CSV of domain,years (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="report CSV (default: stdout)")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port")
+    args = parser.parse_args()
+
+    infile = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    outfile = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    items = ((row[0].strip(), row[1]) for row in csv.reader(infile) if row and not row[0].startswith("#"))
+    metrics = EppMetrics() if args.metrics_port else None
+    if metrics:
+        metrics.serve(args.metrics_port)
+    pool = EppSessionPool(HOST, PORT, CLIENT_ID, PASSWORD, size=args.sessions, metrics=metrics).start()
+    try:
+        renewed, failed = write_report(bulk_renew(pool, items), outfile)
+    finally:
+        pool.close()
+    logging.info("Renewed %d domains, %d failed.", renewed, failed)
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""
+epp_response.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+EppResponse wraps one EPP response frame. The XML is parsed once, on first use, and
+each typed accessor (result code, clTRID, exDate, statuses, ...) is decoded on first
+access and cached, so callers that only need the result code pay for nothing else.
+"""
+
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from functools import cached_property
+from xml.dom import minidom
+
+EPP_NS = "urn:ietf:params:xml:ns:epp-1.0"
+DOMAIN_NS = "urn:ietf:params:xml:ns:domain-1.0"
+CONTACT_NS = "urn:ietf:params:xml:ns:contact-1.0"
+HOST_NS = "urn:ietf:params:xml:ns:host-1.0"
+
+NS = {
+    'epp': EPP_NS,
+    'domain': DOMAIN_NS,
+    'contact': CONTACT_NS,
+    'host': HOST_NS,
+}
+
+# One entry of a <domain:check>/<contact:check>/<host:check> response
+CheckResult = namedtuple("CheckResult", ["name", "avail", "reason"])
+
+# <msgQ> of a poll response: messages queued, ID of this message, when it was queued
+# and its human-readable text (qdate and text are None in an ack response)
+MessageQueue = namedtuple("MessageQueue", ["count", "msg_id", "qdate", "text"])
+
+def _local(tag):
+    return tag.rpartition("}")[2]
+
+def _text(element):
+    return element.text.strip() if element is not None and element.text else None
+
+def _date(value):
+    return value.split("T")[0] if value else None  # strip timestamp if present
+
+def pretty_xml(xml):
+    """
+    Returns `xml` (str or bytes) indented for logging, or unchanged if it is not valid XML.
+    """
+    try:
+        return minidom.parseString(xml).toprettyxml(indent="  ")
+    except Exception:
+        return xml.decode("utf-8", "replace") if isinstance(xml, bytes) else xml
+
+class LazyPrettyXml:
+    """
+    Logging argument that pretty-prints only if the log record is actually emitted.
+    """
+    def __init__(self, xml):
+        self.xml = xml
+
+    def __str__(self):
+        return pretty_xml(self.xml)
+
+class EppResponse:
+    def __init__(self, raw):
+        self.raw = raw  # payload as received, bytes or str
+
+    def __str__(self):
+        return self.text
+
+    @cached_property
+    def text(self):
+        return self.raw.decode("utf-8") if isinstance(self.raw, bytes) else self.raw
+
+    @cached_property
+    def root(self):
+        return ET.fromstring(self.raw)
+
+    @cached_property
+    def _response(self):
+        return self.root.find('epp:response', NS)
+
+    @cached_property
+    def _res_data(self):
+        if self._response is None:
+            return None
+        return self._response.find('epp:resData', NS)
+
+    def _res_data_elements(self, local_name):
+        if self._res_data is None:
+            return []
+        return [element for element in self._res_data.iter() if _local(element.tag) == local_name]
+
+    def _res_data_text(self, local_name):
+        elements = self._res_data_elements(local_name)
+        return _text(elements[0]) if elements else None
+
+    @cached_property
+    def is_greeting(self):
+        return self.root.find('epp:greeting', NS) is not None
+
+    @cached_property
+    def codes(self):
+        """
+        Result codes as strings, in document order. Empty for a greeting.
+        """
+        if self._response is None:
+            return []
+        return [result.get("code") for result in self._response.findall('epp:result', NS)]
+
+    @cached_property
+    def code(self):
+        return self.codes[0] if self.codes else None
+
+    @property
+    def is_success(self):
+        return self.code is not None and self.code.startswith("1")
+
+    @cached_property
+    def messages(self):
+        if self._response is None:
+            return []
+        return [_text(result.find('epp:msg', NS)) for result in self._response.findall('epp:result', NS)]
+
+    @cached_property
+    def msg(self):
+        return self.messages[0] if self.messages else None
+
+    @cached_property
+    def msg_queue(self):
+        """
+        MessageQueue from <msgQ> (poll req/ack responses, and any response while
+        messages are waiting), or None.
+        """
+        if self._response is None:
+            return None
+        msgq = self._response.find('epp:msgQ', NS)
+        if msgq is None:
+            return None
+        count = msgq.get("count")
+        return MessageQueue(int(count) if count else 0, msgq.get("id"), _text(msgq.find('epp:qDate', NS)),
+                            _text(msgq.find('epp:msg', NS)))
+
+    @cached_property
+    def msg_id(self):
+        return self.msg_queue.msg_id if self.msg_queue else None
+
+    @cached_property
+    def message_data(self):
+        """
+        First element inside <resData>, e.g. <domain:trnData> of a poll message, or None.
+        """
+        if self._res_data is None or not len(self._res_data):
+            return None
+        return self._res_data[0]
+
+    @cached_property
+    def cltrid(self):
+        if self._response is None:
+            return None
+        return _text(self._response.find('epp:trID/epp:clTRID', NS))
+
+    @cached_property
+    def svtrid(self):
+        if self._response is None:
+            return None
+        return _text(self._response.find('epp:trID/epp:svTRID', NS))
+
+    @cached_property
+    def name(self):
+        """
+        Object name (domain/host) or ID (contact) from resData.
+        """
+        if self._res_data is None or not len(self._res_data):
+            return None
+        for element in self._res_data[0]:
+            if _local(element.tag) in ("name", "id"):
+                return _text(element)
+        return None
+
+    @cached_property
+    def roid(self):
+        return self._res_data_text("roid")
+
+    @cached_property
+    def ex_date(self):
+        """
+        <domain:exDate> as 'YYYY-MM-DD' (info, create, renew and transfer responses).
+        """
+        return _date(self._res_data_text("exDate"))
+
+    @cached_property
+    def cr_date(self):
+        return _date(self._res_data_text("crDate"))
+
+    @cached_property
+    def sponsor(self):
+        """
+        <clID> of the registrar sponsoring the object (info responses).
+        """
+        return self._res_data_text("clID")
+
+    @cached_property
+    def statuses(self):
+        return [element.get("s") for element in self._res_data_elements("status")]
+
+    @cached_property
+    def nameservers(self):
+        """
+        Nameserver host names from <domain:ns>, whether given as hostObj or hostAttr.
+        """
+        hosts = []
+        for ns in self._res_data_elements("ns"):
+            for element in ns:
+                if _local(element.tag) == "hostObj":
+                    hosts.append(_text(element))
+                elif _local(element.tag) == "hostAttr":
+                    hosts.append(_text(element.find('domain:hostName', NS)))
+        return hosts
+
+    @cached_property
+    def addresses(self):
+        """
+        IP addresses of a host from <host:infData>.
+        """
+        return [_text(element) for element in self._res_data_elements("addr") if element.tag == "{%s}addr" % HOST_NS]
+
+    @cached_property
+    def registrant(self):
+        return self._res_data_text("registrant")
+
+    @cached_property
+    def email(self):
+        return self._res_data_text("email")
+
+    @cached_property
+    def contacts(self):
+        """
+        (type, contact ID) pairs from <domain:contact>, e.g. [("admin", "CH1234")].
+        """
+        return [(element.get("type"), _text(element)) for element in self._res_data_elements("contact")
+                if element.get("type")]
+
+    @cached_property
+    def check_results(self):
+        """
+        CheckResult per name/ID in a domain, contact or host check response.
+        """
+        results = []
+        for cd in self._res_data_elements("cd"):
+            name = cd[0] if len(cd) else None
+            reason = [child for child in cd if _local(child.tag) == "reason"]
+            results.append(CheckResult(
+                _text(name),
+                name is not None and name.get("avail") in ("1", "true"),
+                _text(reason[0]) if reason else None,
+            ))
+        return results
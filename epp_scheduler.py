@@ -0,0 +1,170 @@
+"""
+epp_scheduler.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Rate-limited, retrying command execution over an EppSessionPool. Every command waits
+for a token from a per-account token bucket and a free concurrency slot. Transient
+failures (2400 command failed, 2502 session limit exceeded) are retried with jittered
+exponential backoff, and 2500/2501/2502 or a dropped connection retire the session so
+the pool reconnects. Every outcome, including failures, is returned to the caller as
+a CommandResult instead of ending the run.
+
+The bucket is adaptive: a throttling response (2502) halves its rate and each success
+lets it creep back up towards the configured maximum, so a job can run close to the
+registry's limit without repeatedly tripping it.
+"""
+
+import time
+import random
+import logging
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree.ElementTree import ParseError
+from epp_commands import describe_command
+
+RETRYABLE_CODES = ("2400", "2502")            # Worth another attempt after a pause
+RECONNECT_CODES = ("2500", "2501", "2502")    # The server is closing (or refusing) the session
+THROTTLE_CODES = ("2502",)                    # Slow the account down when seen
+READ_ONLY_COMMANDS = ("check", "info", "hello")  # Safe to resend after a dropped connection
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 0.5   # Seconds; the backoff cap doubles with each attempt
+BACKOFF_MAX = 30.0
+CHECKOUT_TIMEOUT = 30.0  # Seconds to wait for a free pooled session before giving up on an attempt
+
+class CommandResult(namedtuple("CommandResult", ["xml", "response", "code", "error", "attempts"])):
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.response is not None and self.response.is_success
+
+class TokenBucket:
+    def __init__(self, rate, burst=None, min_rate=0.1):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a token is available and takes it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            logging.warning("Registry throttling; send rate reduced to %.2f/s", self.rate)
+
+    def recover(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+_account_buckets = {}
+_account_buckets_lock = threading.Lock()
+
+def account_bucket(account, rate, burst=None):
+    """
+    Returns the TokenBucket shared by everything sending as `account`, creating it on
+    first use. Later calls for the same account get the existing bucket.
+    """
+    with _account_buckets_lock:
+        if account not in _account_buckets:
+            _account_buckets[account] = TokenBucket(rate, burst)
+        return _account_buckets[account]
+
+def backoff_delay(attempt):
+    """
+    Full-jitter exponential backoff: uniform in [0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)].
+    """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+class EppScheduler:
+    def __init__(self, pool, rate=10.0, burst=None, max_concurrency=None, max_attempts=MAX_ATTEMPTS,
+                 retry_codes=RETRYABLE_CODES, reconnect_codes=RECONNECT_CODES, checkout_timeout=CHECKOUT_TIMEOUT):
+        self.pool = pool
+        self.bucket = account_bucket(pool.username, rate, burst)
+        self.max_concurrency = max_concurrency or pool.size
+        self.max_attempts = max_attempts
+        self.retry_codes = retry_codes
+        self.reconnect_codes = reconnect_codes
+        self.checkout_timeout = checkout_timeout
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def execute(self, command):
+        """
+        Runs one command and returns a CommandResult. `command` is the XML, or a
+        callable returning it, which is called again for each attempt so every attempt
+        gets a fresh clTRID.
+        """
+        result = None
+        for attempt in range(1, self.max_attempts + 1):
+            xml = command() if callable(command) else command
+            result, sent = self._attempt(xml, attempt)
+            if result.ok:
+                self.bucket.recover()
+                return result
+            if result.code in THROTTLE_CODES:
+                self.bucket.throttle()
+            retry = result.code in self.retry_codes or result.code in self.reconnect_codes
+            if result.error is not None:
+                # Nothing was sent if no session was free, so any command can be retried
+                retry = not sent or describe_command(xml).command in READ_ONLY_COMMANDS
+            if not retry or attempt == self.max_attempts:
+                return result
+            delay = backoff_delay(attempt)
+            logging.info("Retrying %s after %s in %.2fs (attempt %d)",
+                         describe_command(xml).command, result.code or result.error, delay, attempt + 1)
+            time.sleep(delay)
+        return result
+
+    def _attempt(self, xml, attempt):
+        # Returns (CommandResult, whether the command was sent)
+        with self._slots:
+            self.bucket.acquire()
+            try:
+                client = self.pool.checkout(self.checkout_timeout)
+            except TimeoutError as e:
+                return CommandResult(xml, None, None, e, attempt), False
+            broken = True
+            try:
+                client.send(xml)
+                response = client.read_response()
+                code = response.code
+                broken = code in self.reconnect_codes
+                client.notify(xml, response)
+            except (ConnectionError, OSError, ParseError) as e:
+                return CommandResult(xml, None, None, e, attempt), True
+            finally:
+                self.pool.checkin(client, broken=broken)
+            return CommandResult(xml, response, code, None, attempt), True
+
+    def execute_many(self, commands):
+        """
+        Runs commands concurrently, up to max_concurrency at a time, and yields their
+        CommandResults in input order. Only a bounded number of commands is read ahead.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            pending = deque()
+            for command in commands:
+                pending.append(executor.submit(self.execute, command))
+                if len(pending) >= self.max_concurrency * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
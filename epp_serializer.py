@@ -0,0 +1,83 @@
+"""
+epp_serializer.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Precompiled command templates for the epp_commands builders. A template is split once
+into its fixed text (kept as both str and UTF-8 bytes) and named slots, so rendering is
+a single join, and every slot value is XML-escaped unless the slot is marked raw.
+
+Template syntax: {name} is an escaped slot, {name:raw} is inserted verbatim (for
+fragments that are already XML, such as the <domain:ns> block).
+
+The builders return str via render(), since callers match clTRIDs, mask passwords and
+log the XML as text; EppClient encodes each command once, as it frames it. The send
+path does not use render_bytes() and render_into(); they are for callers that keep
+commands as bytes, e.g. to build a batch of frames for send_framed() up front.
+"""
+
+import re
+
+_SLOT_RE = re.compile(r"\{(\w+)(:raw)?\}")
+
+def xml_escape(value):
+    """
+    Returns str(value) with &, <, > and " replaced by entities, so it is safe both as
+    element text and inside a double-quoted attribute.
+    """
+    text = value if isinstance(value, str) else str(value)
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if '"' in text:
+        text = text.replace('"', "&quot;")
+    return text
+
+class CommandTemplate:
+    def __init__(self, text):
+        parts = _SLOT_RE.split(text)
+        self.text = text
+        self._fragments = parts[0::3]
+        self._byte_fragments = [fragment.encode("utf-8") for fragment in self._fragments]
+        self._slots = [(name, bool(raw)) for name, raw in zip(parts[1::3], parts[2::3])]
+
+    def _values(self, values):
+        for name, raw in self._slots:
+            value = values[name]
+            yield value if raw else xml_escape(value)
+
+    def render(self, **values):
+        """
+        Returns the document as str with every slot filled in.
+        """
+        out = [self._fragments[0]]
+        for value, fragment in zip(self._values(values), self._fragments[1:]):
+            out.append(value)
+            out.append(fragment)
+        return "".join(out)
+
+    def render_bytes(self, **values):
+        """
+        Returns the document as UTF-8 bytes, built from the pre-encoded fragments.
+        """
+        out = [self._byte_fragments[0]]
+        for value, fragment in zip(self._values(values), self._byte_fragments[1:]):
+            out.append(value.encode("utf-8"))
+            out.append(fragment)
+        return b"".join(out)
+
+    def render_into(self, buffer, **values):
+        """
+        Appends the UTF-8 document to `buffer` (a bytearray), e.g. to serialize many
+        commands into one buffer ahead of sending them.
+        """
+        buffer += self._byte_fragments[0]
+        for value, fragment in zip(self._values(values), self._byte_fragments[1:]):
+            buffer += value.encode("utf-8")
+            buffer += fragment
+        return buffer
@@ -0,0 +1,305 @@
+"""
+epp_shard.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Sharded execution of bulk jobs across worker processes. Building command XML and
+parsing responses is CPU-bound, so one process tops out at one core however many
+sessions it holds. ShardedRunner starts a process per core, each logging in its own
+EppSessionPool, and hands them batches of work through a bounded queue. A worker
+sends back one message per batch holding plain (item, code, msg, value) tuples, so
+no XML or parsed responses cross between processes and each batch is pickled once.
+Per-worker progress and errors are collected in the parent.
+
+Jobs:
+check   items are domain names; value is True/False availability (None on error)
+renew   items are (domain, years); value is the new expiry date
+update  items are (domain, {build_domain_update keyword arguments}); value is None
+
+Keep processes * sessions within the registry's session limit for the account.
+
+Usage:
+python3 epp_shard.py check names.txt -o results.tsv --processes 4 --sessions 2
+python3 epp_shard.py renew renewals.csv -o results.tsv      (input rows: domain,years)
+"""
+
+import os
+import csv
+import sys
+import queue
+import logging
+import argparse
+import threading
+import multiprocessing
+from collections import namedtuple
+from epp_commands import build_domain_check_batch, build_domain_info, build_domain_renew, build_domain_update
+from epp_ote_runner import HOST, PORT, CLIENT_ID, PASSWORD, CA_FILE, CERT_FILE, KEY_FILE
+from epp_transport import shared_ssl_context
+from epp_check import CHECK_BATCH_SIZE, chunked, read_names
+
+SHARD_BATCH_SIZE = 100  # Items per batch handed to a worker
+RESULT_POLL_INTERVAL = 1.0  # How often the parent checks for dead workers while waiting
+
+ShardResult = namedtuple("ShardResult", ["item", "code", "msg", "value"])
+WorkerProgress = namedtuple("WorkerProgress", ["worker", "done", "failed", "errors"])
+
+def _check_job(client, names):
+    batches = list(chunked(names, CHECK_BATCH_SIZE))
+    rows = []
+    for batch, response in zip(batches, client.pipeline([build_domain_check_batch(batch) for batch in batches])):
+        if response.is_success:
+            rows.extend((result.name, response.code, result.reason, result.avail) for result in response.check_results)
+        else:
+            rows.extend((name, response.code, response.msg, None) for name in batch)
+    return rows
+
+def _renew_job(client, items):
+    rows = []
+    ready = []
+    for (domain, years), response in zip(items, client.pipeline([build_domain_info(domain) for domain, _ in items])):
+        if response.is_success and response.ex_date:
+            ready.append((domain, years, response.ex_date))
+        else:
+            rows.append(((domain, years), response.code, "info failed: %s" % response.msg, None))
+    commands = [build_domain_renew(domain, cur_exp_date, years) for domain, years, cur_exp_date in ready]
+    for (domain, years, _), response in zip(ready, client.pipeline(commands) if commands else []):
+        rows.append(((domain, years), response.code, response.msg, response.ex_date))
+    return rows
+
+def _update_job(client, items):
+    responses = client.pipeline([build_domain_update(domain, **changes) for domain, changes in items])
+    return [((domain, changes), response.code, response.msg, None)
+            for (domain, changes), response in zip(items, responses)]
+
+# Job name -> function(client, batch) returning an (item, code, msg, value) tuple per item.
+# Workers look jobs up by name, so only the name has to be sent to them.
+JOBS = {
+    "check": _check_job,
+    "renew": _renew_job,
+    "update": _update_job,
+}
+
+SUCCESS_CODES = {"check": ("1000",), "renew": ("1000",), "update": ("1000", "1001")}
+
+def _shard_worker(worker, job, connection, sessions, tasks, results):
+    """
+    Worker process: opens its own session pool and runs batches from `tasks` on
+    `sessions` threads until each thread has taken a None.
+    """
+    from epp_pool import EppSessionPool
+    host, port, username, password, cafile, certfile, keyfile = connection
+    try:
+        # SSL contexts cannot be sent to another process, so each worker builds its own.
+        context = shared_ssl_context(cafile or None, certfile or None, keyfile or None)
+        pool = EppSessionPool(host, port, username, password, size=sessions, ssl_context=context).start()
+    except Exception as e:
+        results.put(("error", worker, "login failed: %s" % e))
+        results.put(("done", worker, None))
+        return
+    run = JOBS[job]
+
+    def loop():
+        while True:
+            batch = tasks.get()
+            if batch is None:
+                return
+            try:
+                with pool.session() as client:
+                    rows = run(client, batch)
+            except Exception as e:
+                # Whether the registry processed the batch is unknown; report every item.
+                message = "session failed: %s" % e
+                rows = [(item, None, message, None) for item in batch]
+                results.put(("error", worker, message))
+            results.put(("batch", worker, rows))
+
+    threads = [threading.Thread(target=loop, name="epp-shard-%d-%d" % (worker, i), daemon=True)
+               for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.close()
+    results.put(("done", worker, None))
+
+class ShardedRunner:
+    def __init__(self, job, processes=None, sessions=1, batch_size=SHARD_BATCH_SIZE,
+                 host=HOST, port=PORT, username=CLIENT_ID, password=PASSWORD,
+                 cafile=CA_FILE, certfile=CERT_FILE, keyfile=KEY_FILE):
+        """
+        - job: name of an entry in JOBS
+        - processes: worker processes, default one per CPU core
+        - sessions: logged-in sessions (and threads) per worker process
+        - cafile, certfile, keyfile: files for each worker's SSL context
+        """
+        if job not in JOBS:
+            raise ValueError("Unknown job %r; expected one of: %s" % (job, ", ".join(sorted(JOBS))))
+        self.job = job
+        self.processes = processes or os.cpu_count() or 1
+        self.sessions = sessions
+        self.batch_size = batch_size
+        self.connection = (host, port, username, password, cafile, certfile, keyfile)
+        self.progress = {}  # worker -> WorkerProgress
+        self.unprocessed = 0  # items no worker was left to run
+
+    def run(self, items):
+        """
+        Runs the job over `items` and yields a ShardResult per item as batches finish
+        (not in input order). Items are read lazily; at most a few batches per worker
+        are queued at a time.
+        """
+        # spawn, not fork: the parent may be running threads (e.g. a session pool's).
+        context = multiprocessing.get_context("spawn")
+        slots = self.processes * self.sessions
+        tasks = context.Queue(maxsize=slots * 2)
+        results = context.Queue()
+        self.progress = {worker: WorkerProgress(worker, 0, 0, []) for worker in range(self.processes)}
+        self.unprocessed = 0
+        workers = [context.Process(target=_shard_worker, name="epp-shard-%d" % worker,
+                                   args=(worker, self.job, self.connection, self.sessions, tasks, results),
+                                   daemon=True)
+                   for worker in range(self.processes)]
+        for process in workers:
+            process.start()
+        feed_error = []
+        batches = chunked(items, self.batch_size)
+        held = []  # a batch the feeder was still trying to queue when it was stopped
+        stop = threading.Event()
+
+        def put(batch):
+            # Returns False if stopped first, e.g. because every worker has gone
+            while not stop.is_set():
+                try:
+                    tasks.put(batch, timeout=RESULT_POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def feed():
+            try:
+                for batch in batches:
+                    if not put(batch):
+                        held.append(batch)
+                        return
+            except Exception as e:
+                feed_error.append(e)
+            for _ in range(slots):
+                if not put(None):
+                    return
+
+        feeder = threading.Thread(target=feed, name="epp-shard-feed", daemon=True)
+        feeder.start()
+        success = SUCCESS_CODES[self.job]
+        finished = set()
+        try:
+            while len(finished) < self.processes:
+                try:
+                    kind, worker, payload = results.get(timeout=RESULT_POLL_INTERVAL)
+                except queue.Empty:
+                    self._reap(workers, finished)
+                    continue
+                if kind == "done":
+                    finished.add(worker)
+                elif kind == "error":
+                    logging.error("Shard worker %d: %s", worker, payload)
+                    self.progress[worker].errors.append(payload)
+                else:
+                    ok = sum(1 for row in payload if row[1] in success)
+                    entry = self.progress[worker]
+                    self.progress[worker] = entry._replace(done=entry.done + ok,
+                                                           failed=entry.failed + len(payload) - ok)
+                    for row in payload:
+                        yield ShardResult(*row)
+            stop.set()
+            feeder.join()
+            for item in self._unprocessed(tasks, held, batches):
+                yield ShardResult(item, None, "not processed: no worker left to run it", None)
+            if self.unprocessed:
+                logging.error("%d items were not processed: every worker has stopped.", self.unprocessed)
+        finally:
+            stop.set()
+            for process in workers:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+        if feed_error:
+            raise feed_error[0]
+
+    def _unprocessed(self, tasks, held, batches):
+        # Once every worker has gone: what is still queued, held by the feeder or not yet read
+        while True:
+            try:
+                batch = tasks.get(timeout=0.1)
+            except queue.Empty:
+                break
+            if batch is not None:
+                held.append(batch)
+        for batch in held:
+            self.unprocessed += len(batch)
+            yield from batch
+        for batch in batches:
+            self.unprocessed += len(batch)
+            yield from batch
+
+    def _reap(self, workers, finished):
+        # A worker that died without saying "done" (e.g. killed) loses the batches it held.
+        for worker, process in enumerate(workers):
+            if worker not in finished and process.exitcode is not None:
+                message = "exited with code %s" % process.exitcode
+                logging.error("Shard worker %d %s", worker, message)
+                self.progress[worker].errors.append(message)
+                finished.add(worker)
+
+    def totals(self):
+        """
+        Returns (done, failed, errors) summed over every worker. Items no worker was left
+        to run count as failed.
+        """
+        entries = self.progress.values()
+        return (sum(entry.done for entry in entries), sum(entry.failed for entry in entries) + self.unprocessed,
+                sum(len(entry.errors) for entry in entries))
+
+    def format_progress(self):
+        """
+        Returns a plain-text table of per-worker progress.
+        """
+        lines = ["%-6s  %8s  %8s  %6s" % ("worker", "done", "failed", "errors")]
+        for entry in sorted(self.progress.values()):
+            lines.append("%-6d  %8d  %8d  %6d" % (entry.worker, entry.done, entry.failed, len(entry.errors)))
+        if self.unprocessed:
+            lines.append("%-6s  %8d  %8d  %6s" % ("none", 0, self.unprocessed, "-"))
+        return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a bulk EPP job across several worker processes.")
+    parser.add_argument("job", choices=("check", "renew"))
+    parser.add_argument("input", nargs="?", default="-", help="names (check) or CSV of domain,years (renew)")
+    parser.add_argument("-o", "--output", default="-", help="tab-separated results (default: stdout)")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU cores)")
+    parser.add_argument("--sessions", type=int, default=1, help="sessions per worker process")
+    parser.add_argument("--batch-size", type=int, default=SHARD_BATCH_SIZE)
+    args = parser.parse_args()
+
+    infile = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    outfile = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    if args.job == "check":
+        items = read_names(infile)
+    else:
+        items = ((row[0].strip(), int(row[1])) for row in csv.reader(infile) if row and not row[0].startswith("#"))
+    runner = ShardedRunner(args.job, args.processes, args.sessions, args.batch_size)
+    for result in runner.run(items):
+        name = result.item if args.job == "check" else result.item[0]
+        value = "" if result.value is None else result.value
+        outfile.write("%s\t%s\t%s\t%s\n" % (name, result.code, value, result.msg or ""))
+    outfile.flush()
+    logging.info("Per-worker progress:\n%s", runner.format_progress())
+    done, failed, errors = runner.totals()
+    logging.info("Completed %d, failed %d, %d worker errors.", done, failed, errors)
+    if failed or errors:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
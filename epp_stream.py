@@ -0,0 +1,119 @@
+"""
+epp_stream.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Streaming extraction of selected fields from EPP responses. The payload is fed piece
+by piece (e.g. straight from FrameReader.read_frame_chunks) to an incremental pull
+parser; each element is discarded as soon as it has been looked at, and parsing
+stops as soon as every requested field has been found. No document tree is built,
+so memory use does not grow with the size of the response, apart from the check
+results themselves.
+
+Fields:
+code, msg      first result code and message
+cltrid, svtrid transaction IDs from <trID>
+msg_id         message ID from <msgQ>
+ex_date        first exDate in resData, as 'YYYY-MM-DD'
+check          CheckResult per name/ID of a check response
+
+Usage:
+fields = client.read_fields("code", "ex_date")
+fields = parse_fields(payload, ("code", "check"))
+"""
+
+import xml.etree.ElementTree as ET
+from epp_response import EPP_NS, CheckResult
+
+FIELDS = ("code", "msg", "cltrid", "svtrid", "msg_id", "ex_date", "check")
+CHUNK_SIZE = 16 * 1024  # Whole payloads are fed to the parser in pieces of this size
+
+_RESULT = "{%s}result" % EPP_NS
+_MSG = "{%s}msg" % EPP_NS
+_TRID = "{%s}trID" % EPP_NS
+_CLTRID = "{%s}clTRID" % EPP_NS
+_SVTRID = "{%s}svTRID" % EPP_NS
+_MSGQ = "{%s}msgQ" % EPP_NS
+
+def _local(tag):
+    return tag.rpartition("}")[2]
+
+def _text(element):
+    return element.text.strip() if element is not None and element.text else None
+
+def parse_fields(data, fields=("code",)):
+    """
+    Returns a dict with each requested field (None if absent; [] for "check").
+
+    - data: the payload as bytes, str or memoryview, or an iterable of such pieces
+    """
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        raise ValueError("Unknown fields: %s" % ", ".join(sorted(unknown)))
+    wanted = set(fields)
+    found = {field: None for field in fields}
+    if "check" in wanted:
+        found["check"] = []
+    if isinstance(data, (bytes, bytearray, memoryview, str)):
+        # Feeding everything at once would queue the events for the whole document
+        view = memoryview(data) if not isinstance(data, str) else data
+        chunks = (view[i:i + CHUNK_SIZE] for i in range(0, len(view), CHUNK_SIZE))
+    else:
+        chunks = data
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack = []  # open elements, innermost last
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if event == "start":
+                    stack.append(element)
+                    if element.tag == _RESULT and "code" in wanted:
+                        found["code"] = element.get("code")
+                        wanted.discard("code")
+                    elif element.tag == _MSGQ and "msg_id" in wanted:
+                        found["msg_id"] = element.get("id")
+                        wanted.discard("msg_id")
+                    continue
+                stack.pop()
+                parent = stack[-1] if stack else None
+                _collect(element, parent, wanted, found)
+                if not wanted:
+                    return found
+                # Drop the finished element so the partial tree never grows; a <cd>
+                # keeps its children until it ends and is read as a whole.
+                if parent is not None and _local(parent.tag) != "cd":
+                    parent.remove(element)
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()  # e.g. lets read_frame_chunks discard the rest of the frame
+    return found
+
+def _collect(element, parent, wanted, found):
+    tag = element.tag
+    if tag == _MSG and "msg" in wanted and parent is not None and parent.tag == _RESULT:
+        found["msg"] = _text(element)
+        wanted.discard("msg")
+    elif tag == _CLTRID and "cltrid" in wanted and parent is not None and parent.tag == _TRID:
+        found["cltrid"] = _text(element)
+        wanted.discard("cltrid")
+    elif tag == _SVTRID and "svtrid" in wanted and parent is not None and parent.tag == _TRID:
+        found["svtrid"] = _text(element)
+        wanted.discard("svtrid")
+    elif "ex_date" in wanted and _local(tag) == "exDate":
+        value = _text(element)
+        found["ex_date"] = value.split("T")[0] if value else None
+        wanted.discard("ex_date")
+    elif "check" in wanted:
+        if _local(tag) == "cd":
+            name = element[0] if len(element) else None
+            reason = [child for child in element if _local(child.tag) == "reason"]
+            found["check"].append(CheckResult(
+                _text(name),
+                name is not None and name.get("avail") in ("1", "true"),
+                _text(reason[0]) if reason else None,
+            ))
+        elif _local(tag) == "chkData":
+            wanted.discard("check")
@@ -0,0 +1,110 @@
+"""
+epp_transcript.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Traffic transcript for EppClient. The client only drops each raw frame onto a bounded
+queue; a background thread decodes it, matches responses to commands by clTRID to work
+out latencies, masks login passwords and appends one compact JSON line per frame.
+If the writer falls behind, frames are dropped and counted rather than slowing the
+client down.
+"""
+
+import re
+import json
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from epp_commands import extract_cltrid
+
+TRANSCRIPT_QUEUE_SIZE = 10000  # Frames buffered for the writer before new ones are dropped
+TRANSCRIPT_PENDING_LIMIT = 10000  # Commands awaiting a response tracked for latency; the oldest are forgotten
+
+_PASSWORD_RE = re.compile(r"<(pw|newPW)>[^<]*</\1>")
+_RESULT_CODE_RE = re.compile(r'<(?:\w+:)?result code="(\d{4})"')
+_STOP = object()
+
+def mask_passwords(xml):
+    """
+    Replaces the <pw> and <newPW> values of login commands with asterisks.
+    """
+    return _PASSWORD_RE.sub(lambda m: "<%s>********</%s>" % (m.group(1), m.group(1)), xml)
+
+class MaskedXml:
+    """
+    Logging argument that masks passwords only if the log record is actually emitted.
+    """
+    def __init__(self, xml):
+        self.xml = xml
+
+    def __str__(self):
+        return mask_passwords(self.xml)
+
+class Transcript:
+    def __init__(self, path, include_xml=True, maxsize=TRANSCRIPT_QUEUE_SIZE):
+        self.path = path
+        self.include_xml = include_xml
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize)
+        self._sent = OrderedDict()  # clTRID -> perf_counter() when the command was written, oldest first
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="epp-transcript", daemon=True)
+        self._thread.start()
+        return self
+
+    def record(self, direction, payload):
+        """
+        Queues one frame ("out" for commands, "in" for responses). Never blocks.
+        """
+        try:
+            self._queue.put_nowait((time.time(), time.perf_counter(), direction, payload))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """
+        Writes out everything queued so far and stops the writer thread.
+        """
+        if self._thread:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        if self.dropped:
+            logging.warning("Transcript dropped %d frames.", self.dropped)
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as out:
+            while True:
+                try:
+                    item = self._queue.get(timeout=1.0)
+                except queue.Empty:
+                    out.flush()
+                    continue
+                if item is _STOP:
+                    return
+                out.write(json.dumps(self._entry(*item), separators=(",", ":")))
+                out.write("\n")
+
+    def _entry(self, timestamp, perf, direction, payload):
+        xml = payload.decode("utf-8", "replace") if isinstance(payload, bytes) else payload
+        cltrid = extract_cltrid(xml)
+        entry = {"ts": round(timestamp, 6), "dir": direction, "cltrid": cltrid, "bytes": len(payload)}
+        if direction == "out":
+            if cltrid:
+                self._sent[cltrid] = perf
+                if len(self._sent) > TRANSCRIPT_PENDING_LIMIT:
+                    self._sent.popitem(last=False)  # never answered, e.g. its connection dropped
+        else:
+            code = _RESULT_CODE_RE.search(xml)
+            entry["code"] = code.group(1) if code else None
+            sent = self._sent.pop(cltrid, None)
+            entry["latency_ms"] = round((perf - sent) * 1000, 3) if sent is not None else None
+        if self.include_xml:
+            entry["xml"] = mask_passwords(xml)
+        return entry
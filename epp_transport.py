@@ -0,0 +1,209 @@
+"""
+epp_transport.py
+Version: 1.0
+Author: Phil Adcock
+Date: October 2026
+
+Description:
+Buffered framing for the EPP transport (RFC 5734): every message is preceded by a
+4-byte big-endian length that includes the header itself. FrameReader receives into
+one preallocated, reusable buffer and can serve several frames from a single recv;
+write_frames sends many frames with one vectored write where the socket allows it.
+
+Connections share one SSL context per set of certificate files (shared_ssl_context),
+and tune_socket applies the TCP options used for every EPP connection.
+"""
+
+import ssl
+import socket
+import struct
+import threading
+
+HEADER = struct.Struct("!I")
+BUFFER_SIZE = 64 * 1024            # Initial receive buffer; grows to fit larger frames
+MAX_FRAME_SIZE = 64 * 1024 * 1024  # Refuse frames claiming to be larger than this
+TCP_KEEPALIVE_IDLE = 60            # Seconds of silence before TCP keepalive probes start
+TCP_KEEPALIVE_INTERVAL = 15        # Seconds between unanswered probes
+TCP_KEEPALIVE_COUNT = 4            # Unanswered probes before the connection is dropped
+
+_contexts = {}
+_contexts_lock = threading.Lock()
+
+def shared_ssl_context(cafile=None, certfile=None, keyfile=None):
+    """
+    Returns the client SSL context for these CA and client certificate files, creating
+    it on first use. Reusing one context saves loading the CA store on every connect
+    and is required for resuming TLS sessions from earlier connections.
+    """
+    key = (cafile, certfile, keyfile)
+    with _contexts_lock:
+        context = _contexts.get(key)
+        if context is None:
+            context = ssl.create_default_context(cafile=cafile)
+            if certfile:
+                context.load_cert_chain(certfile, keyfile)
+            _contexts[key] = context
+        return context
+
+def tune_socket(sock):
+    """
+    Disables Nagle's algorithm, so small commands are sent immediately, and enables
+    TCP keepalive so a silently dropped connection is noticed.
+    """
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (("TCP_KEEPIDLE", TCP_KEEPALIVE_IDLE), ("TCP_KEEPINTVL", TCP_KEEPALIVE_INTERVAL),
+                          ("TCP_KEEPCNT", TCP_KEEPALIVE_COUNT)):
+        if hasattr(socket, option):  # not available on every platform
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+def frame(payload):
+    """
+    Returns `payload` (bytes) with its length header prepended, ready to be written.
+    """
+    return HEADER.pack(len(payload) + 4) + payload
+
+def write_frames(sock, payloads):
+    """
+    Writes each payload as one frame. On plain sockets the headers and payloads go out
+    in a single sendmsg call without being joined first; SSL sockets do not support
+    sendmsg, so the frames are joined into one buffer and sent with sendall.
+    """
+    buffers = []
+    for payload in payloads:
+        buffers.append(HEADER.pack(len(payload) + 4))
+        buffers.append(payload)
+    if isinstance(sock, ssl.SSLSocket) or not hasattr(sock, "sendmsg"):
+        sock.sendall(b"".join(buffers))
+        return
+    while buffers:
+        sent = sock.sendmsg(buffers)
+        while buffers and sent >= len(buffers[0]):
+            sent -= len(buffers.pop(0))
+        if sent:
+            buffers[0] = memoryview(buffers[0])[sent:]
+
+class FrameReader:
+    def __init__(self, sock, size=BUFFER_SIZE):
+        self.sock = sock
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._start = 0  # first byte not yet handed out
+        self._end = 0    # end of received data
+
+    def read_frame(self):
+        """
+        Returns the payload of the next frame as bytes.
+        """
+        start, end = self._next_frame()
+        return bytes(self._view[start:end])
+
+    def read_frame_view(self):
+        """
+        Returns the payload of the next frame as a memoryview into the receive buffer,
+        without copying. The view is only valid until the next read from this reader.
+        """
+        start, end = self._next_frame()
+        return self._view[start:end]
+
+    def read_frame_chunks(self):
+        """
+        Yields the payload of the next frame in pieces, as memoryviews into the receive
+        buffer, as they arrive, so the frame never has to be held in memory as a whole.
+        Each piece is only valid until the next one is requested. If the generator is
+        closed early, the rest of the frame is read and discarded to keep the stream
+        in sync.
+        """
+        remaining = self._next_header() - 4
+        try:
+            while remaining:
+                start, size = self._take(remaining)
+                remaining -= size
+                yield self._view[start:start + size]
+        except GeneratorExit:
+            while remaining:
+                remaining -= self._take(remaining)[1]
+            raise
+
+    def read_available(self):
+        """
+        Returns the next frame plus every further complete frame that is already
+        buffered, reading from the socket only if no complete frame is buffered.
+        """
+        frames = [self.read_frame()]
+        while self._buffered_frame_length():
+            frames.append(self.read_frame())
+        return frames
+
+    def has_buffered_frame(self):
+        """
+        Returns True if a complete frame is buffered and can be read without touching
+        the socket.
+        """
+        return bool(self._buffered_frame_length())
+
+    def _buffered_frame_length(self):
+        available = self._end - self._start
+        if available < 4:
+            return 0
+        total_len = HEADER.unpack_from(self._buf, self._start)[0]
+        return total_len if available >= total_len else 0
+
+    def _next_frame(self):
+        if self._start == self._end:
+            self._start = self._end = 0
+        while True:
+            available = self._end - self._start
+            needed = 4
+            if available >= 4:
+                needed = HEADER.unpack_from(self._buf, self._start)[0]
+                if needed < 4 or needed > MAX_FRAME_SIZE:
+                    raise ConnectionError("Invalid message length header: %d" % needed)
+                if available >= needed:
+                    start = self._start + 4
+                    self._start += needed
+                    return start, self._start
+            self._make_room(needed)
+            self._fill(available < 4)
+
+    def _next_header(self):
+        # Consumes the next length header and returns the frame's total length.
+        if self._start == self._end:
+            self._start = self._end = 0
+        while self._end - self._start < 4:
+            self._make_room(4)
+            self._fill(True)
+        total_len = HEADER.unpack_from(self._buf, self._start)[0]
+        if total_len < 4 or total_len > MAX_FRAME_SIZE:
+            raise ConnectionError("Invalid message length header: %d" % total_len)
+        self._start += 4
+        return total_len
+
+    def _take(self, limit):
+        # Hands out up to `limit` buffered bytes, receiving more if none are buffered.
+        if self._start == self._end:
+            self._start = self._end = 0
+            self._fill(False)
+        start = self._start
+        size = min(limit, self._end - start)
+        self._start += size
+        return start, size
+
+    def _make_room(self, needed):
+        if self._start + needed <= len(self._buf):
+            return
+        pending = bytes(self._view[self._start:self._end])
+        if needed > len(self._buf):
+            self._buf = bytearray(max(needed, 2 * len(self._buf)))
+            self._view = memoryview(self._buf)
+        self._buf[:len(pending)] = pending
+        self._start = 0
+        self._end = len(pending)
+
+    def _fill(self, in_header):
+        received = self.sock.recv_into(self._view[self._end:])
+        if not received:
+            if in_header:
+                raise ConnectionError("Failed to read message length header.")
+            raise ConnectionError("Unexpected disconnect during response read.")
+        self._end += received